@@ -0,0 +1,55 @@
+import asyncio
+import logging
+import os
+from datetime import datetime
+from pymongo import UpdateOne
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+LAST_ACTIVE_FLUSH_SECONDS = int(os.getenv("LAST_ACTIVE_FLUSH_SECONDS", "60"))
+
+
+class LastActiveBuffer:
+    """
+    Coalesces last_active writes so each user gets at most one update per
+    flush interval, written together with a single bulk_write
+    """
+
+    def __init__(self, flush_interval: int = LAST_ACTIVE_FLUSH_SECONDS):
+        self.flush_interval = flush_interval
+        self._pending = {}
+
+    def touch(self, user_id, when: datetime = None):
+        self._pending[user_id] = when or datetime.utcnow()
+
+    async def flush(self, db) -> int:
+        if not self._pending:
+            return 0
+
+        pending, self._pending = self._pending, {}
+        operations = [
+            UpdateOne({"_id": user_id}, {"$max": {"last_active": when}})
+            for user_id, when in pending.items()
+        ]
+        try:
+            await db.users.bulk_write(operations, ordered=False)
+        except Exception:
+            # Put the entries back so the next flush retries them
+            for user_id, when in pending.items():
+                self._pending.setdefault(user_id, when)
+            raise
+
+        registry.incr("last_active_writes", len(operations))
+        return len(operations)
+
+    async def run(self, db):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush(db)
+            except Exception as e:
+                logger.error(f"Failed to flush last_active updates: {e}")
+
+
+last_active_buffer = LastActiveBuffer()
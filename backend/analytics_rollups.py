@@ -0,0 +1,400 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from metrics import registry
+from models import EscrowStatus
+from archival import ARCHIVES
+from worker_leases import WorkerLease
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_REFRESH_SECONDS = int(os.getenv("ANALYTICS_REFRESH_SECONDS", "60"))
+# Orders updated within this many seconds are left for the next pass, so in-flight writes are not missed
+ANALYTICS_LAG_SECONDS = int(os.getenv("ANALYTICS_LAG_SECONDS", "60"))
+# Longest stretch of order updates folded into the rollups in one pass
+ANALYTICS_MAX_WINDOW_MINUTES = int(os.getenv("ANALYTICS_MAX_WINDOW_MINUTES", "60"))
+ANALYTICS_BACKFILL_CHUNK_HOURS = int(os.getenv("ANALYTICS_BACKFILL_CHUNK_HOURS", "24"))
+# Pause between backfill chunks so a large backfill does not starve live traffic
+ANALYTICS_BACKFILL_PAUSE_SECONDS = float(os.getenv("ANALYTICS_BACKFILL_PAUSE_SECONDS", "1"))
+ANALYTICS_MAX_BUCKETS = int(os.getenv("ANALYTICS_MAX_BUCKETS", "744"))
+
+HOURLY = "hour"
+DAILY = "day"
+COLLECTIONS = {HOURLY: "analytics_hourly", DAILY: "analytics_daily"}
+STATE_ID = "orders"
+UNKNOWN_TIER = "unknown"
+
+DIMENSIONS = ["platform", "service_type", "seller_tier"]
+# Booked when the order is placed, bucketed by created_at
+CREATED_METRICS = ["orders", "gmv", "platform_fees"]
+# Booked when escrow is released or refunded, bucketed by settled_at
+SETTLED_METRICS = ["settled_orders", "escrow_released", "escrow_refunded", "fees_collected"]
+METRICS = CREATED_METRICS + SETTLED_METRICS
+SETTLED_ESCROW_STATUSES = [EscrowStatus.RELEASED.value, EscrowStatus.REFUNDED.value]
+
+
+async def ensure_indexes(db):
+    await db.orders.create_index("updated_at")
+    await db.orders.create_index("created_at")
+    await db.orders.create_index("escrow_settled_at", sparse=True)
+    await db.orders.create_index("completed_at", sparse=True)
+    for collection in COLLECTIONS.values():
+        # Also the key $merge matches rollup rows on
+        await db[collection].create_index([("bucket", 1)] + [(field, 1) for field in DIMENSIONS], unique=True)
+
+
+def floor_hour(moment: datetime) -> datetime:
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def floor_day(moment: datetime) -> datetime:
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _truncate(field: str, unit: str) -> dict:
+    parts = {"year": {"$year": field}, "month": {"$month": field}, "day": {"$dayOfMonth": field}}
+    if unit == HOURLY:
+        parts["hour"] = {"$hour": field}
+    return {"$dateFromParts": parts}
+
+
+def _group_key(field: str, unit: str) -> dict:
+    return {
+        "bucket": _truncate(field, unit),
+        "platform": "$platform",
+        "service_type": "$service_type",
+        "seller_tier": {"$ifNull": ["$seller_tier", UNKNOWN_TIER]}
+    }
+
+
+def _flatten(metrics: list) -> dict:
+    return {
+        "$project": {
+            "_id": 0,
+            "bucket": "$_id.bucket",
+            **{field: f"$_id.{field}" for field in DIMENSIONS},
+            **{metric: 1 for metric in metrics}
+        }
+    }
+
+
+def _merge_into(unit: str, when_matched: str) -> dict:
+    return {
+        "$merge": {
+            "into": COLLECTIONS[unit],
+            "on": ["bucket"] + DIMENSIONS,
+            "whenMatched": when_matched,
+            "whenNotMatched": "insert"
+        }
+    }
+
+
+def _orders_matching(query: dict) -> list:
+    # Archived orders still count towards the hours they are booked in. An
+    # order caught mid-move sits in both collections; keep the hot copy once.
+    return [
+        {"$match": query},
+        {"$unionWith": {"coll": ARCHIVES["orders"], "pipeline": [{"$match": query}]}},
+        {"$group": {"_id": "$_id", "order": {"$first": "$$ROOT"}}},
+        {"$replaceRoot": {"newRoot": "$order"}}
+    ]
+
+
+def settled_at(order: dict):
+    """
+    When an order's escrow settled, or None while it is still held. Orders
+    settled before escrow_settled_at was recorded fall back to their
+    completion, then their last update.
+    """
+    if order.get("escrow_settled_at"):
+        return order["escrow_settled_at"]
+    if order.get("escrow_status") not in SETTLED_ESCROW_STATUSES:
+        return None
+    return order.get("completed_at") or order.get("updated_at")
+
+
+SETTLED_AT = {"$ifNull": ["$escrow_settled_at", {"$ifNull": ["$completed_at", "$updated_at"]}]}
+
+
+def _settled_between(start: datetime, end: datetime) -> dict:
+    window = {"$gte": start, "$lt": end}
+    legacy = {"escrow_settled_at": None, "escrow_status": {"$in": SETTLED_ESCROW_STATUSES}}
+    return {"$or": [
+        {"escrow_settled_at": window},
+        {**legacy, "completed_at": window},
+        {**legacy, "completed_at": None, "updated_at": window}
+    ]}
+
+
+def created_pipeline(start: datetime, end: datetime) -> list:
+    return [
+        *_orders_matching({"created_at": {"$gte": start, "$lt": end}}),
+        {"$group": {
+            "_id": _group_key("$created_at", HOURLY),
+            "orders": {"$sum": 1},
+            "gmv": {"$sum": "$total_cost"},
+            "platform_fees": {"$sum": "$platform_fee"}
+        }},
+        _flatten(CREATED_METRICS),
+        _merge_into(HOURLY, "merge")
+    ]
+
+
+def settled_pipeline(start: datetime, end: datetime) -> list:
+    """
+    escrow_settled_at is never cleared, so an order disputed after settling
+    still lands in its group (with zero amounts). Orders settled before the
+    field existed are bucketed by their completion or last update instead.
+    """
+    refunded = {"$eq": ["$escrow_status", EscrowStatus.REFUNDED.value]}
+    released = {"$eq": ["$escrow_status", EscrowStatus.RELEASED.value]}
+    partial_refund = {"$ifNull": ["$refund_amount", 0]}
+    return [
+        *_orders_matching(_settled_between(start, end)),
+        {"$group": {
+            "_id": _group_key(SETTLED_AT, HOURLY),
+            "settled_orders": {"$sum": {"$cond": [{"$or": [refunded, released]}, 1, 0]}},
+            "escrow_released": {"$sum": {"$cond": [released, {"$subtract": ["$total_cost", partial_refund]}, 0]}},
+            "escrow_refunded": {"$sum": {"$cond": [
+                refunded, "$total_cost", {"$cond": [released, partial_refund, 0]}
+            ]}},
+            "fees_collected": {"$sum": {"$cond": [released, "$platform_fee", 0]}}
+        }},
+        _flatten(SETTLED_METRICS),
+        _merge_into(HOURLY, "merge")
+    ]
+
+
+def daily_pipeline(start: datetime, end: datetime) -> list:
+    return [
+        {"$match": {"bucket": {"$gte": start, "$lt": end}}},
+        {"$group": {
+            "_id": {"bucket": _truncate("$bucket", DAILY), **{field: f"${field}" for field in DIMENSIONS}},
+            **{metric: {"$sum": f"${metric}"} for metric in METRICS}
+        }},
+        _flatten(METRICS),
+        _merge_into(DAILY, "replace")
+    ]
+
+
+def hour_ranges(hours: set) -> list:
+    """
+    Coalesce hour starts into contiguous [start, end) ranges
+    """
+    ranges = []
+    for hour in sorted(hours):
+        if ranges and ranges[-1][1] == hour:
+            ranges[-1][1] = hour + timedelta(hours=1)
+        else:
+            ranges.append([hour, hour + timedelta(hours=1)])
+    return [tuple(window) for window in ranges]
+
+
+async def recompute(db, start: datetime, end: datetime):
+    """
+    Rebuild the hourly rows for [start, end) from orders, then the daily rows
+    of the days they fall in. The window's rows are cleared first, so a group
+    whose orders have all moved elsewhere drops out instead of keeping its
+    old totals, and running a window twice is harmless.
+    """
+    start, end = floor_hour(start), floor_hour(end - timedelta(microseconds=1)) + timedelta(hours=1)
+    # The created and settled pipelines each fill their own metrics of a row
+    await db[COLLECTIONS[HOURLY]].delete_many({"bucket": {"$gte": start, "$lt": end}})
+    await db.orders.aggregate(created_pipeline(start, end)).to_list(length=None)
+    await db.orders.aggregate(settled_pipeline(start, end)).to_list(length=None)
+
+    day_start, day_end = floor_day(start), floor_day(end - timedelta(microseconds=1)) + timedelta(days=1)
+    await db[COLLECTIONS[DAILY]].delete_many({"bucket": {"$gte": day_start, "$lt": day_end}})
+    await db[COLLECTIONS[HOURLY]].aggregate(daily_pipeline(day_start, day_end)).to_list(length=None)
+    registry.incr("analytics_rollup_hours", int((end - start).total_seconds() // 3600))
+
+
+async def first_order_at(db):
+    """
+    Creation time of the oldest order, hot or archived
+    """
+    firsts = [
+        await db[collection].find_one({}, {"created_at": 1}, sort=[("created_at", 1)])
+        for collection in ("orders", ARCHIVES["orders"])
+    ]
+    return min((first["created_at"] for first in firsts if first), default=None)
+
+
+def _with_derived(totals: dict) -> dict:
+    totals = {metric: round(totals.get(metric, 0), 2) for metric in METRICS}
+    totals["escrow_net"] = round(totals["gmv"] - totals["escrow_released"] - totals["escrow_refunded"], 2)
+    totals["average_order_value"] = round(totals["gmv"] / totals["orders"], 2) if totals["orders"] else 0.0
+    return totals
+
+
+def _add(into: dict, row: dict):
+    for metric in METRICS:
+        into[metric] = into.get(metric, 0) + row.get(metric, 0)
+
+
+async def query_rollups(db, start: datetime, end: datetime, granularity: str = DAILY,
+                        filters: dict = None, group_by: str = None) -> dict:
+    """
+    Totals, a per-bucket series and an optional per-dimension breakdown for
+    [start, end). Reads only rollup rows, so the cost depends on the number
+    of buckets and dimension values, never on the number of orders.
+    """
+    if granularity not in COLLECTIONS:
+        raise HTTPException(status_code=400, detail="granularity must be hour or day")
+    if group_by is not None and group_by not in DIMENSIONS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of {', '.join(DIMENSIONS)}")
+
+    floor = floor_hour if granularity == HOURLY else floor_day
+    step = timedelta(hours=1) if granularity == HOURLY else timedelta(days=1)
+    start = floor(start)
+    end = floor(end - timedelta(microseconds=1)) + step
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    if (end - start) / step > ANALYTICS_MAX_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"Range covers more than {ANALYTICS_MAX_BUCKETS} buckets")
+
+    query = {"bucket": {"$gte": start, "$lt": end}}
+    query.update({field: value for field, value in (filters or {}).items() if value is not None})
+
+    totals = {}
+    series = {}
+    breakdown = {}
+    async for row in db[COLLECTIONS[granularity]].find(query, {"_id": 0}):
+        _add(totals, row)
+        _add(series.setdefault(row["bucket"], {}), row)
+        if group_by:
+            _add(breakdown.setdefault(row[group_by], {}), row)
+
+    state = await db.analytics_state.find_one({"_id": STATE_ID}) or {}
+    return {
+        "granularity": granularity,
+        "start": start,
+        "end": end,
+        "as_of": state.get("watermark"),
+        "backfill": state.get("backfill"),
+        "totals": _with_derived(totals),
+        "series": [{"bucket": bucket, **_with_derived(series[bucket])} for bucket in sorted(series)],
+        "breakdown": [
+            {group_by: value, **_with_derived(breakdown[value])}
+            for value in sorted(breakdown, key=lambda value: -breakdown[value].get("gmv", 0))
+        ] if group_by else None
+    }
+
+
+class AnalyticsRollup:
+    """
+    Keeps analytics_hourly and analytics_daily current. Each pass reads the
+    orders updated since the stored watermark, recomputes only the hours
+    those orders are booked in and advances the watermark. Historical data
+    is filled in by a resumable backfill, one chunk of hours at a time.
+    """
+
+    def __init__(self):
+        self.lease = WorkerLease("analytics_rollup")
+
+    async def _state(self, db, now: datetime) -> dict:
+        state = await db.analytics_state.find_one({"_id": STATE_ID})
+        if state:
+            return state
+
+        # First run: pick up live updates from here on and backfill everything before
+        watermark = now - timedelta(seconds=ANALYTICS_LAG_SECONDS)
+        first = await first_order_at(db)
+        await db.analytics_state.update_one(
+            {"_id": STATE_ID},
+            {"$setOnInsert": {"watermark": watermark}},
+            upsert=True
+        )
+        if first:
+            await self.schedule_backfill(db, first, watermark)
+        return await db.analytics_state.find_one({"_id": STATE_ID})
+
+    async def refresh(self, db, now: datetime = None) -> int:
+        """
+        Fold order updates since the watermark into the rollups; returns the
+        number of hours recomputed
+        """
+        now = now or datetime.utcnow()
+        state = await self._state(db, now)
+        horizon = now - timedelta(seconds=ANALYTICS_LAG_SECONDS)
+        watermark = state["watermark"]
+
+        recomputed = 0
+        while watermark < horizon:
+            window_end = min(horizon, watermark + timedelta(minutes=ANALYTICS_MAX_WINDOW_MINUTES))
+            hours = set()
+            orders = db.orders.find(
+                {"updated_at": {"$gte": watermark, "$lt": window_end}},
+                {"created_at": 1, "escrow_settled_at": 1, "escrow_status": 1, "completed_at": 1, "updated_at": 1}
+            )
+            async for order in orders:
+                hours.add(floor_hour(order["created_at"]))
+                settled = settled_at(order)
+                if settled:
+                    hours.add(floor_hour(settled))
+
+            for start, end in hour_ranges(hours):
+                await recompute(db, start, end)
+                recomputed += int((end - start).total_seconds() // 3600)
+
+            await db.analytics_state.update_one({"_id": STATE_ID}, {"$max": {"watermark": window_end}})
+            watermark = window_end
+
+        registry.set_gauge("analytics_rollup_lag_seconds", (now - watermark).total_seconds())
+        return recomputed
+
+    async def schedule_backfill(self, db, start: datetime, end: datetime) -> dict:
+        backfill = {
+            "start": floor_hour(start),
+            "end": end,
+            "cursor": floor_hour(start),
+            "requested_at": datetime.utcnow(),
+            "finished_at": None
+        }
+        await db.analytics_state.update_one({"_id": STATE_ID}, {"$set": {"backfill": backfill}}, upsert=True)
+        return backfill
+
+    async def backfill_step(self, db) -> bool:
+        """
+        Recompute the next chunk of a pending backfill; returns whether more
+        chunks remain
+        """
+        state = await db.analytics_state.find_one({"_id": STATE_ID}, {"backfill": 1})
+        backfill = (state or {}).get("backfill")
+        if not backfill or backfill.get("finished_at"):
+            return False
+
+        cursor = backfill["cursor"]
+        chunk_end = min(backfill["end"], cursor + timedelta(hours=ANALYTICS_BACKFILL_CHUNK_HOURS))
+        if cursor < chunk_end:
+            await recompute(db, cursor, chunk_end)
+
+        done = chunk_end >= backfill["end"]
+        await db.analytics_state.update_one(
+            {"_id": STATE_ID, "backfill.requested_at": backfill["requested_at"]},
+            {"$set": {"backfill.cursor": chunk_end, "backfill.finished_at": datetime.utcnow() if done else None}}
+        )
+        if done:
+            logger.info(f"Analytics backfill finished for {backfill['start']} to {backfill['end']}")
+        return not done
+
+    async def _refresh_and_backfill(self, db, until: float):
+        await self.refresh(db)
+        # Spend the time until the next refresh on backfill chunks, pausing between them
+        while asyncio.get_running_loop().time() < until and await self.backfill_step(db):
+            await asyncio.sleep(ANALYTICS_BACKFILL_PAUSE_SECONDS)
+
+    async def run(self, db):
+        loop = asyncio.get_running_loop()
+        while True:
+            next_refresh = loop.time() + ANALYTICS_REFRESH_SECONDS
+            try:
+                await self.lease.run_exclusive(db, lambda: self._refresh_and_backfill(db, next_refresh))
+            except Exception as e:
+                logger.error(f"Analytics rollup failed: {e}")
+            await asyncio.sleep(max(0, next_refresh - loop.time()))
+
+
+analytics_rollup = AnalyticsRollup()
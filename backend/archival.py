@@ -0,0 +1,187 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from pymongo import DeleteOne, ReplaceOne
+from pymongo.errors import CollectionInvalid
+from metrics import registry
+from models import OrderStatus
+from order_state import DISPUTE_WINDOW_DAYS
+from worker_leases import WorkerLease
+
+logger = logging.getLogger(__name__)
+
+# Finished orders untouched for this long move to orders_archive, along with their embedded messages
+ARCHIVE_ORDERS_AFTER_DAYS = int(os.getenv("ARCHIVE_ORDERS_AFTER_DAYS", "90"))
+ARCHIVE_TRANSACTIONS_AFTER_DAYS = int(os.getenv("ARCHIVE_TRANSACTIONS_AFTER_DAYS", "365"))
+ARCHIVE_INTERVAL_SECONDS = int(os.getenv("ARCHIVE_INTERVAL_SECONDS", "3600"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+# Pause between batches so a large first run does not crowd out live traffic
+ARCHIVE_BATCH_PAUSE_SECONDS = float(os.getenv("ARCHIVE_BATCH_PAUSE_SECONDS", "0.5"))
+# WiredTiger block compressor for the archive collections; empty keeps the server default
+ARCHIVE_BLOCK_COMPRESSOR = os.getenv("ARCHIVE_BLOCK_COMPRESSOR", "zstd")
+
+ARCHIVABLE_STATUSES = [
+    OrderStatus.APPROVED.value,
+    OrderStatus.COMPLETED.value,
+    OrderStatus.REFUNDED.value,
+    OrderStatus.CANCELLED.value
+]
+
+ARCHIVES = {"orders": "orders_archive", "transactions": "transactions_archive"}
+# Settled orders stay hot until they can no longer be disputed, as transitions only read db.orders
+ARCHIVE_AFTER_DAYS = {
+    "orders": max(ARCHIVE_ORDERS_AFTER_DAYS, DISPUTE_WINDOW_DAYS),
+    "transactions": ARCHIVE_TRANSACTIONS_AFTER_DAYS
+}
+
+HISTORY_INDEXES = {
+    "orders": [[("buyer_id", 1), ("created_at", -1)], [("seller_id", 1), ("created_at", -1)]],
+    "transactions": [[("user_id", 1), ("created_at", -1)]],
+}
+
+
+async def ensure_indexes(db):
+    await db.orders.create_index([("status", 1), ("updated_at", 1)])
+    await db.transactions.create_index("created_at")
+
+    existing = await db.list_collection_names()
+    for collection, archive in ARCHIVES.items():
+        if archive not in existing and ARCHIVE_BLOCK_COMPRESSOR:
+            try:
+                await db.create_collection(archive, storageEngine={
+                    "wiredTiger": {"configString": f"block_compressor={ARCHIVE_BLOCK_COMPRESSOR}"}
+                })
+            except CollectionInvalid:
+                pass
+        for keys in HISTORY_INDEXES[collection]:
+            await db[collection].create_index(keys)
+            await db[archive].create_index(keys)
+
+
+def archive_horizon(collection: str, now: datetime = None) -> datetime:
+    """
+    Nothing created after this has been archived yet, so history queries
+    that stay newer never need the archive
+    """
+    return (now or datetime.utcnow()) - timedelta(days=ARCHIVE_AFTER_DAYS[collection])
+
+
+async def find_one_with_archive(db, collection: str, query: dict, projection: dict = None):
+    document = await db[collection].find_one(query, projection)
+    if document is None:
+        document = await db[ARCHIVES[collection]].find_one(query, projection)
+    return document
+
+
+async def find_history(db, collection: str, query: dict, limit: int = 100, sort_field: str = "created_at") -> list:
+    """
+    Newest-first documents matching `query` across the hot collection and
+    its archive. The archive is only read when the hot page is short or
+    reaches back past the archive horizon.
+    """
+    documents = await db[collection].find(query).sort(sort_field, -1).limit(limit).to_list(length=limit)
+    if len(documents) == limit and documents[-1][sort_field] >= archive_horizon(collection):
+        return documents
+
+    archived = await db[ARCHIVES[collection]].find(query).sort(sort_field, -1).limit(limit).to_list(length=limit)
+    # A document being archived can briefly sit in both; the hot copy wins
+    hot_ids = {document["_id"] for document in documents}
+    documents.extend(document for document in archived if document["_id"] not in hot_ids)
+    documents.sort(key=lambda document: document[sort_field], reverse=True)
+    return documents[:limit]
+
+
+async def iter_with_archive(db, collection: str, query: dict, projection: dict = None):
+    """
+    Every matching document, hot collection first, for rebuilds and backfills
+    """
+    seen = set()
+    async for document in db[collection].find(query, projection):
+        seen.add(document["_id"])
+        yield document
+    async for document in db[ARCHIVES[collection]].find(query, projection):
+        if document["_id"] not in seen:
+            yield document
+
+
+class Archiver:
+    """
+    Moves finished orders and old transactions into their archive
+    collections in batches. Each document is copied first and then deleted
+    only if it has not changed since the copy, so a crash or a concurrent
+    update never loses data; the hot copy stays authoritative until the
+    delete lands.
+    """
+
+    def __init__(self):
+        self.lease = WorkerLease("archiver")
+
+    async def _move(self, db, collection: str, documents: list, guard_field: str = None, now: datetime = None) -> int:
+        if not documents:
+            return 0
+        now = now or datetime.utcnow()
+        archive = db[ARCHIVES[collection]]
+
+        await archive.bulk_write([
+            ReplaceOne({"_id": document["_id"]}, {**document, "archived_at": now}, upsert=True)
+            for document in documents
+        ], ordered=False)
+        result = await db[collection].bulk_write([
+            DeleteOne({"_id": document["_id"], **({guard_field: document[guard_field]} if guard_field else {})})
+            for document in documents
+        ], ordered=False)
+
+        if result.deleted_count < len(documents):
+            # Changed while being copied: drop the stale archive copies and retry on a later pass
+            ids = [document["_id"] for document in documents]
+            still_hot = await db[collection].find({"_id": {"$in": ids}}, {"_id": 1}).to_list(length=len(ids))
+            await archive.delete_many({"_id": {"$in": [document["_id"] for document in still_hot]}})
+
+        registry.incr("archived_documents", result.deleted_count, collection=collection)
+        return result.deleted_count
+
+    async def archive_orders(self, db, now: datetime = None) -> int:
+        now = now or datetime.utcnow()
+        orders = await db.orders.find({
+            "status": {"$in": ARCHIVABLE_STATUSES},
+            "updated_at": {"$lt": archive_horizon("orders", now)}
+        }).sort("updated_at", 1).limit(ARCHIVE_BATCH_SIZE).to_list(length=ARCHIVE_BATCH_SIZE)
+        await self._move(db, "orders", orders, guard_field="updated_at", now=now)
+        return len(orders)
+
+    async def archive_transactions(self, db, now: datetime = None) -> int:
+        now = now or datetime.utcnow()
+        transactions = await db.transactions.find({
+            "created_at": {"$lt": archive_horizon("transactions", now)}
+        }).sort("created_at", 1).limit(ARCHIVE_BATCH_SIZE).to_list(length=ARCHIVE_BATCH_SIZE)
+        # Transactions are never updated, so no guard is needed
+        await self._move(db, "transactions", transactions, now=now)
+        return len(transactions)
+
+    async def archive_all(self, db) -> int:
+        """
+        Archive batches until nothing is left past the cutoffs
+        """
+        moved = 0
+        for archive_batch in (self.archive_orders, self.archive_transactions):
+            while True:
+                found = await archive_batch(db)
+                moved += found
+                if found < ARCHIVE_BATCH_SIZE:
+                    break
+                await asyncio.sleep(ARCHIVE_BATCH_PAUSE_SECONDS)
+        return moved
+
+    async def run(self, db):
+        while True:
+            try:
+                moved = await self.lease.run_exclusive(db, lambda: self.archive_all(db))
+                if moved:
+                    logger.info(f"Archived {moved} orders and transactions")
+            except Exception as e:
+                logger.error(f"Archival failed: {e}")
+            await asyncio.sleep(ARCHIVE_INTERVAL_SECONDS)
+
+
+archiver = Archiver()
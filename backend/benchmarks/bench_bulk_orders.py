@@ -0,0 +1,137 @@
+"""
+Bulk order creation against one-at-a-time creation.
+
+Seeds a scratch database with one buyer, one seller and a set of campaign
+services, then creates the same batch of orders with N single create calls
+and with one bulk create call, reporting wall time and MongoDB round trips.
+Needs a running MongoDB; run from the backend directory:
+    MONGO_URL=mongodb://localhost:27017 python -m benchmarks.bench_bulk_orders --orders 100 --rounds 5
+"""
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+import sys
+sys.path.append('/app/backend')
+from models import ServiceType
+from routes.orders import CreateOrderRequest, BulkCreateOrderRequest, _create_order, _bulk_create_orders
+
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+async def seed(db, services: int) -> tuple:
+    now = datetime.utcnow()
+    seller = await db.users.insert_one({
+        "email": "bench-seller@example.com",
+        "full_name": "Bench Seller",
+        "role": "seller",
+        "seller_profile": {"tier": "established"},
+        "created_at": now
+    })
+    buyer = await db.users.insert_one({
+        "email": "bench-buyer@example.com",
+        "full_name": "Bench Buyer",
+        "role": "buyer",
+        "buyer_profile": {"credit_balance": 0.0},
+        "created_at": now
+    })
+    service_types = [ServiceType.CAMPAIGN_SUPPORT, ServiceType.LAUNCH_PACKAGE, ServiceType.ENGAGEMENT_BUNDLE]
+    result = await db.service_listings.insert_many([
+        {
+            "seller_id": str(seller.inserted_id),
+            "title": f"Campaign service {i}",
+            "service_type": service_types[i % len(service_types)].value,
+            "platform": "linkedin",
+            "base_price": 10.0 + i,
+            "turnaround_hours": 48,
+            "active": True,
+            "created_at": now
+        }
+        for i in range(services)
+    ])
+    return str(buyer.inserted_id), [str(service_id) for service_id in result.inserted_ids]
+
+
+async def fund_buyer(db, buyer_id: str) -> dict:
+    await db.users.update_one({"email": "bench-buyer@example.com"}, {"$set": {"buyer_profile.credit_balance": 1e9}})
+    buyer = await db.users.find_one({"email": "bench-buyer@example.com"})
+    buyer["_id"] = buyer_id
+    return buyer
+
+
+async def run(mongo_url: str, orders: int, rounds: int) -> dict:
+    counter = CommandCounter()
+    client = AsyncIOMotorClient(mongo_url, event_listeners=[counter])
+    db_name = f"bench_bulk_orders_{os.getpid()}"
+    db = client[db_name]
+
+    try:
+        buyer_id, service_ids = await seed(db, services=min(orders, 20))
+        items = [
+            CreateOrderRequest(service_id=service_ids[i % len(service_ids)], platform="linkedin", brief=f"Post {i}")
+            for i in range(orders)
+        ]
+
+        single_times, bulk_times = [], []
+        single_commands = bulk_commands = 0
+        for _ in range(rounds):
+            buyer = await fund_buyer(db, buyer_id)
+            counter.count = 0
+            started = time.perf_counter()
+            for item in items:
+                # Each real request re-reads the user in get_current_user
+                await _create_order(item, buyer, db)
+                buyer = await db.users.find_one({"email": "bench-buyer@example.com"})
+                buyer["_id"] = buyer_id
+            single_times.append(time.perf_counter() - started)
+            single_commands = counter.count
+
+            buyer = await fund_buyer(db, buyer_id)
+            counter.count = 0
+            started = time.perf_counter()
+            await _bulk_create_orders(BulkCreateOrderRequest(items=items), buyer, db)
+            bulk_times.append(time.perf_counter() - started)
+            bulk_commands = counter.count
+    finally:
+        await client.drop_database(db_name)
+        client.close()
+
+    return {
+        "single_seconds": min(single_times),
+        "bulk_seconds": min(bulk_times),
+        "single_commands": single_commands,
+        "bulk_commands": bulk_commands,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--mongo-url", default=os.getenv("MONGO_URL", "mongodb://localhost:27017"))
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.mongo_url, args.orders, args.rounds))
+    print(f"orders per batch={args.orders} rounds={args.rounds} (best of)")
+    print(f"{args.orders} single calls: {result['single_seconds'] * 1000:8.1f}ms  {result['single_commands']:5} round trips")
+    print(f"1 bulk call:      {result['bulk_seconds'] * 1000:8.1f}ms  {result['bulk_commands']:5} round trips")
+    print(f"speedup: {result['single_seconds'] / result['bulk_seconds']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Token verification throughput with and without the claims cache.
+
+Run from the backend directory:
+    python -m benchmarks.bench_jwt_verify --tokens 1000 --verifications 100000
+"""
+import argparse
+import random
+import time
+import sys
+sys.path.append('/app/backend')
+from utils import create_access_token, verify_token, token_cache
+
+
+def run(tokens: list, verifications: int, use_cache: bool) -> float:
+    token_cache.clear()
+    start = time.perf_counter()
+    for _ in range(verifications):
+        assert verify_token(random.choice(tokens), use_cache=use_cache) is not None
+    return verifications / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=int, default=1000, help="distinct active tokens")
+    parser.add_argument("--verifications", type=int, default=50000)
+    args = parser.parse_args()
+
+    tokens = [
+        create_access_token({"sub": f"user-{i}", "email": f"user-{i}@example.com"})
+        for i in range(args.tokens)
+    ]
+
+    uncached = run(tokens, args.verifications, use_cache=False)
+    cached = run(tokens, args.verifications, use_cache=True)
+
+    print(f"tokens={args.tokens} verifications={args.verifications}")
+    print(f"without cache: {uncached:,.0f} verifications/s")
+    print(f"with cache:    {cached:,.0f} verifications/s ({cached / uncached:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
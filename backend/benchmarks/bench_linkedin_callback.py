@@ -0,0 +1,74 @@
+"""
+LinkedIn callback latency under concurrency, against the local fake API.
+
+Each simulated callback does what the real one does: exchange the OAuth
+code, read the member profile and fetch metrics, over the shared pooled
+client. Run from the backend directory:
+    python -m benchmarks.bench_linkedin_callback --callbacks 500 --concurrency 1 10 50 --latency-ms 50
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import httpx
+import sys
+sys.path.append('/app/backend')
+from fakes.linkedin_api import create_app
+from linkedin_client import LinkedInClient, LinkedInApiProvider, CircuitOpenError, ProviderError
+
+
+async def run(callbacks: int, concurrency: int, latency_ms: float, failure_rate: float) -> dict:
+    transport = httpx.ASGITransport(app=create_app(latency_ms=latency_ms, failure_rate=failure_rate))
+    base_url = "http://linkedin.fake"
+    provider = LinkedInApiProvider(LinkedInClient(base_url=base_url, auth_base_url=base_url, transport=transport))
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def callback(i: int):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await provider.fetch_metrics({"user_id": str(i), "code": f"code-{i}"})
+            except (ProviderError, CircuitOpenError):
+                errors += 1
+                return
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(callback(i) for i in range(callbacks)))
+    elapsed = time.perf_counter() - started
+    await provider.close()
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "throughput": callbacks / elapsed,
+        "p50": statistics.median(latencies) if latencies else 0,
+        "p95": latencies[int(len(latencies) * 0.95) - 1] if latencies else 0,
+        "p99": latencies[int(len(latencies) * 0.99) - 1] if latencies else 0,
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--callbacks", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    print(f"callbacks={args.callbacks} fake latency={args.latency_ms}ms failure rate={args.failure_rate}")
+    for concurrency in args.concurrency:
+        result = asyncio.run(run(args.callbacks, concurrency, args.latency_ms, args.failure_rate))
+        print(
+            f"concurrency={result['concurrency']:>4}  {result['throughput']:8.1f} callbacks/s  "
+            f"p50={result['p50']:7.1f}ms  p95={result['p95']:7.1f}ms  p99={result['p99']:7.1f}ms  "
+            f"errors={result['errors']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Near-duplicate perceptual hash lookups: multi-index hashing against a linear scan.
+
+Builds the index over N random 64-bit hashes, plants near-duplicates of
+indexed hashes (a few bits flipped) among random queries, and reports
+build time, memory, per-query latency and recall against a brute-force
+scan. Needs no database; run from the backend directory:
+    python -m benchmarks.bench_phash_index --sizes 1000000,10000000 --queries 1000
+"""
+import argparse
+import time
+import numpy as np
+import sys
+sys.path.append('/app/backend')
+from phash_index import PHashIndex, PHASH_MATCH_DISTANCE, popcount
+
+
+def flip_bits(rng, value: int, bits: int) -> int:
+    for bit in rng.choice(64, size=bits, replace=False):
+        value ^= 1 << int(bit)
+    return value
+
+
+def run(size: int, queries: int, radius: int, scans: int, rng) -> dict:
+    hashes = rng.integers(0, 2 ** 64, size=size, dtype=np.uint64)
+
+    started = time.perf_counter()
+    index = PHashIndex()
+    index.build(hashes)
+    build_seconds = time.perf_counter() - started
+
+    # Half the queries are near-duplicates of indexed hashes, half are unrelated
+    planted = [
+        flip_bits(rng, int(hashes[i]), int(rng.integers(0, radius + 1)))
+        for i in rng.integers(0, size, size=queries // 2)
+    ]
+    unrelated = [int(value) for value in rng.integers(0, 2 ** 64, size=queries - len(planted), dtype=np.uint64)]
+    probes = planted + unrelated
+
+    started = time.perf_counter()
+    results = [index.query(value, radius) for value in probes]
+    query_seconds = time.perf_counter() - started
+    found_planted = sum(1 for result in results[:len(planted)] if result)
+
+    # Linear scan over every hash for a handful of queries, to check recall and compare latency
+    scanned = probes[:scans // 2] + probes[len(planted):len(planted) + scans // 2]
+    started = time.perf_counter()
+    expected = []
+    for value in scanned:
+        distances = popcount(hashes ^ np.uint64(value))
+        expected.append(set(hashes[distances <= radius].tolist()))
+    scan_seconds = (time.perf_counter() - started) / len(scanned)
+    got = [set(match for match, _ in index.query(value, radius)) for value in scanned]
+    recall_hits = sum(len(e & g) for e, g in zip(expected, got))
+    recall_total = sum(len(e) for e in expected)
+
+    return {
+        "size": size,
+        "substrings": len(index._spans),
+        "build_seconds": build_seconds,
+        "index_mb": index.nbytes / 1024 / 1024,
+        "query_ms": query_seconds / len(probes) * 1000,
+        "scan_ms": scan_seconds * 1000,
+        "planted_found": found_planted / len(planted),
+        "recall": recall_hits / recall_total if recall_total else 1.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000000,10000000", help="comma-separated index sizes")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--radius", type=int, default=PHASH_MATCH_DISTANCE)
+    parser.add_argument("--scans", type=int, default=20, help="queries also answered by a linear scan")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    for size in (int(size) for size in args.sizes.split(",")):
+        result = run(size, args.queries, args.radius, args.scans, rng)
+        print(
+            f"{result['size']:>10,} hashes  m={result['substrings']}  "
+            f"build {result['build_seconds']:.2f}s  {result['index_mb']:.0f} MB  "
+            f"query {result['query_ms']:.3f} ms  scan {result['scan_ms']:.1f} ms  "
+            f"speedup {result['scan_ms'] / result['query_ms']:.1f}x  "
+            f"planted found {result['planted_found']:.0%}  recall {result['recall']:.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import uuid
+from datetime import datetime
+from pathlib import Path
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+from pymongo import ReturnDocument, UpdateMany
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# "local" keeps blobs on disk under BLOB_STORAGE_DIR, "gridfs" keeps them in MongoDB
+BLOB_BACKEND = os.getenv("BLOB_BACKEND", "local")
+BLOB_STORAGE_DIR = os.getenv("BLOB_STORAGE_DIR", str(Path(__file__).parent / "uploads"))
+BLOB_MAX_BYTES = int(os.getenv("BLOB_MAX_BYTES", str(20 * 1024 * 1024)))
+BLOB_CHUNK_SIZE = int(os.getenv("BLOB_CHUNK_SIZE", str(256 * 1024)))
+# Room for the multipart boundaries and part headers around an upload of BLOB_MAX_BYTES
+BLOB_UPLOAD_OVERHEAD_BYTES = int(os.getenv("BLOB_UPLOAD_OVERHEAD_BYTES", str(64 * 1024)))
+UPLOAD_PATH = "/api/blobs"
+
+ALLOWED_CONTENT_TYPES = {
+    "image/png",
+    "image/jpeg",
+    "image/gif",
+    "image/webp",
+    "application/pdf",
+    "video/mp4",
+    "text/plain",
+}
+
+# Documents reference blobs as "blob:<sha256 hex>"
+BLOB_REF_PREFIX = "blob:"
+BLOB_ID_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+def blob_ref(blob_id: str) -> str:
+    return f"{BLOB_REF_PREFIX}{blob_id}"
+
+
+def parse_blob_ref(ref: str):
+    """
+    Blob id from a "blob:<sha256>" reference, or None for anything else
+    """
+    if not ref.startswith(BLOB_REF_PREFIX):
+        return None
+    blob_id = ref[len(BLOB_REF_PREFIX):]
+    return blob_id if BLOB_ID_PATTERN.match(blob_id) else None
+
+
+class LocalBlobBackend:
+    """
+    Blobs as files named by their SHA-256, fanned out over two directory levels
+    """
+
+    name = "local"
+
+    def __init__(self, root: str = BLOB_STORAGE_DIR):
+        self.root = Path(root)
+        self.tmp = self.root / ".tmp"
+
+    def _path(self, blob_id: str) -> Path:
+        return self.root / blob_id[:2] / blob_id[2:4] / blob_id
+
+    async def open_writer(self):
+        self.tmp.mkdir(parents=True, exist_ok=True)
+        fd, path = tempfile.mkstemp(dir=self.tmp)
+        return os.fdopen(fd, "wb"), path
+
+    async def write(self, writer, chunk: bytes):
+        await asyncio.to_thread(writer[0].write, chunk)
+
+    async def discard(self, writer):
+        writer[0].close()
+        os.unlink(writer[1])
+
+    async def commit(self, writer, blob_id: str) -> dict:
+        writer[0].close()
+        path = self._path(blob_id)
+        if path.exists():
+            os.unlink(writer[1])
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(writer[1], path)
+        return {"path": str(path.relative_to(self.root))}
+
+    async def delete(self, location: dict):
+        try:
+            os.unlink(self.root / location["path"])
+        except FileNotFoundError:
+            pass
+
+    async def read_range(self, location: dict, start: int, length: int):
+        f = await asyncio.to_thread(open, self.root / location["path"], "rb")
+        try:
+            f.seek(start)
+            while length > 0:
+                chunk = await asyncio.to_thread(f.read, min(BLOB_CHUNK_SIZE, length))
+                if not chunk:
+                    break
+                length -= len(chunk)
+                yield chunk
+        finally:
+            f.close()
+
+
+class GridFSBlobBackend:
+    """
+    Blobs as GridFS files, uploaded under a temporary name and renamed to
+    their SHA-256 once the digest is known
+    """
+
+    name = "gridfs"
+
+    def __init__(self, db):
+        from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+        self.bucket = AsyncIOMotorGridFSBucket(db, bucket_name="blob_files", chunk_size_bytes=BLOB_CHUNK_SIZE)
+
+    async def open_writer(self):
+        return self.bucket.open_upload_stream(f"upload-{uuid.uuid4().hex}")
+
+    async def write(self, writer, chunk: bytes):
+        await writer.write(chunk)
+
+    async def discard(self, writer):
+        await writer.abort()
+
+    async def commit(self, writer, blob_id: str) -> dict:
+        await writer.close()
+        await self.bucket.rename(writer._id, blob_id)
+        return {"file_id": writer._id}
+
+    async def delete(self, location: dict):
+        await self.bucket.delete(location["file_id"])
+
+    async def read_range(self, location: dict, start: int, length: int):
+        grid_out = await self.bucket.open_download_stream(location["file_id"])
+        grid_out.seek(start)
+        while length > 0:
+            chunk = await grid_out.read(min(BLOB_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+_backends = {}
+
+
+def get_backend(db, name: str = None):
+    name = name or BLOB_BACKEND
+    if name not in _backends:
+        if name == "gridfs":
+            _backends[name] = GridFSBlobBackend(db)
+        else:
+            _backends[name] = LocalBlobBackend()
+    return _backends[name]
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Caps the request body of blob uploads before the multipart parser spools
+    it to disk: a declared Content-Length over the limit is refused outright,
+    and a body that streams past it is cut off with a 413.
+    """
+
+    def __init__(self, app, max_bytes: int = BLOB_MAX_BYTES + BLOB_UPLOAD_OVERHEAD_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"].rstrip("/") != UPLOAD_PATH:
+            await self.app(scope, receive, send)
+            return
+
+        detail = f"File exceeds {BLOB_MAX_BYTES} bytes"
+        content_length = Headers(scope=scope).get("content-length", "")
+        if content_length.isdigit() and int(content_length) > self.max_bytes:
+            registry.incr("blob_uploads_rejected", reason="too_large")
+            await JSONResponse({"detail": detail}, status_code=413)(scope, receive, send)
+            return
+
+        received = 0
+
+        async def capped_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    registry.incr("blob_uploads_rejected", reason="too_large")
+                    # Raised inside the route's body parsing, which passes HTTPExceptions through
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, capped_receive, send)
+
+
+def _serialize(blob: dict, deduplicated: bool = False) -> dict:
+    return {
+        "ref": blob_ref(blob["_id"]),
+        "sha256": blob["_id"],
+        "size": blob["size"],
+        "content_type": blob["content_type"],
+        "deduplicated": deduplicated
+    }
+
+
+async def store_upload(db, upload, user_id: str) -> dict:
+    """
+    Stream an UploadFile into the blob store, hashing as it goes. The request
+    body itself is capped by UploadSizeLimitMiddleware; this checks the file
+    alone against BLOB_MAX_BYTES. Content
+    already stored under the same digest is not written twice; the uploader
+    is just added to the blob's readers.
+    """
+    content_type = (upload.content_type or "").split(";")[0].strip().lower()
+    if content_type not in ALLOWED_CONTENT_TYPES:
+        raise HTTPException(status_code=415, detail=f"Unsupported file type: {content_type or 'unknown'}")
+
+    backend = get_backend(db)
+    writer = await backend.open_writer()
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        while True:
+            chunk = await upload.read(BLOB_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > BLOB_MAX_BYTES:
+                raise HTTPException(status_code=413, detail=f"File exceeds {BLOB_MAX_BYTES} bytes")
+            digest.update(chunk)
+            await backend.write(writer, chunk)
+    except BaseException:
+        await backend.discard(writer)
+        raise
+    if not size:
+        await backend.discard(writer)
+        raise HTTPException(status_code=400, detail="Empty file")
+
+    blob_id = digest.hexdigest()
+    existing = await db.blobs.find_one_and_update(
+        {"_id": blob_id}, {"$addToSet": {"readers": user_id}}, return_document=ReturnDocument.AFTER
+    )
+    if existing:
+        await backend.discard(writer)
+        registry.incr("blob_uploads", deduplicated="true")
+        registry.incr("blob_bytes_deduplicated", size)
+        return _serialize(existing, deduplicated=True)
+
+    location = await backend.commit(writer, blob_id)
+    blob = {
+        "size": size,
+        "content_type": content_type,
+        "backend": backend.name,
+        "location": location,
+        "uploaded_by": user_id,
+        "created_at": datetime.utcnow()
+    }
+    raced = await db.blobs.find_one_and_update(
+        {"_id": blob_id},
+        {"$setOnInsert": blob, "$addToSet": {"readers": user_id}},
+        upsert=True,
+        return_document=ReturnDocument.BEFORE
+    )
+    if raced and raced["location"] != location:
+        # A concurrent upload of the same bytes won; drop our copy
+        await backend.delete(location)
+    registry.incr("blob_uploads", deduplicated="false")
+    registry.incr("blob_bytes_stored", size)
+    return _serialize({"_id": blob_id, **blob}, deduplicated=bool(raced))
+
+
+async def resolve_attachments(db, refs: list, user_id: str) -> list:
+    """
+    Validate attachment references submitted by a user. Blob references must
+    point at blobs the user uploaded or can read; inline base64 is rejected
+    so it never lands in a document. Plain URLs pass through.
+    """
+    blob_ids = set()
+    for ref in refs:
+        if ref.startswith("data:"):
+            raise HTTPException(status_code=400, detail="Upload files to /api/blobs and attach the returned ref")
+        if ref.startswith(BLOB_REF_PREFIX):
+            blob_id = parse_blob_ref(ref)
+            if not blob_id:
+                raise HTTPException(status_code=400, detail=f"Invalid blob reference: {ref}")
+            blob_ids.add(blob_id)
+
+    if blob_ids:
+        found = await db.blobs.count_documents({"_id": {"$in": list(blob_ids)}, "readers": user_id})
+        if found != len(blob_ids):
+            raise HTTPException(status_code=400, detail="Unknown blob reference")
+    return refs
+
+
+async def grant_readers(db, refs: list, user_ids: list):
+    """
+    Let the other parties to an order or dispute download its attachments
+    """
+    await grant_readers_many(db, [(refs, user_ids)])
+
+
+async def grant_readers_many(db, grants: list):
+    operations = []
+    for refs, user_ids in grants:
+        blob_ids = [blob_id for blob_id in map(parse_blob_ref, refs) if blob_id]
+        if blob_ids:
+            operations.append(UpdateMany(
+                {"_id": {"$in": blob_ids}}, {"$addToSet": {"readers": {"$each": user_ids}}}
+            ))
+    if operations:
+        await db.blobs.bulk_write(operations, ordered=False)
+
+
+async def get_blob(db, blob_id: str, user: dict) -> dict:
+    if not BLOB_ID_PATTERN.match(blob_id):
+        raise HTTPException(status_code=404, detail="Blob not found")
+    blob = await db.blobs.find_one({"_id": blob_id})
+    if not blob:
+        raise HTTPException(status_code=404, detail="Blob not found")
+    if user["_id"] not in blob.get("readers", []) and not user.get("is_mediator"):
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return blob
+
+
+def parse_range(header: str, size: int):
+    """
+    (start, end) for a single "bytes=" range, None when the header is absent
+    or unusable, and a 416 when it lies outside the blob
+    """
+    if not header:
+        return None
+    match = re.fullmatch(r"\s*bytes=(\d*)-(\d*)\s*", header)
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if first == "":
+        # Suffix range: the last N bytes
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+
+def read_blob(db, blob: dict, start: int, length: int):
+    registry.incr("blob_bytes_served", length)
+    return get_backend(db, blob["backend"]).read_range(blob["location"], start, length)
+
+
+async def load_blob(db, blob_id: str, max_bytes: int = BLOB_MAX_BYTES):
+    """
+    (metadata, content) for a blob small enough to hold in memory, or None
+    """
+    blob = await db.blobs.find_one({"_id": blob_id}, {"readers": 0})
+    if not blob or blob["size"] > max_bytes:
+        return None
+    chunks = [chunk async for chunk in get_backend(db, blob["backend"]).read_range(blob["location"], 0, blob["size"])]
+    return blob, b"".join(chunks)
@@ -0,0 +1,162 @@
+import asyncio
+import gzip
+import logging
+import os
+from starlette.datastructures import Headers, MutableHeaders
+from metrics import registry
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, fall back to gzip only
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Responses smaller than this are sent as-is
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+# Bodies at or above this size are compressed in a worker thread
+COMPRESSION_OFFLOAD_SIZE = int(os.getenv("COMPRESSION_OFFLOAD_SIZE", str(64 * 1024)))
+GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+
+# Uncompressed payload budget in bytes, per route template
+DEFAULT_PAYLOAD_BUDGET = int(os.getenv("PAYLOAD_BUDGET_BYTES", str(256 * 1024)))
+PAYLOAD_BUDGETS = {
+    "/api/services/search": 512 * 1024,
+    "/api/orders/buyer": 512 * 1024,
+    "/api/orders/seller": 512 * 1024,
+    "/api/blobs/{blob_id}": int(os.getenv("BLOB_MAX_BYTES", str(20 * 1024 * 1024))),
+}
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript")
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def choose_encoding(accept_encoding: str):
+    """
+    Pick the best supported encoding from an Accept-Encoding header
+    """
+    supported = ["br", "gzip"] if brotli is not None else ["gzip"]
+    preferences = {}
+    for part in accept_encoding.split(","):
+        fields = part.strip().split(";")
+        coding = fields[0].strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in fields[1:]:
+            param = param.strip()
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        preferences[coding] = q
+
+    best, best_q = None, 0.0
+    for coding in supported:
+        q = preferences.get(coding, preferences.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def get_route_path(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+def record_payload(route_path: str, raw_size: int, wire_size: int):
+    registry.observe("response_payload_bytes", raw_size, route=route_path)
+    registry.observe("response_wire_bytes", wire_size, route=route_path)
+
+    budget = PAYLOAD_BUDGETS.get(route_path, DEFAULT_PAYLOAD_BUDGET)
+    if raw_size > budget:
+        registry.incr("response_budget_exceeded", route=route_path)
+        logger.warning(
+            f"Response for {route_path} is {raw_size} bytes, over its {budget} byte budget"
+        )
+
+
+class CompressionMiddleware:
+    """
+    Negotiated gzip/brotli compression with payload-size metrics.
+
+    Single-message bodies are buffered and compressed when they are large
+    enough; streamed bodies pass through untouched and are only measured.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE,
+                 offload_size: int = COMPRESSION_OFFLOAD_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.offload_size = offload_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        encoding = choose_encoding(request_headers.get("accept-encoding", ""))
+        if "range" in request_headers:
+            encoding = None
+
+        start_message = None
+        streaming = False
+        raw_size = 0
+        wire_size = 0
+
+        async def send_wrapper(message):
+            nonlocal start_message, streaming, raw_size, wire_size
+
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            raw_size += len(body)
+
+            if streaming or more_body:
+                if not streaming:
+                    streaming = True
+                    await send(start_message)
+                wire_size += len(body)
+                await send(message)
+                if not more_body:
+                    record_payload(get_route_path(scope), raw_size, wire_size)
+                return
+
+            headers = MutableHeaders(raw=start_message["headers"])
+            content_type = headers.get("content-type", "")
+            if (
+                encoding is not None
+                and len(body) >= self.minimum_size
+                and "content-encoding" not in headers
+                and content_type.startswith(COMPRESSIBLE_TYPES)
+            ):
+                if len(body) >= self.offload_size:
+                    body = await asyncio.to_thread(_compress, body, encoding)
+                else:
+                    body = _compress(body, encoding)
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(body))
+                headers.add_vary_header("Accept-Encoding")
+                message = {"type": "http.response.body", "body": body}
+
+            wire_size = len(body)
+            await send(start_message)
+            await send(message)
+            record_payload(get_route_path(scope), raw_size, wire_size)
+
+        await self.app(scope, receive, send_wrapper)
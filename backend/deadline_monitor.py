@@ -0,0 +1,268 @@
+import asyncio
+import heapq
+import logging
+import os
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import UpdateOne
+from metrics import registry
+from models import OrderStatus
+from notifications import notify_many, order_notice
+from order_state import bulk_transition_orders, refund_orders
+from seller_stats import record_events
+from worker_leases import WorkerLease
+
+logger = logging.getLogger(__name__)
+
+# Hours after the deadline before a late order is cancelled and refunded
+DEADLINE_GRACE_HOURS = int(os.getenv("DEADLINE_GRACE_HOURS", "24"))
+# How often the timer heap is topped up from the deadline index, and how far ahead it looks
+DEADLINE_RELOAD_SECONDS = int(os.getenv("DEADLINE_RELOAD_SECONDS", "300"))
+DEADLINE_HORIZON_SECONDS = int(os.getenv("DEADLINE_HORIZON_SECONDS", str(2 * DEADLINE_RELOAD_SECONDS)))
+DEADLINE_BATCH_SIZE = int(os.getenv("DEADLINE_BATCH_SIZE", "500"))
+# Most orders read into the heap per reload; a larger backlog is worked through page by page
+DEADLINE_LOAD_LIMIT = int(os.getenv("DEADLINE_LOAD_LIMIT", str(10 * DEADLINE_BATCH_SIZE)))
+# Only the process holding this lease fires timers; it is renewed at a third of its length
+DEADLINE_LEASE_SECONDS = int(os.getenv("DEADLINE_LEASE_SECONDS", "60"))
+LEASE_ID = "deadline_monitor"
+
+LATE = "late"
+EXPIRED = "expired"
+
+TIMER_PROJECTION = {"deadline": 1, "late_at": 1}
+
+EVENT_PROJECTION = {
+    "buyer_id": 1,
+    "seller_id": 1,
+    "status": 1,
+    "order_number": 1,
+    "service_title": 1,
+    "total_cost": 1,
+    "deadline": 1
+}
+
+
+async def ensure_indexes(db):
+    await db.orders.create_index([("status", 1), ("deadline", 1)])
+
+
+class DeadlineMonitor:
+    """
+    Keeps a min-heap of upcoming deadline timers for accepted orders and fires
+    them in batches: orders past their deadline are flagged late, and orders
+    still undelivered after the grace period are cancelled and refunded.
+
+    Only timers inside the load horizon are held in memory, at most one page
+    of them after downtime. All state lives on the orders themselves, so a
+    restart just reloads the heap from the (status, deadline) index. Every
+    process runs a monitor, but only the one holding the lease in
+    worker_leases loads and fires timers; the others stand by to take over
+    when it lapses. Orders accepted on a standby process are picked up by
+    the leader's next reload.
+    """
+
+    def __init__(self, grace_hours: int = DEADLINE_GRACE_HOURS, batch_size: int = DEADLINE_BATCH_SIZE):
+        self.grace = timedelta(hours=grace_hours)
+        self.batch_size = batch_size
+        self.lease = WorkerLease(LEASE_ID, DEADLINE_LEASE_SECONDS)
+        self._heap = []
+        self._scheduled = set()
+        self._loaded_until = None
+        self._reload_at = None
+        self._wakeup = asyncio.Event()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def _push(self, fire_at: datetime, order_id: str, event: str):
+        key = (order_id, event)
+        if key in self._scheduled:
+            return
+        self._scheduled.add(key)
+        heapq.heappush(self._heap, (fire_at, order_id, event))
+
+    def schedule(self, order_id: str, deadline: datetime):
+        """
+        Register a freshly accepted order; deadlines beyond the horizon are
+        left for a later reload
+        """
+        if self._loaded_until is None or deadline > self._loaded_until:
+            return
+        self._push(deadline, order_id, LATE)
+        if deadline + self.grace <= self._loaded_until:
+            self._push(deadline + self.grace, order_id, EXPIRED)
+        if self._heap[0][1] == order_id:
+            self._wakeup.set()
+
+    async def load(self, db, now: datetime = None) -> int:
+        """
+        Top the heap up with every accepted order whose late or expiry timer
+        falls before the horizon, including ones missed while down. A backlog
+        of more than one page is loaded oldest first, and the next page is
+        read once the timers up to the last deadline loaded have fired.
+        """
+        now = now or datetime.utcnow()
+        horizon = now + timedelta(seconds=DEADLINE_HORIZON_SECONDS)
+        cursor = db.orders.find(
+            {
+                "status": OrderStatus.ACCEPTED.value,
+                "$or": [
+                    {"late_at": None, "deadline": {"$lte": horizon}},
+                    {"deadline": {"$lte": horizon - self.grace}}
+                ]
+            },
+            TIMER_PROJECTION
+        ).sort("deadline", 1).limit(DEADLINE_LOAD_LIMIT)
+        loaded = 0
+        last_deadline = None
+        async for order in cursor:
+            order_id = str(order["_id"])
+            if not order.get("late_at"):
+                self._push(order["deadline"], order_id, LATE)
+            if order["deadline"] + self.grace <= horizon:
+                self._push(order["deadline"] + self.grace, order_id, EXPIRED)
+            last_deadline = order["deadline"]
+            loaded += 1
+
+        if loaded == DEADLINE_LOAD_LIMIT and last_deadline < horizon:
+            # Timers are only known to be complete up to the last deadline read
+            self._loaded_until = last_deadline
+            self._reload_at = last_deadline
+        else:
+            self._loaded_until = horizon
+            self._reload_at = now + timedelta(seconds=DEADLINE_RELOAD_SECONDS)
+        registry.set_gauge("deadline_timers", len(self._heap))
+        return loaded
+
+    async def acquire_lease(self, db, now: datetime = None) -> bool:
+        return await self.lease.acquire(db, now)
+
+    def _reset(self):
+        self._heap = []
+        self._scheduled = set()
+        self._loaded_until = None
+        self._reload_at = None
+
+    def _pop_due(self, now: datetime) -> dict:
+        due = {LATE: [], EXPIRED: []}
+        count = 0
+        while self._heap and self._heap[0][0] <= now and count < self.batch_size:
+            _, order_id, event = heapq.heappop(self._heap)
+            self._scheduled.discard((order_id, event))
+            due[event].append(order_id)
+            count += 1
+        return due
+
+    async def fire_due(self, db, now: datetime = None) -> dict:
+        """
+        Fire every timer that is due, one batch at a time
+        """
+        now = now or datetime.utcnow()
+        # Match MongoDB's millisecond precision so late_at can be queried back exactly
+        now = now.replace(microsecond=now.microsecond // 1000 * 1000)
+        fired = {LATE: 0, EXPIRED: 0}
+        while self._heap and self._heap[0][0] <= now:
+            due = self._pop_due(now)
+            fired[LATE] += await self._mark_late(db, due[LATE], now)
+            fired[EXPIRED] += await self._expire(db, due[EXPIRED], now)
+
+        registry.set_gauge("deadline_timers", len(self._heap))
+        return fired
+
+    async def _mark_late(self, db, order_ids: list, now: datetime) -> int:
+        if not order_ids:
+            return 0
+
+        # Orders delivered in the meantime no longer match the status guard
+        operations = [
+            UpdateOne(
+                {"_id": ObjectId(order_id), "status": OrderStatus.ACCEPTED.value, "late_at": None},
+                {"$set": {"late_at": now, "updated_at": now}}
+            )
+            for order_id in order_ids
+        ]
+        result = await db.orders.bulk_write(operations, ordered=False)
+        if result.modified_count:
+            late = await db.orders.find(
+                {"_id": {"$in": [ObjectId(order_id) for order_id in order_ids]}, "late_at": now},
+                EVENT_PROJECTION
+            ).to_list(length=len(order_ids))
+            await record_events(db, [(order["seller_id"], LATE, None) for order in late], now=now)
+            await self._notify(db, LATE, late, now)
+
+        registry.incr("deadline_events", result.modified_count, event=LATE)
+        return result.modified_count
+
+    async def _expire(self, db, order_ids: list, now: datetime) -> int:
+        if not order_ids:
+            return 0
+
+        orders = await db.orders.find(
+            {"_id": {"$in": [ObjectId(order_id) for order_id in order_ids]}, "status": OrderStatus.ACCEPTED.value},
+            EVENT_PROJECTION
+        ).to_list(length=len(order_ids))
+        moved = await bulk_transition_orders(db, orders, "expire", {
+            str(order["_id"]): {"cancelled_at": now, "cancellation_reason": "deadline_missed"}
+            for order in orders
+        }, now=now)
+        expired = [order for order in orders if str(order["_id"]) in moved]
+
+        await refund_orders(
+            db, expired, "Refund for undelivered order: {order_number}",
+            notes=f"Seller missed the delivery deadline by more than {self.grace_hours} hours",
+            now=now
+        )
+        await record_events(db, [(order["seller_id"], EXPIRED, None) for order in expired], now=now)
+        await self._notify(db, EXPIRED, expired, now)
+
+        registry.incr("deadline_events", len(expired), event=EXPIRED)
+        return len(expired)
+
+    @property
+    def grace_hours(self) -> int:
+        return int(self.grace.total_seconds() // 3600)
+
+    async def _notify(self, db, event: str, orders: list, now: datetime):
+        """
+        Queue the late or expired notice for the buyer and the seller of each order
+        """
+        await notify_many(db, [
+            (order[party], f"order_{event}", order_notice(order, deadline=order["deadline"], grace_hours=self.grace_hours))
+            for order in orders
+            for party in ("buyer_id", "seller_id")
+        ], now=now)
+
+    def _seconds_until_next(self, now: datetime) -> float:
+        until_reload = (self._reload_at - now).total_seconds()
+        if not self._heap:
+            return max(until_reload, 0)
+        return max(min((self._heap[0][0] - now).total_seconds(), until_reload), 0)
+
+    async def run(self, db):
+        renew_every = DEADLINE_LEASE_SECONDS / 3
+        while True:
+            try:
+                now = datetime.utcnow()
+                if not await self.acquire_lease(db, now):
+                    # Standing by: drop any timers from a lease that lapsed
+                    self._reset()
+                    await asyncio.sleep(renew_every)
+                    continue
+                if self._reload_at is None or now >= self._reload_at:
+                    await self.load(db, now)
+                fired = await self.fire_due(db)
+                if fired[LATE] or fired[EXPIRED]:
+                    logger.info(f"Deadline monitor fired: {fired}")
+                delay = min(self._seconds_until_next(datetime.utcnow()), renew_every)
+            except Exception as e:
+                logger.error(f"Deadline monitor failed: {e}")
+                delay = min(DEADLINE_RELOAD_SECONDS, renew_every)
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+
+deadline_monitor = DeadlineMonitor()
@@ -0,0 +1,248 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo import ReturnDocument, UpdateOne
+from metrics import registry
+from models import DisputeStatus, DisputeType
+
+logger = logging.getLogger(__name__)
+
+DISPUTE_LEASE_MINUTES = int(os.getenv("DISPUTE_LEASE_MINUTES", "30"))
+# Waiting this long in the queue without a resolution bumps a dispute's escalation level
+DISPUTE_ESCALATION_HOURS = int(os.getenv("DISPUTE_ESCALATION_HOURS", "24"))
+DISPUTE_QUEUE_SWEEP_SECONDS = int(os.getenv("DISPUTE_QUEUE_SWEEP_SECONDS", "60"))
+
+UNRESOLVED_STATUSES = [
+    DisputeStatus.OPEN.value,
+    DisputeStatus.AWAITING_RESPONSE.value,
+    DisputeStatus.UNDER_MEDIATION.value,
+    DisputeStatus.APPEALED.value
+]
+
+# Disputes that hint at fraud or policy breaches jump the queue
+DISPUTE_TYPE_WEIGHTS = {
+    DisputeType.FAKE_PROOF.value: 30,
+    DisputeType.PLATFORM_VIOLATION.value: 30,
+    DisputeType.INAPPROPRIATE_CONTENT.value: 30,
+    DisputeType.PAYMENT_ISSUES.value: 25,
+    DisputeType.NON_DELIVERY.value: 20,
+    DisputeType.MISSING_DISCLOSURE.value: 20,
+}
+DEFAULT_TYPE_WEIGHT = 10
+MAX_AMOUNT_WEIGHT = 40
+ANSWERED_WEIGHT = 20
+ESCALATION_WEIGHT = 25
+
+QUEUE_PROJECTION = {
+    "dispute_number": 1,
+    "order_id": 1,
+    "dispute_type": 1,
+    "status": 1,
+    "amount_at_stake": 1,
+    "priority": 1,
+    "escalation_level": 1,
+    "mediator_id": 1,
+    "lease_expires_at": 1,
+    "respondent_responded_at": 1,
+    "created_at": 1
+}
+
+
+async def ensure_indexes(db):
+    await db.disputes.create_index([("status", 1), ("priority", -1), ("created_at", 1)])
+    await db.disputes.create_index([("mediator_id", 1), ("status", 1)])
+    await db.disputes.create_index("next_escalation_at", sparse=True)
+
+
+def compute_priority(dispute: dict) -> float:
+    """
+    Queue priority from the dispute type, the amount at stake, whether the
+    respondent has answered (ready to mediate) and how often it has escalated
+    """
+    priority = DISPUTE_TYPE_WEIGHTS.get(dispute.get("dispute_type"), DEFAULT_TYPE_WEIGHT)
+    priority += min(dispute.get("amount_at_stake", 0) / 25, MAX_AMOUNT_WEIGHT)
+    if dispute.get("respondent_responded_at"):
+        priority += ANSWERED_WEIGHT
+    priority += dispute.get("escalation_level", 0) * ESCALATION_WEIGHT
+    return round(priority, 2)
+
+
+def queue_fields(dispute: dict, now: datetime) -> dict:
+    """
+    Fields a newly created dispute needs to enter the queue
+    """
+    return {
+        "priority": compute_priority(dispute),
+        "escalation_level": 0,
+        "next_escalation_at": now + timedelta(hours=DISPUTE_ESCALATION_HOURS)
+    }
+
+
+def _unclaimed(now: datetime) -> dict:
+    return {"$or": [{"mediator_id": None}, {"lease_expires_at": {"$lt": now}}]}
+
+
+def _claimable(mediator_id: str, now: datetime) -> dict:
+    return {"$or": [{"mediator_id": None}, {"mediator_id": mediator_id}, {"lease_expires_at": {"$lt": now}}]}
+
+
+def not_a_party(mediator_id: str) -> dict:
+    """
+    Mediators never handle disputes they are the buyer or seller in
+    """
+    return {"initiator_id": {"$ne": mediator_id}, "respondent_id": {"$ne": mediator_id}}
+
+
+def _serialize(dispute: dict) -> dict:
+    dispute["_id"] = str(dispute["_id"])
+    return dispute
+
+
+async def claim_next(db, mediator_id: str) -> dict:
+    """
+    Lease the highest-priority unclaimed dispute to a mediator
+    """
+    now = datetime.utcnow()
+    dispute = await db.disputes.find_one_and_update(
+        {"status": {"$in": UNRESOLVED_STATUSES}, **_unclaimed(now), **not_a_party(mediator_id)},
+        {"$set": {
+            "mediator_id": mediator_id,
+            "mediator_assigned_at": now,
+            "lease_expires_at": now + timedelta(minutes=DISPUTE_LEASE_MINUTES),
+            "updated_at": now
+        }},
+        sort=[("priority", -1), ("created_at", 1)],
+        return_document=ReturnDocument.AFTER
+    )
+    if not dispute:
+        raise HTTPException(status_code=404, detail="No disputes waiting for mediation")
+    registry.incr("dispute_claims")
+    return _serialize(dispute)
+
+
+async def claim(db, dispute_id: str, mediator_id: str) -> dict:
+    """
+    Lease a specific dispute, or extend the lease the mediator already holds
+    """
+    now = datetime.utcnow()
+    dispute = await db.disputes.find_one_and_update(
+        {
+            "_id": ObjectId(dispute_id),
+            "status": {"$in": UNRESOLVED_STATUSES},
+            **_claimable(mediator_id, now),
+            **not_a_party(mediator_id)
+        },
+        {"$set": {
+            "mediator_id": mediator_id,
+            "mediator_assigned_at": now,
+            "lease_expires_at": now + timedelta(minutes=DISPUTE_LEASE_MINUTES),
+            "updated_at": now
+        }},
+        return_document=ReturnDocument.AFTER
+    )
+    if not dispute:
+        existing = await db.disputes.find_one(
+            {"_id": ObjectId(dispute_id)}, {"status": 1, "initiator_id": 1, "respondent_id": 1}
+        )
+        if not existing:
+            raise HTTPException(status_code=404, detail="Dispute not found")
+        if mediator_id in (existing["initiator_id"], existing["respondent_id"]):
+            raise HTTPException(status_code=403, detail="Cannot mediate a dispute you are party to")
+        if existing["status"] not in UNRESOLVED_STATUSES:
+            raise HTTPException(status_code=400, detail="Dispute already resolved")
+        raise HTTPException(status_code=409, detail="Dispute is claimed by another mediator")
+    registry.incr("dispute_claims")
+    return _serialize(dispute)
+
+
+async def release(db, dispute_id: str, mediator_id: str) -> dict:
+    dispute = await db.disputes.find_one_and_update(
+        {"_id": ObjectId(dispute_id), "mediator_id": mediator_id, "status": {"$in": UNRESOLVED_STATUSES}},
+        {"$set": {"mediator_id": None, "lease_expires_at": None, "updated_at": datetime.utcnow()}},
+        return_document=ReturnDocument.AFTER
+    )
+    if not dispute:
+        raise HTTPException(status_code=400, detail="You do not hold this dispute")
+    return _serialize(dispute)
+
+
+async def list_queue(db, limit: int = 50, include_claimed: bool = False) -> list:
+    """
+    Unresolved disputes in queue order, read straight off the priority index
+    """
+    query = {"status": {"$in": UNRESOLVED_STATUSES}}
+    if not include_claimed:
+        query.update(_unclaimed(datetime.utcnow()))
+    cursor = db.disputes.find(query, QUEUE_PROJECTION).sort([("priority", -1), ("created_at", 1)]).limit(limit)
+    return [_serialize(dispute) for dispute in await cursor.to_list(length=limit)]
+
+
+async def list_claimed(db, mediator_id: str) -> list:
+    cursor = db.disputes.find(
+        {"mediator_id": mediator_id, "status": {"$in": UNRESOLVED_STATUSES}}, QUEUE_PROJECTION
+    ).sort([("priority", -1), ("created_at", 1)])
+    return [_serialize(dispute) for dispute in await cursor.to_list(length=100)]
+
+
+def record_resolution(dispute: dict, now: datetime):
+    hours = (now - dispute["created_at"]).total_seconds() / 3600
+    registry.observe("dispute_time_to_resolution_hours", hours)
+    registry.incr("disputes_resolved", resolution_type=dispute.get("resolution_type") or "unknown")
+
+
+class DisputeQueueMonitor:
+    """
+    Bumps the escalation level and priority of disputes left unresolved past
+    their escalation timer, and publishes queue-depth gauges
+    """
+
+    def __init__(self, escalation_hours: int = DISPUTE_ESCALATION_HOURS):
+        self.escalation = timedelta(hours=escalation_hours)
+
+    async def escalate_due(self, db, now: datetime = None) -> int:
+        now = now or datetime.utcnow()
+        due = await db.disputes.find(
+            {"next_escalation_at": {"$lte": now}, "status": {"$in": UNRESOLVED_STATUSES}},
+            {"next_escalation_at": 1}
+        ).to_list(length=None)
+        if not due:
+            return 0
+
+        # Guard on the timer we read so a concurrent sweep cannot double-escalate
+        result = await db.disputes.bulk_write([
+            UpdateOne(
+                {"_id": dispute["_id"], "next_escalation_at": dispute["next_escalation_at"]},
+                {
+                    "$inc": {"escalation_level": 1, "priority": ESCALATION_WEIGHT},
+                    "$set": {"next_escalation_at": now + self.escalation, "updated_at": now}
+                }
+            )
+            for dispute in due
+        ], ordered=False)
+        registry.incr("disputes_escalated", result.modified_count)
+        return result.modified_count
+
+    async def update_gauges(self, db, now: datetime = None):
+        now = now or datetime.utcnow()
+        unresolved = {"status": {"$in": UNRESOLVED_STATUSES}}
+        waiting = await db.disputes.count_documents({**unresolved, **_unclaimed(now)})
+        claimed = await db.disputes.count_documents({**unresolved, "lease_expires_at": {"$gte": now}})
+        registry.set_gauge("dispute_queue_depth", waiting)
+        registry.set_gauge("dispute_queue_claimed", claimed)
+
+    async def run(self, db):
+        while True:
+            try:
+                escalated = await self.escalate_due(db)
+                if escalated:
+                    logger.info(f"Escalated {escalated} disputes")
+                await self.update_gauges(db)
+            except Exception as e:
+                logger.error(f"Dispute queue sweep failed: {e}")
+            await asyncio.sleep(DISPUTE_QUEUE_SWEEP_SECONDS)
+
+
+dispute_queue_monitor = DisputeQueueMonitor()
@@ -0,0 +1,334 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo import ReturnDocument
+from metrics import registry
+from models import DisputeStatus, ResolutionType, TransactionType
+from order_state import transition_order
+from seller_stats import record_event, record_events
+from seller_dashboard import record_day, resolution_delta
+import dispute_queue
+from worker_leases import WorkerLease
+
+logger = logging.getLogger(__name__)
+
+# Hours without a respondent answer before a dispute goes straight to mediation
+DISPUTE_MEDIATION_AFTER_HOURS = int(os.getenv("DISPUTE_MEDIATION_AFTER_HOURS", "48"))
+# Hours without an answer before an eligible buyer dispute is refunded by default; 0 disables default judgements
+DISPUTE_DEFAULT_JUDGEMENT_HOURS = int(os.getenv("DISPUTE_DEFAULT_JUDGEMENT_HOURS", "120"))
+DISPUTE_SWEEP_SECONDS = int(os.getenv("DISPUTE_SWEEP_SECONDS", "300"))
+DISPUTE_SWEEP_BATCH_SIZE = int(os.getenv("DISPUTE_SWEEP_BATCH_SIZE", "100"))
+
+UNANSWERED_STATUSES = [
+    DisputeStatus.OPEN.value,
+    DisputeStatus.AWAITING_RESPONSE.value,
+    DisputeStatus.UNDER_MEDIATION.value
+]
+
+# Resolutions that refund the buyer in full; cancelling the order returns the escrow the same way
+REFUND_RESOLUTIONS = {ResolutionType.FULL_REFUND.value, ResolutionType.ORDER_CANCELLATION.value}
+SETTLING_RESOLUTIONS = REFUND_RESOLUTIONS | {ResolutionType.PARTIAL_REFUND.value, ResolutionType.FULL_PAYMENT.value}
+
+
+async def ensure_indexes(db):
+    await db.disputes.create_index([("status", 1), ("response_due_at", 1)])
+    await db.disputes.create_index([("status", 1), ("created_at", 1)])
+
+
+def response_due_at(created_at: datetime) -> datetime:
+    return created_at + timedelta(hours=DISPUTE_MEDIATION_AFTER_HOURS)
+
+
+def validate_resolution(resolution_type: ResolutionType, refund_percentage: Optional[float]):
+    if resolution_type.value not in SETTLING_RESOLUTIONS:
+        # No defined settlement yet for revision requests and split decisions
+        raise HTTPException(status_code=400, detail=f"Resolution type {resolution_type.value} is not supported")
+    if resolution_type != ResolutionType.PARTIAL_REFUND:
+        return
+    if refund_percentage is None:
+        raise HTTPException(status_code=400, detail="refund_percentage is required for a partial refund")
+    if not 0 <= refund_percentage <= 100:
+        raise HTTPException(status_code=400, detail="refund_percentage must be between 0 and 100")
+
+
+def seller_credited(order: dict) -> float:
+    """
+    Earnings the seller currently holds for an order: whatever the last
+    resolution paid, otherwise base_cost if the buyer had approved it
+    """
+    if order.get("seller_credited") is not None:
+        return order["seller_credited"]
+    return order["base_cost"] if order.get("completed_at") else 0.0
+
+
+async def _move_balance(db, user_id: str, field: str, amount: float, transaction_type: TransactionType,
+                        order: dict, description: str, now: datetime, extra: dict = None) -> dict:
+    """
+    $inc one balance and return the matching transaction record
+    """
+    user = await db.users.find_one_and_update(
+        {"_id": ObjectId(user_id)},
+        {"$inc": {field: amount, **(extra or {})}},
+        projection={field: 1},
+        return_document=ReturnDocument.AFTER
+    )
+    profile, balance = field.split(".")
+    balance_after = ((user or {}).get(profile) or {}).get(balance, 0)
+    return {
+        "user_id": user_id,
+        "transaction_type": transaction_type.value,
+        "amount": amount,
+        "balance_before": balance_after - amount,
+        "balance_after": balance_after,
+        "order_id": str(order["_id"]),
+        "related_user_id": order["buyer_id"] if user_id == order["seller_id"] else order["seller_id"],
+        "description": f"{description}: {order['order_number']}",
+        "created_at": now
+    }
+
+
+async def execute_resolution(db, order_id: str, resolution_type: ResolutionType, refund_percentage: Optional[float]):
+    """
+    Settle a disputed order's escrow. The order transition is guarded on the
+    order still being disputed, so money moves at most once. Earnings the
+    seller already received on approval are reversed first, then the buyer's
+    refund and the seller's new share are paid, each with a transaction.
+    """
+    validate_resolution(resolution_type, refund_percentage)
+    full_refund = resolution_type.value in REFUND_RESOLUTIONS
+    order = await transition_order(db, order_id, "resolve_refund" if full_refund else "resolve_release")
+    now = datetime.utcnow()
+
+    if full_refund:
+        refund_amount, seller_amount = order["total_cost"], 0.0
+    elif resolution_type == ResolutionType.PARTIAL_REFUND:
+        refund_amount = order["total_cost"] * (refund_percentage / 100)
+        # The platform fee is kept unless the refund eats into it
+        seller_amount = max(order["base_cost"] - refund_amount, 0.0)
+    elif resolution_type == ResolutionType.FULL_PAYMENT:
+        refund_amount, seller_amount = 0.0, order["base_cost"]
+    credited = seller_credited(order)
+
+    transactions = []
+    if credited:
+        transactions.append(await _move_balance(
+            db, order["seller_id"], "seller_profile.pending_balance", -credited,
+            TransactionType.EARNINGS_REVERSED, order, "Earnings reversed by dispute resolution", now,
+            extra={"seller_profile.total_earnings": -credited, "seller_profile.total_orders": -1}
+        ))
+    if refund_amount:
+        transactions.append(await _move_balance(
+            db, order["buyer_id"], "buyer_profile.credit_balance", refund_amount,
+            TransactionType.ORDER_REFUND, order, "Dispute refund for order", now
+        ))
+    if seller_amount:
+        transactions.append(await _move_balance(
+            db, order["seller_id"], "seller_profile.available_balance", seller_amount,
+            TransactionType.EARNINGS_RECEIVED, order, "Earnings from dispute resolution", now,
+            extra={"seller_profile.total_earnings": seller_amount, "seller_profile.total_orders": 1}
+        ))
+    if transactions:
+        await db.transactions.insert_many(transactions)
+
+    await db.orders.update_one(
+        {"_id": ObjectId(order_id)},
+        {"$set": {"refund_amount": refund_amount, "seller_credited": seller_amount, "updated_at": now}}
+    )
+
+    if full_refund:
+        # A refunded order no longer counts as completed if it had been approved
+        events = [(order["seller_id"], "refunded", None)]
+        if order.get("completed_at"):
+            events.append((order["seller_id"], "uncompleted", None))
+        await record_events(db, events)
+    elif not order.get("completed_at"):
+        await record_event(db, order["seller_id"], "completed")
+
+    await record_day(
+        db, order["seller_id"], now=now,
+        **resolution_delta({**order, "seller_credited": seller_amount}, full_refund)
+    )
+    return order
+
+
+async def resolve_dispute(db, dispute_id: str, resolution_type: ResolutionType, resolution_details: str,
+                          refund_percentage: float = None, guard: dict = None, extra: dict = None,
+                          now: datetime = None):
+    """
+    Mark a dispute resolved and settle its order, shared by mediators and the
+    sweeper. The dispute is claimed with one find_one_and_update filtered on
+    `guard`, and handed back if the order cannot be settled. Returns the
+    resolved dispute, or None when the guard did not match.
+    """
+    validate_resolution(resolution_type, refund_percentage)
+    now = now or datetime.utcnow()
+    resolution = {
+        "resolution_type": resolution_type.value,
+        "resolution_details": resolution_details,
+        "refund_percentage": refund_percentage,
+        "resolved_at": now,
+        **(extra or {})
+    }
+    dispute = await db.disputes.find_one_and_update(
+        {"_id": ObjectId(dispute_id), "status": {"$ne": DisputeStatus.RESOLVED.value}, **(guard or {})},
+        {"$set": {
+            **resolution,
+            "status": DisputeStatus.RESOLVED.value,
+            "lease_expires_at": None,
+            "next_escalation_at": None,
+            "response_due_at": None,
+            "updated_at": now
+        }},
+        return_document=ReturnDocument.BEFORE
+    )
+    if not dispute:
+        return None
+
+    try:
+        await execute_resolution(db, dispute["order_id"], resolution_type, refund_percentage)
+    except HTTPException:
+        # Hand the dispute back if the order could not be settled
+        await db.disputes.update_one(
+            {"_id": dispute["_id"]},
+            {
+                "$set": {
+                    "status": dispute["status"],
+                    "lease_expires_at": dispute.get("lease_expires_at"),
+                    "next_escalation_at": dispute.get("next_escalation_at"),
+                    "response_due_at": dispute.get("response_due_at"),
+                    "updated_at": datetime.utcnow()
+                },
+                "$unset": {field: "" for field in resolution}
+            }
+        )
+        raise
+
+    resolved = {
+        **dispute,
+        **resolution,
+        "status": DisputeStatus.RESOLVED.value,
+        "lease_expires_at": None,
+        "next_escalation_at": None,
+        "response_due_at": None,
+        "updated_at": now
+    }
+    dispute_queue.record_resolution(resolved, now)
+    resolved["_id"] = str(resolved["_id"])
+    return resolved
+
+
+class DisputeSweeper:
+    """
+    Advances disputes the respondent never answers: past response_due_at they
+    move to mediation. A buyer's dispute over an order that was never
+    approved is refunded by default once the default-judgement window has
+    also passed without a mediator holding it; every other dispute waits
+    for a mediator.
+    """
+
+    def __init__(self, batch_size: int = DISPUTE_SWEEP_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.lease = WorkerLease("dispute_sweeper")
+
+    async def escalate_unanswered(self, db, now: datetime) -> int:
+        due = await db.disputes.find(
+            {
+                "status": {"$in": [DisputeStatus.OPEN.value, DisputeStatus.AWAITING_RESPONSE.value]},
+                "response_due_at": {"$lte": now},
+                "respondent_responded_at": None
+            },
+            {"_id": 1}
+        ).limit(self.batch_size).to_list(length=self.batch_size)
+        if not due:
+            return 0
+
+        result = await db.disputes.update_many(
+            {
+                "_id": {"$in": [dispute["_id"] for dispute in due]},
+                "status": {"$in": [DisputeStatus.OPEN.value, DisputeStatus.AWAITING_RESPONSE.value]},
+                "respondent_responded_at": None
+            },
+            {
+                "$set": {"status": DisputeStatus.UNDER_MEDIATION.value, "auto_escalated_at": now, "updated_at": now},
+                "$inc": {"priority": dispute_queue.ESCALATION_WEIGHT}
+            }
+        )
+        registry.incr("disputes_auto_escalated", result.modified_count)
+        return result.modified_count
+
+    async def _mark_failed(self, db, dispute: dict, now: datetime):
+        # Leave it to a mediator rather than retrying every sweep
+        await db.disputes.update_one({"_id": dispute["_id"]}, {"$set": {"default_judgement_failed_at": now}})
+
+    async def issue_default_judgements(self, db, now: datetime) -> int:
+        if not DISPUTE_DEFAULT_JUDGEMENT_HOURS:
+            return 0
+
+        cutoff = now - timedelta(hours=DISPUTE_DEFAULT_JUDGEMENT_HOURS)
+        due = await db.disputes.find(
+            {
+                "status": {"$in": UNANSWERED_STATUSES},
+                "default_judgement_eligible": True,
+                "respondent_responded_at": None,
+                "created_at": {"$lte": cutoff},
+                "default_judgement_failed_at": None,
+                "$or": [{"mediator_id": None}, {"lease_expires_at": {"$lt": now}}]
+            },
+            {"_id": 1}
+        ).limit(self.batch_size).to_list(length=self.batch_size)
+        if not due:
+            return 0
+
+        resolved = 0
+        for dispute in due:
+            # Only a buyer's claim on an unsettled order is eligible, and it wins a refund
+            try:
+                result = await resolve_dispute(
+                    db, str(dispute["_id"]), ResolutionType.FULL_REFUND,
+                    f"Default judgement: no response within {DISPUTE_DEFAULT_JUDGEMENT_HOURS} hours",
+                    # Never override an answer that just arrived or a mediator mid-review
+                    guard={
+                        "default_judgement_eligible": True,
+                        "respondent_responded_at": None,
+                        "$or": [{"mediator_id": None}, {"lease_expires_at": {"$lt": now}}]
+                    },
+                    extra={"default_judgement": True},
+                    now=now
+                )
+            except HTTPException as e:
+                logger.warning(f"Default judgement failed for dispute {dispute['_id']}: {e.detail}")
+                await self._mark_failed(db, dispute, now)
+                continue
+            if result:
+                resolved += 1
+
+        registry.incr("disputes_default_judgements", resolved)
+        return resolved
+
+    async def sweep(self, db, now: datetime = None) -> dict:
+        now = now or datetime.utcnow()
+        stats = {"escalated": 0, "default_judgements": 0}
+        while True:
+            escalated = await self.escalate_unanswered(db, now)
+            judged = await self.issue_default_judgements(db, now)
+            stats["escalated"] += escalated
+            stats["default_judgements"] += judged
+            if escalated < self.batch_size and judged < self.batch_size:
+                return stats
+
+    async def run(self, db):
+        while True:
+            try:
+                stats = await self.lease.run_exclusive(db, lambda: self.sweep(db))
+                if stats and (stats["escalated"] or stats["default_judgements"]):
+                    logger.info(f"Dispute sweep: {stats}")
+            except Exception as e:
+                logger.error(f"Dispute sweep failed: {e}")
+            await asyncio.sleep(DISPUTE_SWEEP_SECONDS)
+
+
+dispute_sweeper = DisputeSweeper()
@@ -0,0 +1,66 @@
+"""
+Local fake of the LinkedIn OAuth and metrics endpoints used by LinkedInClient.
+
+Serve it standalone:
+    LINKEDIN_FAKE_LATENCY_MS=150 uvicorn fakes.linkedin_api:app --port 8099
+and point LINKEDIN_API_BASE_URL / LINKEDIN_AUTH_BASE_URL at it, or mount it
+in-process with httpx.ASGITransport(app=create_app(...)).
+"""
+import asyncio
+import os
+import random
+import uuid
+from fastapi import FastAPI, Form, Header, HTTPException, Query
+import sys
+sys.path.append('/app/backend')
+from utils import generate_mock_linkedin_data
+
+
+def create_app(latency_ms: float = None, failure_rate: float = None) -> FastAPI:
+    latency_ms = float(os.getenv("LINKEDIN_FAKE_LATENCY_MS", "50")) if latency_ms is None else latency_ms
+    failure_rate = float(os.getenv("LINKEDIN_FAKE_FAILURE_RATE", "0")) if failure_rate is None else failure_rate
+
+    app = FastAPI(title="Fake LinkedIn API")
+    tokens = {}
+    members = {}
+
+    async def simulate_network():
+        await asyncio.sleep(latency_ms / 1000 * random.uniform(0.5, 1.5))
+        if random.random() < failure_rate:
+            raise HTTPException(status_code=503, detail="Service temporarily unavailable")
+
+    def member_for(authorization: str):
+        token = (authorization or "").replace("Bearer ", "")
+        if token not in tokens:
+            raise HTTPException(status_code=401, detail="Invalid access token")
+        return tokens[token]
+
+    @app.post("/oauth/v2/accessToken")
+    async def access_token(grant_type: str = Form(...), code: str = Form(...)):
+        await simulate_network()
+        member_id = f"member-{uuid.uuid4().hex[:12]}"
+        token = uuid.uuid4().hex
+        tokens[token] = member_id
+        members[member_id] = generate_mock_linkedin_data()
+        return {"access_token": token, "expires_in": 60 * 24 * 3600}
+
+    @app.get("/v2/me")
+    async def me(authorization: str = Header(None)):
+        await simulate_network()
+        member_id = member_for(authorization)
+        data = members[member_id]
+        return {"id": member_id, "vanityName": data["username"], "profileUrl": data["profile_url"]}
+
+    @app.get("/v2/metrics")
+    async def metrics(member: str = Query(...), authorization: str = Header(None)):
+        await simulate_network()
+        member_for(authorization)
+        data = members.get(member)
+        if data is None:
+            raise HTTPException(status_code=404, detail="Member not found")
+        return {key: value for key, value in data.items() if key not in ("username", "profile_url")}
+
+    return app
+
+
+app = create_app()
@@ -0,0 +1,170 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_TTL_HOURS = int(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+# How long an in-flight record blocks duplicates before it is considered abandoned
+IDEMPOTENCY_LOCK_SECONDS = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "30"))
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "10"))
+POLL_INTERVAL_SECONDS = 0.1
+
+# In-flight executions owned by this process, keyed by record id
+_in_flight = {}
+
+
+async def ensure_indexes(db):
+    await db.idempotency_keys.create_index("expires_at", expireAfterSeconds=0)
+
+
+def request_fingerprint(scope: str, payload: dict) -> str:
+    canonical = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha256(f"{scope}:{canonical}".encode()).hexdigest()
+
+
+async def run_idempotent(db, user_id: str, key, scope: str, payload: dict, handler, response=None):
+    """
+    Execute handler at most once per (user, Idempotency-Key).
+
+    The first request claims the key with a single insert on the _id index
+    and holds its lock, renewed while the handler runs, until the result is
+    stored; the result is written before the response is returned. Retries
+    replay the cached result, and concurrent duplicates wait for the first
+    execution to finish.
+    """
+    if not key:
+        return await handler()
+
+    record_id = f"{user_id}:{scope}:{key}"
+    fingerprint = request_fingerprint(scope, payload)
+
+    # Duplicate of a request still running in this process
+    in_flight = _in_flight.get(record_id)
+    if in_flight is not None:
+        _check_fingerprint(in_flight[0], fingerprint)
+        return _replay(await asyncio.shield(in_flight[1]), response)
+
+    while True:
+        now = datetime.utcnow()
+        try:
+            await db.idempotency_keys.insert_one({
+                "_id": record_id,
+                "fingerprint": fingerprint,
+                "status": "in_progress",
+                "locked_until": now + timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS),
+                "expires_at": now + timedelta(hours=IDEMPOTENCY_TTL_HOURS),
+                "created_at": now
+            })
+            break
+        except DuplicateKeyError:
+            pass
+
+        record = await _wait_for_record(db, record_id, fingerprint)
+        if record is None:
+            # The previous owner failed and released the key
+            continue
+        if record["status"] == "completed":
+            return _replay(record["response"], response)
+
+        # The previous owner's lock lapsed, take the key over
+        claimed = await db.idempotency_keys.find_one_and_update(
+            {"_id": record_id, "status": "in_progress", "locked_until": record["locked_until"]},
+            {"$set": {"locked_until": datetime.utcnow() + timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS)}}
+        )
+        if claimed:
+            break
+
+    return await _execute(db, record_id, fingerprint, handler)
+
+
+async def _execute(db, record_id: str, fingerprint: str, handler):
+    future = asyncio.get_running_loop().create_future()
+    _in_flight[record_id] = (fingerprint, future)
+    heartbeat = asyncio.create_task(_renew_lock(db, record_id))
+    error = None
+    try:
+        result = await handler()
+    except BaseException as exc:
+        error = exc
+        raise
+    finally:
+        heartbeat.cancel()
+        # Waiters are released before any database cleanup, which may itself fail
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
+            future.exception()  # mark retrieved when nobody is waiting
+            _in_flight.pop(record_id, None)
+            # Failed requests are not cached so the client can retry with the same key
+            await db.idempotency_keys.delete_one({"_id": record_id, "status": "in_progress"})
+
+    # Stored before responding, so a retry after a crash replays instead of running again
+    await _store_result(db, record_id, result)
+    return result
+
+
+async def _renew_lock(db, record_id: str):
+    """
+    Keep the lock ahead of a long-running handler so no duplicate can take
+    the key over while it is still executing
+    """
+    while True:
+        await asyncio.sleep(IDEMPOTENCY_LOCK_SECONDS / 3)
+        try:
+            await db.idempotency_keys.update_one(
+                {"_id": record_id, "status": "in_progress"},
+                {"$set": {"locked_until": datetime.utcnow() + timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS)}}
+            )
+        except Exception as e:
+            logger.error(f"Failed to renew idempotency lock for {record_id}: {e}")
+
+
+async def _store_result(db, record_id: str, result):
+    # Duplicates in this process are answered from _in_flight until the result is stored
+    try:
+        await db.idempotency_keys.update_one(
+            {"_id": record_id},
+            {"$set": {"status": "completed", "response": result, "completed_at": datetime.utcnow()}}
+        )
+    except Exception as e:
+        logger.error(f"Failed to store idempotent result for {record_id}: {e}")
+    finally:
+        _in_flight.pop(record_id, None)
+
+
+async def _wait_for_record(db, record_id: str, fingerprint: str):
+    """
+    Wait until the record is completed, released (None) or its lock has lapsed
+    """
+    deadline = asyncio.get_running_loop().time() + IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        record = await db.idempotency_keys.find_one({"_id": record_id})
+        if record is None:
+            return None
+        _check_fingerprint(record["fingerprint"], fingerprint)
+        if record["status"] == "completed" or record["locked_until"] < datetime.utcnow():
+            return record
+        if asyncio.get_running_loop().time() >= deadline:
+            raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is in progress")
+        await asyncio.sleep(POLL_INTERVAL_SECONDS)
+
+
+def _check_fingerprint(stored: str, fingerprint: str):
+    if stored != fingerprint:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key was already used with a different request"
+        )
+
+
+def _replay(result, response):
+    if response is not None:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
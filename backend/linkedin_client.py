@@ -0,0 +1,265 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+import httpx
+from metrics import registry
+from utils import TTLCache
+
+logger = logging.getLogger(__name__)
+
+LINKEDIN_API_BASE_URL = os.getenv("LINKEDIN_API_BASE_URL", "https://api.linkedin.com")
+LINKEDIN_AUTH_BASE_URL = os.getenv("LINKEDIN_AUTH_BASE_URL", "https://www.linkedin.com")
+LINKEDIN_CLIENT_ID = os.getenv("LINKEDIN_CLIENT_ID")
+LINKEDIN_CLIENT_SECRET = os.getenv("LINKEDIN_CLIENT_SECRET")
+LINKEDIN_REDIRECT_URI = os.getenv("LINKEDIN_REDIRECT_URI")
+LINKEDIN_SCOPES = "r_liteprofile r_emailaddress"
+
+LINKEDIN_TIMEOUT_SECONDS = float(os.getenv("LINKEDIN_TIMEOUT_SECONDS", "5"))
+LINKEDIN_MAX_CONNECTIONS = int(os.getenv("LINKEDIN_MAX_CONNECTIONS", "50"))
+LINKEDIN_MAX_RETRIES = int(os.getenv("LINKEDIN_MAX_RETRIES", "3"))
+LINKEDIN_CACHE_SECONDS = int(os.getenv("LINKEDIN_CACHE_SECONDS", "600"))
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class ProviderError(Exception):
+    pass
+
+
+class CircuitOpenError(ProviderError):
+    pass
+
+
+@contextmanager
+def unexpected_payload(what: str):
+    """
+    Report a LinkedIn payload missing the fields we read as a provider
+    failure rather than letting the KeyError/TypeError escape as a 500
+    """
+    try:
+        yield
+    except (KeyError, TypeError, ValueError) as e:
+        raise ProviderError(f"LinkedIn returned an unexpected {what} payload: {e!r}") from e
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and lets a single
+    trial request through once `reset_timeout` has passed
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def release_trial(self):
+        self._trial_in_flight = False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+class LinkedInClient:
+    """
+    Async LinkedIn API client sharing one pooled HTTP session, with timeouts,
+    jittered retries, a circuit breaker and per-member metrics caching
+    """
+
+    def __init__(self, base_url: str = LINKEDIN_API_BASE_URL, auth_base_url: str = LINKEDIN_AUTH_BASE_URL,
+                 transport=None, max_retries: int = LINKEDIN_MAX_RETRIES,
+                 timeout: float = LINKEDIN_TIMEOUT_SECONDS, backoff_base: float = 0.2):
+        self.base_url = base_url
+        self.auth_base_url = auth_base_url
+        self.transport = transport
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.breaker = CircuitBreaker()
+        self.metrics_cache = TTLCache(LINKEDIN_CACHE_SECONDS)
+        self._session = None
+
+    @property
+    def session(self) -> httpx.AsyncClient:
+        if self._session is None:
+            self._session = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(
+                    max_connections=LINKEDIN_MAX_CONNECTIONS,
+                    max_keepalive_connections=LINKEDIN_MAX_CONNECTIONS
+                ),
+                transport=self.transport
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.aclose()
+            self._session = None
+
+    async def _request(self, method: str, url: str, **kwargs) -> dict:
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                registry.incr("linkedin_requests", outcome="circuit_open")
+                raise CircuitOpenError("LinkedIn API circuit is open")
+
+            try:
+                response = await self.session.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                self.breaker.record_failure()
+                error = ProviderError(f"LinkedIn request failed: {e!r}")
+            else:
+                if response.status_code < 400:
+                    try:
+                        payload = response.json()
+                    except ValueError:
+                        # A success status with a body that is not JSON, e.g. a proxy error page
+                        self.breaker.record_failure()
+                        error = ProviderError(f"LinkedIn returned a response that is not JSON ({response.status_code})")
+                    else:
+                        self.breaker.record_success()
+                        registry.incr("linkedin_requests", outcome="ok")
+                        return payload
+                elif response.status_code not in RETRYABLE_STATUS_CODES:
+                    # Client errors are the caller's fault, not the provider's
+                    self.breaker.record_success()
+                    registry.incr("linkedin_requests", outcome="client_error")
+                    raise ProviderError(f"LinkedIn returned {response.status_code}: {response.text}")
+                else:
+                    self.breaker.record_failure()
+                    error = ProviderError(f"LinkedIn returned {response.status_code}")
+            finally:
+                # A trial that ends without an outcome (cancelled, or an unexpected error) must not keep the circuit shut
+                self.breaker.release_trial()
+
+            registry.incr("linkedin_requests", outcome="retryable_error")
+            if attempt < self.max_retries:
+                # Exponential backoff with full jitter
+                await asyncio.sleep(random.uniform(0, self.backoff_base * 2 ** attempt))
+
+        raise error
+
+    def authorization_url(self, state: str) -> str:
+        query = urlencode({
+            "response_type": "code",
+            "client_id": LINKEDIN_CLIENT_ID,
+            "redirect_uri": LINKEDIN_REDIRECT_URI,
+            "state": state,
+            "scope": LINKEDIN_SCOPES
+        })
+        return f"{self.auth_base_url}/oauth/v2/authorization?{query}"
+
+    async def exchange_code(self, code: str) -> dict:
+        return await self._request("POST", f"{self.auth_base_url}/oauth/v2/accessToken", data={
+            "grant_type": "authorization_code",
+            "code": code,
+            "redirect_uri": LINKEDIN_REDIRECT_URI,
+            "client_id": LINKEDIN_CLIENT_ID,
+            "client_secret": LINKEDIN_CLIENT_SECRET
+        })
+
+    async def get_profile(self, access_token: str) -> dict:
+        return await self._request("GET", f"{self.base_url}/v2/me", headers={
+            "Authorization": f"Bearer {access_token}"
+        })
+
+    async def get_member_metrics(self, access_token: str, member_id: str) -> dict:
+        cached = self.metrics_cache.get(member_id)
+        if cached is not None:
+            registry.incr("linkedin_metrics_cache_hits")
+            return cached
+
+        metrics = await self._request("GET", f"{self.base_url}/v2/metrics", params={"member": member_id}, headers={
+            "Authorization": f"Bearer {access_token}"
+        })
+        self.metrics_cache.put(member_id, metrics)
+        return metrics
+
+
+class LinkedInApiProvider:
+    """
+    Social provider backed by the LinkedIn API (or the local fake server)
+    """
+    platform = "linkedin"
+    verification_method = "oauth"
+    max_concurrency = 20
+    rate_limit_per_second = 20
+
+    def __init__(self, client: LinkedInClient = None):
+        self.client = client or LinkedInClient()
+
+    async def fetch_metrics(self, account: dict) -> dict:
+        access_token = account.get("access_token")
+        token_expires_at = account.get("token_expires_at")
+        if account.get("code"):
+            token = await self.client.exchange_code(account["code"])
+            with unexpected_payload("token"):
+                access_token = token["access_token"]
+                token_expires_at = datetime.utcnow() + timedelta(seconds=token.get("expires_in", 0))
+        if not access_token:
+            raise ProviderError("No LinkedIn access token for account")
+
+        member_id = account.get("platform_user_id")
+        profile = None
+        if not member_id:
+            profile = await self.client.get_profile(access_token)
+            with unexpected_payload("profile"):
+                member_id = profile["id"]
+
+        metrics = await self.client.get_member_metrics(access_token, member_id)
+        try:
+            with unexpected_payload("metrics"):
+                result = {
+                    "platform_user_id": member_id,
+                    "access_token": access_token,
+                    "token_expires_at": token_expires_at,
+                    "follower_count": metrics["follower_count"],
+                    "connection_count": metrics.get("connection_count", metrics["follower_count"]),
+                    "engagement_rate": metrics["engagement_rate"],
+                    "bot_follower_percentage": metrics["bot_follower_percentage"],
+                    "account_age_months": metrics["account_age_months"],
+                    "posts_last_90_days": metrics["posts_last_90_days"]
+                }
+        except ProviderError:
+            # Don't serve the malformed payload from the cache until it expires
+            self.client.metrics_cache.invalidate(member_id)
+            raise
+        if profile is not None:
+            result["username"] = profile.get("vanityName", member_id)
+            result["profile_url"] = profile.get("profileUrl", f"https://linkedin.com/in/{result['username']}")
+        return result
+
+    async def close(self):
+        await self.client.close()
@@ -0,0 +1,63 @@
+import threading
+from collections import defaultdict
+
+
+def _key(name: str, labels: dict) -> tuple:
+    return (name, tuple(sorted(labels.items())))
+
+
+class MetricsRegistry:
+    """
+    Minimal in-process metrics registry (counters, gauges and summaries)
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._gauges = {}
+        self._summaries = {}
+
+    def incr(self, name: str, value: float = 1, **labels):
+        with self._lock:
+            self._counters[_key(name, labels)] += value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        with self._lock:
+            self._gauges[_key(name, labels)] = value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is None:
+                summary = {"count": 0, "sum": 0.0, "max": value}
+                self._summaries[key] = summary
+            summary["count"] += 1
+            summary["sum"] += value
+            summary["max"] = max(summary["max"], value)
+
+    def get_counter(self, name: str, **labels) -> float:
+        return self._counters.get(_key(name, labels), 0)
+
+    def get_gauge(self, name: str, **labels):
+        return self._gauges.get(_key(name, labels))
+
+    def snapshot(self) -> dict:
+        def render(items, value_fn):
+            result = defaultdict(list)
+            for (name, labels), value in items:
+                result[name].append({"labels": dict(labels), **value_fn(value)})
+            return dict(result)
+
+        with self._lock:
+            return {
+                "counters": render(self._counters.items(), lambda v: {"value": v}),
+                "gauges": render(self._gauges.items(), lambda v: {"value": v}),
+                "summaries": render(
+                    self._summaries.items(),
+                    lambda s: {**s, "avg": round(s["sum"] / s["count"], 2) if s["count"] else 0},
+                ),
+            }
+
+
+registry = MetricsRegistry()
@@ -96,6 +96,7 @@ class TransactionType(str, Enum):
     ORDER_PAYMENT = "order_payment"
     ORDER_REFUND = "order_refund"
     EARNINGS_RECEIVED = "earnings_received"
+    EARNINGS_REVERSED = "earnings_reversed"
     WITHDRAWAL = "withdrawal"
     PLATFORM_FEE = "platform_fee"
     BONUS = "bonus"
@@ -150,6 +151,8 @@ class User(BaseModel):
     kyc_documents: Optional[KYCDocuments] = None
     seller_profile: Optional[SellerProfile] = None
     buyer_profile: Optional[BuyerProfile] = None
+    is_mediator: bool = False
+    is_admin: bool = False
     last_active: Optional[datetime] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
@@ -224,6 +227,13 @@ class ProofOfCompletion(BaseModel):
     submitted_at: Optional[datetime] = None
     verified: bool = False
     verification_method: Optional[str] = None
+    verification_status: Optional[str] = None
+    verification_attempts: int = 0
+    verification_lease_until: Optional[datetime] = None
+    verification_checks: Dict[str, bool] = {}
+    verification_notes: List[str] = []
+    reused_screenshots: List[Dict[str, Any]] = []
+    verified_at: Optional[datetime] = None
 
 class RevisionRequest(BaseModel):
     requested_at: datetime
@@ -249,8 +259,13 @@ class Order(BaseModel):
     platform: str
     base_cost: float
     platform_fee: float
+    seller_tier: Optional[str] = None
     express_fee: float = 0.0
     total_cost: float
+    # Buyer's share of a partially refunded order
+    refund_amount: Optional[float] = None
+    # Earnings currently paid out to the seller once a dispute settles; approval alone pays base_cost
+    seller_credited: Optional[float] = None
     brief: Optional[str] = None
     attachments: List[str] = []
     hashtags: List[str] = []
@@ -271,6 +286,7 @@ class Order(BaseModel):
     accepted_at: Optional[datetime] = None
     delivered_at: Optional[datetime] = None
     completed_at: Optional[datetime] = None
+    escrow_settled_at: Optional[datetime] = None
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
     class Config:
@@ -321,6 +337,13 @@ class Dispute(BaseModel):
     status: DisputeStatus = DisputeStatus.OPEN
     mediator_id: Optional[str] = None
     mediator_assigned_at: Optional[datetime] = None
+    lease_expires_at: Optional[datetime] = None
+    amount_at_stake: float = 0.0
+    # Only buyer disputes over unsettled orders may be decided by default
+    default_judgement_eligible: bool = False
+    priority: float = 0.0
+    escalation_level: int = 0
+    next_escalation_at: Optional[datetime] = None
     mediator_notes: Optional[str] = None
     resolution_type: Optional[ResolutionType] = None
     resolution_details: Optional[str] = None
@@ -362,6 +385,7 @@ class OTP(BaseModel):
     otp_code: str
     otp_type: str
     verified: bool = False
+    attempts: int = 0
     expires_at: datetime
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
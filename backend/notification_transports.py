@@ -0,0 +1,64 @@
+import asyncio
+import os
+import random
+from collections import deque
+
+EMAIL = "email"
+SMS = "sms"
+PUSH = "push"
+
+
+class FakeTransport:
+    """
+    Local stand-in for an email, SMS or push gateway. Accepts a whole batch
+    per call after a simulated round trip and keeps the recent outbox for
+    inspection.
+    """
+
+    def __init__(self, channel: str, max_batch_size: int, latency_ms: float = None, failure_rate: float = None):
+        self.channel = channel
+        self.max_batch_size = max_batch_size
+        self.latency_ms = float(os.getenv("NOTIFY_FAKE_LATENCY_MS", "20")) if latency_ms is None else latency_ms
+        self.failure_rate = float(os.getenv("NOTIFY_FAKE_FAILURE_RATE", "0")) if failure_rate is None else failure_rate
+        self.outbox = deque(maxlen=1000)
+        self.batches = 0
+
+    async def send_batch(self, messages: list) -> dict:
+        """
+        Send messages ({"id", "to", "subject", "body"}); returns an error
+        string per message id, None for the ones that went out
+        """
+        await asyncio.sleep(self.latency_ms / 1000)
+        self.batches += 1
+        results = {}
+        for message in messages:
+            if random.random() < self.failure_rate:
+                results[message["id"]] = "Gateway rejected the message"
+                continue
+            self.outbox.append(message)
+            results[message["id"]] = None
+        return results
+
+
+TRANSPORTS = {
+    EMAIL: FakeTransport(EMAIL, max_batch_size=100),
+    SMS: FakeTransport(SMS, max_batch_size=50),
+    PUSH: FakeTransport(PUSH, max_batch_size=500),
+}
+
+
+def get_transport(channel: str):
+    transport = TRANSPORTS.get(channel)
+    if transport is None:
+        raise KeyError(f"No notification transport registered for {channel}")
+    return transport
+
+
+def register_transport(transport):
+    TRANSPORTS[transport.channel] = transport
+
+
+async def close_transports():
+    for transport in TRANSPORTS.values():
+        if hasattr(transport, "close"):
+            await transport.close()
@@ -0,0 +1,369 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+from metrics import registry
+from notification_transports import EMAIL, PUSH, SMS, TRANSPORTS, get_transport
+
+logger = logging.getLogger(__name__)
+
+# Digestible events for the same user and channel are held this long and sent as one message
+NOTIFICATION_DIGEST_SECONDS = int(os.getenv("NOTIFICATION_DIGEST_SECONDS", "300"))
+NOTIFICATION_POLL_SECONDS = int(os.getenv("NOTIFICATION_POLL_SECONDS", "5"))
+NOTIFICATION_LEASE_SECONDS = int(os.getenv("NOTIFICATION_LEASE_SECONDS", "60"))
+NOTIFICATION_MAX_ATTEMPTS = int(os.getenv("NOTIFICATION_MAX_ATTEMPTS", "5"))
+NOTIFICATION_RETRY_SECONDS = int(os.getenv("NOTIFICATION_RETRY_SECONDS", "30"))
+NOTIFICATION_RETENTION_DAYS = int(os.getenv("NOTIFICATION_RETENTION_DAYS", "7"))
+# Items kept on a digest to name in the message; the count keeps going past it
+DIGEST_MAX_ITEMS = 10
+
+QUEUED = "queued"
+RETRY = "retry"
+SENDING = "sending"
+SENT = "sent"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+# Per event: channels, whether it is digested, and the single/digest templates.
+# `label` names the item field listed in a digest.
+EVENTS = {
+    "otp": {
+        "channels": [EMAIL],
+        "digest": False,
+        "subject": "Your Warm Connects verification code",
+        "body": "Your verification code is {otp_code}. It expires in {expires_minutes} minutes.",
+    },
+    "order_received": {
+        "channels": [EMAIL, PUSH],
+        "digest": True,
+        "label": "order_number",
+        "subject": "New order {order_number}",
+        "body": "You have a new order for {service_title}. Accept or decline it from your dashboard.",
+        "digest_subject": "You have {count} new orders",
+        "digest_body": "You have {count} new orders waiting for a response, including {labels}.",
+    },
+    "order_accepted": {
+        "channels": [EMAIL, PUSH],
+        "digest": True,
+        "label": "order_number",
+        "subject": "Order {order_number} accepted",
+        "body": "Your order for {service_title} was accepted. Delivery is due by {deadline}.",
+        "digest_subject": "{count} of your orders were accepted",
+        "digest_body": "{count} of your orders were accepted, including {labels}.",
+    },
+    "order_delivered": {
+        "channels": [EMAIL, PUSH],
+        "digest": True,
+        "label": "order_number",
+        "subject": "Order {order_number} delivered",
+        "body": "Proof for {service_title} was submitted. Review it within 72 hours.",
+        "digest_subject": "{count} of your orders were delivered",
+        "digest_body": "{count} of your orders are waiting for your review, including {labels}.",
+    },
+    "order_late": {
+        "channels": [EMAIL, PUSH],
+        "digest": True,
+        "label": "order_number",
+        "subject": "Order {order_number} is past its deadline",
+        "body": "Delivery of {service_title} was due by {deadline}. The order is cancelled and refunded "
+                "if it is not delivered within {grace_hours} hours.",
+        "digest_subject": "{count} orders are past their deadline",
+        "digest_body": "{count} orders are past their delivery deadline, including {labels}.",
+    },
+    "order_expired": {
+        "channels": [EMAIL, PUSH],
+        "digest": True,
+        "label": "order_number",
+        "subject": "Order {order_number} cancelled",
+        "body": "{service_title} was not delivered within {grace_hours} hours of its deadline, "
+                "so the order was cancelled and the buyer refunded.",
+        "digest_subject": "{count} orders were cancelled",
+        "digest_body": "{count} orders were cancelled for missing their deadline and refunded, including {labels}.",
+    },
+    "dispute_opened": {
+        "channels": [EMAIL, PUSH, SMS],
+        "digest": False,
+        "subject": "Dispute {dispute_number} opened",
+        "body": "A dispute was opened on order {order_number}. Respond within {response_hours} hours.",
+    },
+}
+
+USER_PROJECTION = {"email": 1, "phone": 1, "phone_verified": 1}
+
+
+async def ensure_indexes(db):
+    await db.notifications.create_index([("channel", 1), ("status", 1), ("send_after", 1)])
+    await db.notifications.create_index("claim_id", sparse=True)
+    # At most one open digest per (user, channel, event); new events join it until it is claimed
+    await db.notifications.create_index(
+        "digest_key", unique=True, partialFilterExpression={"status": QUEUED, "digest": True}
+    )
+    await db.notifications.create_index("finished_at", expireAfterSeconds=NOTIFICATION_RETENTION_DAYS * 86400)
+
+
+def _operations(user_id: str, event: str, data: dict, now: datetime) -> list:
+    config = EVENTS[event]
+    operations = []
+    for channel in config["channels"]:
+        base = {
+            "user_id": user_id,
+            "channel": channel,
+            "event": event,
+            "attempts": 0,
+            "lease_until": None,
+            "created_at": now
+        }
+        if not config["digest"]:
+            operations.append(InsertOne({
+                **base, "digest": False, "data": data, "count": 1, "status": QUEUED, "send_after": now
+            }))
+            continue
+        operations.append(UpdateOne(
+            {"digest_key": f"{user_id}:{channel}:{event}", "status": QUEUED, "digest": True},
+            {
+                "$inc": {"count": 1},
+                "$push": {"items": {"$each": [data], "$slice": DIGEST_MAX_ITEMS}},
+                "$setOnInsert": {**base, "send_after": now + timedelta(seconds=NOTIFICATION_DIGEST_SECONDS)}
+            },
+            upsert=True
+        ))
+    return operations
+
+
+async def notify_many(db, notifications: list, now: datetime = None):
+    """
+    Queue (user_id, event, data) notifications in one bulk write. Digestible
+    events fold into the user's open digest for that channel instead of
+    adding a message each.
+    """
+    now = now or datetime.utcnow()
+    operations = [
+        operation
+        for user_id, event, data in notifications
+        for operation in _operations(user_id, event, data, now)
+    ]
+    if not operations:
+        return
+
+    try:
+        result = await db.notifications.bulk_write(operations, ordered=False)
+    except BulkWriteError as e:
+        # Concurrent upserts opened the same digest; add to the one that won
+        retry = [operations[error["index"]] for error in e.details["writeErrors"] if error["code"] == 11000]
+        if len(retry) < len(e.details["writeErrors"]):
+            raise
+        await db.notifications.bulk_write(retry, ordered=False)
+        result = None
+
+    for user_id, event, data in notifications:
+        registry.incr("notifications_enqueued", len(EVENTS[event]["channels"]), event=event)
+    if result is not None:
+        registry.incr("notifications_coalesced", result.matched_count)
+
+    if any(not EVENTS[event]["digest"] for _, event, _ in notifications):
+        notifier.wake()
+
+
+async def notify(db, user_id: str, event: str, data: dict, now: datetime = None):
+    await notify_many(db, [(user_id, event, data)], now=now)
+
+
+def order_notice(order: dict, **extra) -> dict:
+    """
+    Template data for an order notification; datetimes are rendered for display
+    """
+    extra = {
+        key: f"{value:%Y-%m-%d %H:%M} UTC" if isinstance(value, datetime) else value
+        for key, value in extra.items()
+    }
+    return {"order_id": str(order["_id"]), "order_number": order["order_number"],
+            "service_title": order.get("service_title", ""), **extra}
+
+
+def _address(user: dict, channel: str):
+    if channel == EMAIL:
+        return user.get("email")
+    if channel == SMS:
+        return user.get("phone") if user.get("phone_verified") else None
+    return str(user["_id"])
+
+
+def render(notification: dict) -> tuple:
+    config = EVENTS[notification["event"]]
+    if not notification["digest"]:
+        data = notification["data"]
+        return config["subject"].format(**data), config["body"].format(**data)
+
+    items = notification.get("items", [])
+    if notification["count"] == 1:
+        return config["subject"].format(**items[0]), config["body"].format(**items[0])
+    labels = ", ".join(str(item.get(config["label"], "")) for item in items[:5])
+    context = {"count": notification["count"], "labels": labels}
+    return config["digest_subject"].format(**context), config["digest_body"].format(**context)
+
+
+class Notifier:
+    """
+    One worker per channel claims due notifications in batches sized to the
+    channel's transport, renders them and hands the whole batch over in one
+    call. The queue lives in the notifications collection, so queued and
+    half-sent messages survive a restart.
+    """
+
+    def __init__(self):
+        self._wakeups = {}
+
+    def _wakeup(self, channel: str) -> asyncio.Event:
+        if channel not in self._wakeups:
+            self._wakeups[channel] = asyncio.Event()
+        return self._wakeups[channel]
+
+    def wake(self):
+        for channel in TRANSPORTS:
+            self._wakeup(channel).set()
+
+    async def claim_batch(self, db, channel: str, limit: int, now: datetime) -> list:
+        due = await db.notifications.find(
+            {"channel": channel, "status": {"$in": [QUEUED, RETRY, SENDING]}, "send_after": {"$lte": now},
+             "$or": [{"lease_until": None}, {"lease_until": {"$lt": now}}]},
+            {"_id": 1}
+        ).sort("send_after", 1).limit(limit).to_list(length=limit)
+        if not due:
+            return []
+
+        # Tag the claim so a concurrent worker cannot take the same messages
+        claim_id = uuid.uuid4().hex
+        await db.notifications.update_many(
+            {"_id": {"$in": [notification["_id"] for notification in due]},
+             "$or": [{"lease_until": None}, {"lease_until": {"$lt": now}}]},
+            {
+                "$set": {
+                    "status": SENDING,
+                    "claim_id": claim_id,
+                    "lease_until": now + timedelta(seconds=NOTIFICATION_LEASE_SECONDS)
+                },
+                "$inc": {"attempts": 1}
+            }
+        )
+        return await db.notifications.find({"claim_id": claim_id}).to_list(length=limit)
+
+    async def process_batch(self, db, channel: str) -> int:
+        """
+        Send one batch for a channel; returns how many notifications it handled
+        """
+        transport = get_transport(channel)
+        now = datetime.utcnow()
+        batch = await self.claim_batch(db, channel, transport.max_batch_size, now)
+        if not batch:
+            return 0
+
+        user_ids = list({notification["user_id"] for notification in batch})
+        users = await db.users.find(
+            {"_id": {"$in": [ObjectId(user_id) for user_id in user_ids]}}, USER_PROJECTION
+        ).to_list(length=len(user_ids))
+        users_by_id = {str(user["_id"]): user for user in users}
+
+        messages = []
+        outcomes = {}
+        for notification in batch:
+            user = users_by_id.get(notification["user_id"])
+            address = _address(user, channel) if user else None
+            if not address:
+                outcomes[notification["_id"]] = (SKIPPED, "No address for channel")
+                continue
+            subject, body = render(notification)
+            messages.append({"id": str(notification["_id"]), "to": address, "subject": subject, "body": body})
+
+        started = time.perf_counter()
+        try:
+            results = await transport.send_batch(messages) if messages else {}
+        except Exception as e:
+            logger.warning(f"{channel} transport failed for a batch of {len(messages)}: {e}")
+            results = {message["id"]: str(e) for message in messages}
+        registry.observe("notification_send_seconds", time.perf_counter() - started, channel=channel)
+        registry.observe("notification_batch_size", len(messages), channel=channel)
+
+        for notification in batch:
+            if notification["_id"] in outcomes:
+                continue
+            error = results.get(str(notification["_id"]), "No result from transport")
+            if error is None:
+                outcomes[notification["_id"]] = (SENT, None)
+            elif notification["attempts"] >= NOTIFICATION_MAX_ATTEMPTS:
+                outcomes[notification["_id"]] = (FAILED, error)
+            else:
+                outcomes[notification["_id"]] = (RETRY, error)
+
+        operations = []
+        for notification in batch:
+            status, error = outcomes[notification["_id"]]
+            update = {"status": status, "lease_until": None, "claim_id": None, "last_error": error}
+            if status == RETRY:
+                # Not back to queued: a new digest for the same key may already be open
+                update["send_after"] = now + timedelta(seconds=NOTIFICATION_RETRY_SECONDS * notification["attempts"])
+            else:
+                update["finished_at"] = now
+            operations.append(UpdateOne({"_id": notification["_id"], "claim_id": notification["claim_id"]}, {"$set": update}))
+        await db.notifications.bulk_write(operations, ordered=False)
+
+        for status in (SENT, FAILED, SKIPPED, RETRY):
+            count = sum(1 for outcome, _ in outcomes.values() if outcome == status)
+            if count:
+                registry.incr("notifications_processed", count, channel=channel, status=status)
+        return len(batch)
+
+    async def drain(self, db) -> int:
+        processed = 0
+        for channel in TRANSPORTS:
+            while True:
+                handled = await self.process_batch(db, channel)
+                processed += handled
+                if not handled:
+                    break
+        return processed
+
+    async def update_gauges(self, db, now: datetime = None):
+        now = now or datetime.utcnow()
+        for channel in TRANSPORTS:
+            due = {"channel": channel, "status": {"$in": [QUEUED, RETRY]}, "send_after": {"$lte": now}}
+            backlog = await db.notifications.count_documents(due)
+            oldest = await db.notifications.find_one(due, {"send_after": 1}, sort=[("send_after", 1)])
+            registry.set_gauge("notification_backlog", backlog, channel=channel)
+            registry.set_gauge(
+                "notification_oldest_due_seconds",
+                (now - oldest["send_after"]).total_seconds() if oldest else 0,
+                channel=channel
+            )
+
+    async def _worker(self, db, channel: str):
+        wakeup = self._wakeup(channel)
+        while True:
+            wakeup.clear()
+            try:
+                if await self.process_batch(db, channel):
+                    continue
+            except Exception as e:
+                logger.error(f"Notification worker for {channel} failed: {e}")
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout=NOTIFICATION_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _monitor(self, db):
+        while True:
+            try:
+                await self.update_gauges(db)
+            except Exception as e:
+                logger.error(f"Notification gauges failed: {e}")
+            await asyncio.sleep(NOTIFICATION_POLL_SECONDS * 3)
+
+    async def run(self, db):
+        await asyncio.gather(self._monitor(db), *(self._worker(db, channel) for channel in TRANSPORTS))
+
+
+notifier = Notifier()
@@ -0,0 +1,256 @@
+import os
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import List, Optional
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo import ReturnDocument, UpdateOne
+from models import OrderStatus, EscrowStatus, TransactionType
+
+MAX_REVISIONS = 1
+# Days after an order settles during which either party may still dispute it; archival waits this out
+DISPUTE_WINDOW_DAYS = int(os.getenv("DISPUTE_WINDOW_DAYS", "30"))
+
+SETTLED_ESCROW_STATUSES = [EscrowStatus.RELEASED.value, EscrowStatus.REFUNDED.value]
+
+
+@dataclass(frozen=True)
+class Transition:
+    from_statuses: List[str]
+    to_status: str
+    escrow_status: Optional[str]
+    # "buyer", "seller", "party" (either side) or "system" (mediators, workers)
+    role: str
+    error: str
+    guard: dict = field(default_factory=dict)
+    guard_error: str = None
+
+
+TRANSITIONS = {
+    "accept": Transition(
+        [OrderStatus.PENDING_ACCEPTANCE.value],
+        OrderStatus.ACCEPTED.value, EscrowStatus.ACTIVE.value,
+        "seller", "Order cannot be accepted"
+    ),
+    "decline": Transition(
+        [OrderStatus.PENDING_ACCEPTANCE.value],
+        OrderStatus.CANCELLED.value, EscrowStatus.REFUNDED.value,
+        "seller", "Order cannot be declined"
+    ),
+    "deliver": Transition(
+        [OrderStatus.ACCEPTED.value, OrderStatus.REVISION_REQUESTED.value],
+        OrderStatus.DELIVERED.value, EscrowStatus.UNDER_REVIEW.value,
+        "seller", "Order cannot be delivered"
+    ),
+    "approve": Transition(
+        [OrderStatus.DELIVERED.value],
+        OrderStatus.APPROVED.value, EscrowStatus.RELEASED.value,
+        "buyer", "Order cannot be approved"
+    ),
+    "request_revision": Transition(
+        [OrderStatus.DELIVERED.value],
+        OrderStatus.REVISION_REQUESTED.value, None,
+        "buyer", "Order cannot be revised",
+        guard={"revision_count": {"$not": {"$gte": MAX_REVISIONS}}},
+        guard_error="Maximum revisions exceeded"
+    ),
+    "dispute": Transition(
+        [OrderStatus.ACCEPTED.value, OrderStatus.DELIVERED.value, OrderStatus.REVISION_REQUESTED.value,
+         OrderStatus.APPROVED.value, OrderStatus.COMPLETED.value],
+        OrderStatus.DISPUTED.value, EscrowStatus.DISPUTED.value,
+        "party", "Order cannot be disputed",
+        guard_error="The dispute window for this order has closed"
+    ),
+    "expire": Transition(
+        [OrderStatus.ACCEPTED.value],
+        OrderStatus.CANCELLED.value, EscrowStatus.REFUNDED.value,
+        "system", "Order is not awaiting delivery"
+    ),
+    "resolve_refund": Transition(
+        [OrderStatus.DISPUTED.value],
+        OrderStatus.REFUNDED.value, EscrowStatus.REFUNDED.value,
+        "system", "Order is not under dispute"
+    ),
+    "resolve_release": Transition(
+        [OrderStatus.DISPUTED.value],
+        OrderStatus.COMPLETED.value, EscrowStatus.RELEASED.value,
+        "system", "Order is not under dispute"
+    ),
+}
+
+
+def dispute_window(now: datetime) -> dict:
+    """
+    Orders still open to a dispute: unsettled, or settled within the window.
+    Orders settled before escrow_settled_at was recorded go by completed_at.
+    """
+    cutoff = now - timedelta(days=DISPUTE_WINDOW_DAYS)
+    return {"$or": [
+        {"escrow_settled_at": {"$gte": cutoff}},
+        {"escrow_settled_at": None, "completed_at": {"$not": {"$lt": cutoff}}}
+    ]}
+
+
+def _actor_filter(role: str, actor_id: Optional[str]) -> dict:
+    if role == "buyer":
+        return {"buyer_id": actor_id}
+    if role == "seller":
+        return {"seller_id": actor_id}
+    if role == "party":
+        return {"$or": [{"buyer_id": actor_id}, {"seller_id": actor_id}]}
+    return {}
+
+
+def _is_actor(order: dict, role: str, actor_id: Optional[str]) -> bool:
+    if role == "buyer":
+        return order["buyer_id"] == actor_id
+    if role == "seller":
+        return order["seller_id"] == actor_id
+    if role == "party":
+        return actor_id in (order["buyer_id"], order["seller_id"])
+    return True
+
+
+def _set_fields(transition: Transition, fields: dict, now: datetime) -> dict:
+    update = {"status": transition.to_status, "updated_at": now}
+    if transition.escrow_status:
+        update["escrow_status"] = transition.escrow_status
+    update.update(fields or {})
+    return update
+
+
+def _update_doc(transition: Transition, fields: dict, now: datetime, extra: dict = None) -> dict:
+    update = {**(extra or {}), "$set": _set_fields(transition, fields, now)}
+    if transition.escrow_status in SETTLED_ESCROW_STATUSES:
+        # First settlement only, so an order re-settled after a dispute keeps its analytics bucket
+        update["$min"] = {"escrow_settled_at": now}
+    return update
+
+
+async def _raise_for_failed(db, order_id: str, transition: Transition, actor_id: Optional[str]):
+    """
+    Work out why a guarded transition matched nothing. Only runs on the
+    failure path, so successful transitions stay a single round trip.
+    """
+    order = await db.orders.find_one(
+        {"_id": ObjectId(order_id)}, {"buyer_id": 1, "seller_id": 1, "status": 1}
+    )
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    if not _is_actor(order, transition.role, actor_id):
+        raise HTTPException(status_code=403, detail="Not authorized")
+    if order["status"] in transition.from_statuses and transition.guard_error:
+        raise HTTPException(status_code=400, detail=transition.guard_error)
+    raise HTTPException(status_code=400, detail=transition.error)
+
+
+async def transition_order(db, order_id: str, action: str, actor_id: str = None,
+                           fields: dict = None, update: dict = None, now: datetime = None,
+                           guard: dict = None) -> dict:
+    """
+    Move one order along `action` with a single find_one_and_update filtered
+    on the allowed current statuses, the acting role and any extra `guard`.
+    Returns the updated order with a string _id.
+    """
+    transition = TRANSITIONS[action]
+    if not ObjectId.is_valid(order_id):
+        raise HTTPException(status_code=404, detail="Order not found")
+
+    now = now or datetime.utcnow()
+    query = {
+        "_id": ObjectId(order_id),
+        "status": {"$in": transition.from_statuses},
+        **_actor_filter(transition.role, actor_id),
+        **transition.guard
+    }
+    if guard:
+        query["$and"] = [guard]
+    order = await db.orders.find_one_and_update(
+        query,
+        _update_doc(transition, fields, now, update),
+        return_document=ReturnDocument.AFTER
+    )
+    if not order:
+        await _raise_for_failed(db, order_id, transition, actor_id)
+
+    order["_id"] = str(order["_id"])
+    return order
+
+
+async def bulk_transition_orders(db, orders: list, action: str, fields: dict = None, now: datetime = None) -> set:
+    """
+    Move many already-authorized orders along `action` with one bulk_write,
+    each update guarded on the allowed current statuses. `fields` maps order
+    ids to extra $set fields. Returns the ids that actually moved.
+    """
+    if not orders:
+        return set()
+
+    transition = TRANSITIONS[action]
+    now = now or datetime.utcnow()
+    fields = fields or {}
+
+    # Tag our writes so orders changed concurrently can be told apart
+    action_id = uuid.uuid4().hex
+    operations = [
+        UpdateOne(
+            {"_id": order["_id"], "status": {"$in": transition.from_statuses}},
+            _update_doc(transition, {**(fields.get(str(order["_id"])) or {}), "bulk_action_id": action_id}, now)
+        )
+        for order in orders
+    ]
+    result = await db.orders.bulk_write(operations, ordered=False)
+    if result.modified_count == len(orders):
+        return {str(order["_id"]) for order in orders}
+
+    moved = await db.orders.find(
+        {"_id": {"$in": [order["_id"] for order in orders]}, "bulk_action_id": action_id}, {"_id": 1}
+    ).to_list(length=len(orders))
+    return {str(order["_id"]) for order in moved}
+
+
+async def refund_orders(db, orders: list, description: str, notes: str = None, now: datetime = None):
+    """
+    Refund the total cost of already-transitioned orders with one $inc per
+    buyer and one insert_many of per-order refund transactions.
+    `description` is formatted with the order's order_number.
+    """
+    if not orders:
+        return
+
+    now = now or datetime.utcnow()
+    refunds = {}
+    for order in orders:
+        refunds[order["buyer_id"]] = refunds.get(order["buyer_id"], 0) + order["total_cost"]
+
+    await db.users.bulk_write([
+        UpdateOne({"_id": ObjectId(buyer_id)}, {"$inc": {"buyer_profile.credit_balance": amount}})
+        for buyer_id, amount in refunds.items()
+    ], ordered=False)
+    buyers = await db.users.find(
+        {"_id": {"$in": [ObjectId(buyer_id) for buyer_id in refunds]}},
+        {"buyer_profile.credit_balance": 1}
+    ).to_list(length=len(refunds))
+
+    # Walk each buyer's balance up from before the refund, one order at a time
+    balances = {
+        str(buyer["_id"]): buyer.get("buyer_profile", {}).get("credit_balance", 0) - refunds[str(buyer["_id"])]
+        for buyer in buyers
+    }
+    transactions = []
+    for order in orders:
+        balance_before = balances.get(order["buyer_id"], 0)
+        balances[order["buyer_id"]] = balance_before + order["total_cost"]
+        transactions.append({
+            "user_id": order["buyer_id"],
+            "transaction_type": TransactionType.ORDER_REFUND.value,
+            "amount": order["total_cost"],
+            "balance_before": balance_before,
+            "balance_after": balance_before + order["total_cost"],
+            "order_id": str(order["_id"]),
+            "description": description.format(order_number=order["order_number"]),
+            "notes": notes,
+            "created_at": now
+        })
+    await db.transactions.insert_many(transactions)
@@ -0,0 +1,80 @@
+import os
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from utils import generate_otp
+
+OTP_EXPIRE_MINUTES = int(os.getenv("OTP_EXPIRE_MINUTES", "10"))
+OTP_MAX_ATTEMPTS = int(os.getenv("OTP_MAX_ATTEMPTS", "5"))
+
+
+async def ensure_indexes(db):
+    await db.otps.create_index("expires_at", expireAfterSeconds=0)
+    if "email_1_otp_type_1" not in await db.otps.index_information():
+        await _drop_duplicate_otps(db)
+    await db.otps.create_index([("email", 1), ("otp_type", 1)], unique=True)
+
+
+async def _drop_duplicate_otps(db) -> int:
+    """
+    Keep only the newest OTP per (email, otp_type). Older code stored one
+    document per request, which would block the unique index.
+    """
+    duplicates = db.otps.aggregate([
+        {"$sort": {"created_at": -1}},
+        {"$group": {"_id": {"email": "$email", "otp_type": "$otp_type"}, "ids": {"$push": "$_id"}}},
+        {"$match": {"ids.1": {"$exists": True}}}
+    ], allowDiskUse=True)
+    stale = []
+    async for group in duplicates:
+        stale.extend(group["ids"][1:])
+    if not stale:
+        return 0
+    result = await db.otps.delete_many({"_id": {"$in": stale}})
+    return result.deleted_count
+
+
+async def issue_otp(db, email: str, otp_type: str) -> str:
+    """
+    Generate an OTP, replacing any active one for the same (email, otp_type)
+    """
+    otp_code = generate_otp()
+    now = datetime.utcnow()
+    update = {"$set": {
+        "otp_code": otp_code,
+        "verified": False,
+        "attempts": 0,
+        "expires_at": now + timedelta(minutes=OTP_EXPIRE_MINUTES),
+        "created_at": now
+    }}
+    try:
+        await db.otps.update_one({"email": email, "otp_type": otp_type}, update, upsert=True)
+    except DuplicateKeyError:
+        # Lost an upsert race with a concurrent request, the document exists now
+        await db.otps.update_one({"email": email, "otp_type": otp_type}, update)
+    return otp_code
+
+
+async def verify_otp(db, email: str, otp_type: str, otp_code: str):
+    """
+    Check an OTP in one atomic round trip.
+
+    A matching code marks the OTP verified; a wrong code consumes an attempt.
+    Returns the updated OTP document, or None when there is no active OTP
+    (missing, expired, already used or out of attempts).
+    """
+    is_match = {"$eq": ["$otp_code", otp_code]}
+    return await db.otps.find_one_and_update(
+        {
+            "email": email,
+            "otp_type": otp_type,
+            "verified": False,
+            "expires_at": {"$gt": datetime.utcnow()},
+            "attempts": {"$lt": OTP_MAX_ATTEMPTS}
+        },
+        [{"$set": {
+            "verified": is_match,
+            "attempts": {"$cond": [is_match, "$attempts", {"$add": ["$attempts", 1]}]}
+        }}],
+        return_document=ReturnDocument.AFTER
+    )
@@ -0,0 +1,51 @@
+import io
+import numpy as np
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional, screenshots are simply not hashed without it
+    Image = None
+
+HASH_SIZE = 8
+# Images are reduced to this many pixels a side before the DCT
+SAMPLE_SIZE = 32
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+
+DCT = _dct_matrix(SAMPLE_SIZE)
+
+
+def phash_available() -> bool:
+    return Image is not None
+
+
+def compute_phash(data: bytes) -> int:
+    """
+    64-bit DCT perceptual hash: the low-frequency 8x8 block of a 32x32
+    grayscale thumbnail, one bit per coefficient above the block's median.
+    Re-encoding, resizing or light compression barely move it.
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        pixels = np.asarray(
+            image.convert("L").resize((SAMPLE_SIZE, SAMPLE_SIZE), Image.LANCZOS), dtype=np.float64
+        )
+    coefficients = (DCT @ pixels @ DCT.T)[:HASH_SIZE, :HASH_SIZE]
+    # The DC term only tracks overall brightness, so it is left out of the median
+    median = np.median(coefficients.flatten()[1:])
+    bits = (coefficients > median).flatten()
+    return int("".join("1" if bit else "0" for bit in bits), 2)
+
+
+def phash_hex(value: int) -> str:
+    return f"{value:016x}"
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
@@ -0,0 +1,239 @@
+import asyncio
+import logging
+import math
+import os
+from itertools import combinations
+import numpy as np
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Screenshots whose perceptual hashes differ in at most this many bits count as the same image
+PHASH_MATCH_DISTANCE = int(os.getenv("PHASH_MATCH_DISTANCE", "8"))
+PHASH_INDEX_SYNC_SECONDS = int(os.getenv("PHASH_INDEX_SYNC_SECONDS", "60"))
+# New hashes are scanned linearly until there are this many, then merged into the tables
+PHASH_INDEX_MIN_PENDING = int(os.getenv("PHASH_INDEX_MIN_PENDING", "4096"))
+PHASH_INDEX_LOAD_BATCH = 50000
+
+HASH_BITS = 64
+# Substrings up to this wide get a directly addressed bucket table (4 bytes per possible key)
+DIRECT_TABLE_BITS = 24
+
+_POPCOUNT8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def popcount(values: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    return _POPCOUNT8[values.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+
+def substrings_for(size: int) -> int:
+    """
+    Number of hash substrings for an index of `size` hashes: about 64 / log2(size),
+    so each substring table holds roughly one hash per key
+    """
+    return max(2, min(8, round(HASH_BITS / max(math.log2(max(size, 2)), 16))))
+
+
+def _split(substrings: int) -> list:
+    """
+    (shift, bits) of each substring, sharing out the 64 bits as evenly as possible
+    """
+    widths = [HASH_BITS // substrings + (1 if i < HASH_BITS % substrings else 0) for i in range(substrings)]
+    spans = []
+    shift = HASH_BITS
+    for bits in widths:
+        shift -= bits
+        spans.append((shift, bits))
+    return spans
+
+
+_flip_masks = {}
+
+
+def _masks(bits: int, radius: int) -> np.ndarray:
+    """
+    Every `bits`-wide XOR mask with at most `radius` bits set
+    """
+    key = (bits, radius)
+    if key not in _flip_masks:
+        masks = [0]
+        for r in range(1, radius + 1):
+            masks.extend(sum(1 << b for b in combo) for combo in combinations(range(bits), r))
+        _flip_masks[key] = np.array(masks, dtype=np.uint64)
+    return _flip_masks[key]
+
+
+def _build_tables(hashes: np.ndarray, substrings: int) -> tuple:
+    """
+    (spans, tables) for a sorted array of unique hashes
+    """
+    spans = _split(substrings)
+    tables = []
+    for shift, bits in spans:
+        keys = ((hashes >> np.uint64(shift)) & np.uint64((1 << bits) - 1)).astype(np.uint32)
+        positions = np.argsort(keys).astype(np.uint32)
+        keys = keys[positions]
+        if bits <= DIRECT_TABLE_BITS:
+            # Bucket offsets by key, so a probe is two array reads instead of a binary search
+            keys = np.searchsorted(keys, np.arange((1 << bits) + 1, dtype=np.uint64)).astype(np.uint32)
+        tables.append((keys, positions))
+    return spans, tables
+
+
+class PHashIndex:
+    """
+    Multi-index hashing over 64-bit perceptual hashes. Each hash is cut into
+    m substrings, each with its own sorted table. Two hashes within distance r
+    agree to within floor(r / m) bits on at least one substring, so a query
+    only probes those small neighbourhoods instead of scanning every hash.
+
+    The tables are rebuilt from the proof_hashes collection at startup and
+    kept current by tailing it; recent additions sit in a small pending set
+    until there are enough to merge. Rebuilds run in a worker thread and are
+    swapped in whole, so queries keep being served from the old tables.
+    """
+
+    def __init__(self, substrings: int = None):
+        self.fixed_substrings = substrings
+        self._hashes = np.empty(0, dtype=np.uint64)
+        self._tables = []
+        self._spans = []
+        self._pending = set()
+        self._last_id = None
+        self._loaded = False
+        self._lock = asyncio.Lock()
+
+    def __len__(self):
+        return len(self._hashes) + len(self._pending)
+
+    @property
+    def nbytes(self) -> int:
+        return self._hashes.nbytes + sum(keys.nbytes + positions.nbytes for keys, positions in self._tables)
+
+    def _indexed(self, values) -> tuple:
+        hashes = np.unique(np.asarray(values, dtype=np.uint64))
+        return (hashes, *_build_tables(hashes, self.fixed_substrings or substrings_for(len(hashes))))
+
+    def build(self, values):
+        """
+        Replace the index contents with `values` (ints or a uint64 array)
+        """
+        self._hashes, self._spans, self._tables = self._indexed(values)
+        self._pending = set()
+
+    async def rebuild(self, values):
+        """
+        build() off the event loop
+        """
+        indexed = await asyncio.to_thread(self._indexed, values)
+        self._hashes, self._spans, self._tables = indexed
+        self._pending = set()
+
+    async def _merge(self):
+        merged = set(self._pending)
+        pending = np.fromiter(merged, dtype=np.uint64, count=len(merged))
+        indexed = await asyncio.to_thread(self._indexed, np.concatenate([self._hashes, pending]))
+        self._hashes, self._spans, self._tables = indexed
+        # Hashes added while the merge ran stay pending
+        self._pending -= merged
+        registry.set_gauge("phash_index_size", len(self._hashes))
+
+    def __contains__(self, value: int) -> bool:
+        if value in self._pending:
+            return True
+        position = np.searchsorted(self._hashes, np.uint64(value))
+        return position < len(self._hashes) and int(self._hashes[position]) == value
+
+    async def add(self, value: int):
+        if value in self:
+            return
+        self._pending.add(value)
+        # Pending hashes are scanned on every query, so keep them to a fixed number
+        if len(self._pending) >= PHASH_INDEX_MIN_PENDING:
+            await self._merge()
+
+    def query(self, value: int, radius: int = PHASH_MATCH_DISTANCE) -> list:
+        """
+        (hash, distance) for every indexed hash within `radius` bits of `value`,
+        nearest first
+        """
+        matches = [
+            (pending, bin(pending ^ value).count("1"))
+            for pending in self._pending if bin(pending ^ value).count("1") <= radius
+        ]
+
+        if len(self._hashes):
+            target = np.uint64(value)
+            sub_radius = radius // len(self._spans)
+            candidates = []
+            for (shift, bits), (keys, positions) in zip(self._spans, self._tables):
+                key = (value >> shift) & ((1 << bits) - 1)
+                probes = (np.uint64(key) ^ _masks(bits, sub_radius)).astype(np.int64)
+                if bits <= DIRECT_TABLE_BITS:
+                    starts, ends = keys[probes], keys[probes + 1]
+                else:
+                    starts = np.searchsorted(keys, probes, side="left")
+                    ends = np.searchsorted(keys, probes, side="right")
+                hits = ends > starts
+                if hits.any():
+                    # Concatenate the matching runs of the table without a Python loop
+                    starts = starts[hits].astype(np.int64)
+                    lengths = ends[hits].astype(np.int64) - starts
+                    run_offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+                    candidates.append(positions[run_offsets + np.arange(lengths.sum())])
+
+            if candidates:
+                found = self._hashes[np.unique(np.concatenate(candidates))]
+                distances = popcount(found ^ target)
+                close = distances <= radius
+                matches.extend(zip(found[close].tolist(), distances[close].tolist()))
+
+        return sorted(matches, key=lambda match: match[1])
+
+    async def sync(self, db) -> int:
+        """
+        Load every persisted hash on first use, then pick up hashes other
+        workers have recorded since the last sync
+        """
+        async with self._lock:
+            query = {"_id": {"$gt": self._last_id}} if self._last_id is not None else {}
+            cursor = db.proof_hashes.find(query, {"phash": 1}).sort("_id", 1).batch_size(PHASH_INDEX_LOAD_BATCH)
+
+            added = 0
+            chunks = []
+            batch = []
+            async for doc in cursor:
+                batch.append(int(doc["phash"], 16))
+                self._last_id = doc["_id"]
+                added += 1
+                if not self._loaded and len(batch) >= PHASH_INDEX_LOAD_BATCH:
+                    chunks.append(np.array(batch, dtype=np.uint64))
+                    batch = []
+
+            if not self._loaded:
+                chunks.append(np.array(batch, dtype=np.uint64))
+                await self.rebuild(np.concatenate(chunks))
+                self._loaded = True
+                logger.info(f"Perceptual hash index loaded with {len(self._hashes)} hashes")
+            else:
+                for value in batch:
+                    await self.add(value)
+            registry.set_gauge("phash_index_size", len(self))
+            return added
+
+    async def find_similar(self, db, values: list, radius: int = PHASH_MATCH_DISTANCE) -> dict:
+        await self.sync(db)
+        return {value: self.query(value, radius) for value in values}
+
+    async def run(self, db):
+        while True:
+            try:
+                await self.sync(db)
+            except Exception as e:
+                logger.error(f"Perceptual hash index sync failed: {e}")
+            await asyncio.sleep(PHASH_INDEX_SYNC_SECONDS)
+
+
+phash_index = PHashIndex()
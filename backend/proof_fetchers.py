@@ -0,0 +1,153 @@
+import os
+import re
+from urllib.parse import urlparse
+
+# Hosts a proof URL may live on, per order platform
+PLATFORM_DOMAINS = {
+    "linkedin": ("linkedin.com", "lnkd.in"),
+    "facebook": ("facebook.com", "fb.com", "fb.watch"),
+    "instagram": ("instagram.com",),
+    "twitter": ("twitter.com", "x.com", "t.co"),
+    "youtube": ("youtube.com", "youtu.be"),
+}
+
+HASHTAG_PATTERN = re.compile(r"#(\w+)")
+MENTION_PATTERN = re.compile(r"@([\w.\-]+)")
+TAG_PATTERN = re.compile(r"<[^>]+>")
+
+PROOF_IMAGE_MAX_BYTES = int(os.getenv("PROOF_IMAGE_MAX_BYTES", str(10 * 1024 * 1024)))
+# Comma-separated hosts screenshot URLs may be fetched from; empty allows uploaded blobs only
+PROOF_IMAGE_HOSTS = tuple(host.strip().lower() for host in os.getenv("PROOF_IMAGE_HOSTS", "").split(",") if host.strip())
+PROOF_FETCH_MAX_REDIRECTS = int(os.getenv("PROOF_FETCH_MAX_REDIRECTS", "3"))
+
+
+def _on_hosts(url: str, domains) -> bool:
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https"):
+        return False
+    host = (parsed.hostname or "").lower()
+    return any(host == domain or host.endswith(f".{domain}") for domain in domains)
+
+
+def url_matches_platform(url: str, platform: str) -> bool:
+    return _on_hosts(url, PLATFORM_DOMAINS.get(platform, ()))
+
+
+def image_url_allowed(url: str) -> bool:
+    return _on_hosts(url, PROOF_IMAGE_HOSTS)
+
+
+def extract_post(url: str, text: str) -> dict:
+    return {
+        "url": url,
+        "text": text,
+        "hashtags": sorted({tag.lower() for tag in HASHTAG_PATTERN.findall(text)}),
+        "mentions": sorted({mention.lower() for mention in MENTION_PATTERN.findall(text)}),
+    }
+
+
+class MockProofFetcher:
+    """
+    Local stand-in for fetching published posts and screenshot URLs. Only
+    posts and images registered with add_post and add_image are found, so
+    nothing verifies against it unless a test has registered the proof.
+    """
+    name = "mock"
+    max_concurrency = 10
+
+    def __init__(self):
+        self.posts = {}
+        self.images = {}
+
+    def add_post(self, url: str, text: str):
+        self.posts[url] = extract_post(url, text)
+
+    def add_image(self, url: str, content: bytes):
+        self.images[url] = content
+
+    async def fetch_post(self, url: str, platform: str):
+        return self.posts.get(url)
+
+    async def fetch_image(self, url: str):
+        return self.images.get(url)
+
+
+class HttpProofFetcher:
+    """
+    Fetches proof URLs over HTTP and reads hashtags and mentions out of the
+    page text. Pages that are not publicly reachable come back as None, as
+    do redirects that leave the allowed hosts: redirects are followed by hand
+    so every hop is checked before it is requested.
+    """
+    name = "http"
+    max_concurrency = int(os.getenv("PROOF_FETCH_CONCURRENCY", "10"))
+
+    def __init__(self, timeout: float = float(os.getenv("PROOF_FETCH_TIMEOUT_SECONDS", "10"))):
+        import httpx
+        self._client = httpx.AsyncClient(timeout=timeout, follow_redirects=False)
+
+    async def _open(self, url: str, allowed):
+        for _ in range(PROOF_FETCH_MAX_REDIRECTS + 1):
+            if not allowed(url):
+                return None
+            response = await self._client.send(self._client.build_request("GET", url), stream=True)
+            if not response.is_redirect:
+                return response
+            await response.aclose()
+            url = str(response.url.join(response.headers["location"]))
+        return None
+
+    async def fetch_post(self, url: str, platform: str):
+        response = await self._open(url, lambda hop: url_matches_platform(hop, platform))
+        if response is None:
+            return None
+        try:
+            if response.status_code == 404:
+                return None
+            response.raise_for_status()
+            await response.aread()
+            return extract_post(url, TAG_PATTERN.sub(" ", response.text))
+        finally:
+            await response.aclose()
+
+    async def fetch_image(self, url: str):
+        response = await self._open(url, image_url_allowed)
+        if response is None:
+            return None
+        try:
+            if response.status_code != 200:
+                return None
+            content = bytearray()
+            async for chunk in response.aiter_bytes():
+                content.extend(chunk)
+                if len(content) > PROOF_IMAGE_MAX_BYTES:
+                    return None
+            return bytes(content)
+        finally:
+            await response.aclose()
+
+    async def close(self):
+        await self._client.aclose()
+
+
+# "mock" uses the local stand-in (tests only: it verifies nothing by itself), "http" fetches the live pages
+PROOF_FETCHER = os.getenv("PROOF_FETCHER", "mock")
+
+_fetcher = None
+
+
+def get_fetcher():
+    global _fetcher
+    if _fetcher is None:
+        _fetcher = HttpProofFetcher() if PROOF_FETCHER == "http" else MockProofFetcher()
+    return _fetcher
+
+
+def set_fetcher(fetcher):
+    global _fetcher
+    _fetcher = fetcher
+
+
+async def close_fetcher():
+    if _fetcher is not None and hasattr(_fetcher, "close"):
+        await _fetcher.close()
@@ -0,0 +1,300 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument, UpdateOne
+from blob_store import load_blob, parse_blob_ref
+from metrics import registry
+from perceptual_hash import compute_phash, phash_available, phash_hex
+from phash_index import phash_index
+from proof_fetchers import get_fetcher, image_url_allowed, url_matches_platform
+
+logger = logging.getLogger(__name__)
+
+PROOF_VERIFICATION_WORKERS = int(os.getenv("PROOF_VERIFICATION_WORKERS", "4"))
+PROOF_VERIFICATION_POLL_SECONDS = int(os.getenv("PROOF_VERIFICATION_POLL_SECONDS", "30"))
+# A worker that dies mid-check loses its claim after this long
+PROOF_VERIFICATION_LEASE_SECONDS = int(os.getenv("PROOF_VERIFICATION_LEASE_SECONDS", "120"))
+PROOF_VERIFICATION_MAX_ATTEMPTS = int(os.getenv("PROOF_VERIFICATION_MAX_ATTEMPTS", "3"))
+PROOF_VERIFICATION_RETRY_SECONDS = int(os.getenv("PROOF_VERIFICATION_RETRY_SECONDS", "60"))
+
+PENDING = "pending"
+IN_PROGRESS = "in_progress"
+VERIFIED = "verified"
+FAILED = "failed"
+FLAGGED = "flagged"
+ERROR = "error"
+
+STATUS_FIELD = "proof_of_completion.verification_status"
+LEASE_FIELD = "proof_of_completion.verification_lease_until"
+
+ORDER_PROJECTION = {
+    "seller_id": 1,
+    "platform": 1,
+    "hashtags": 1,
+    "mentions": 1,
+    "proof_of_completion": 1
+}
+
+
+async def ensure_indexes(db):
+    await db.orders.create_index([(STATUS_FIELD, 1), (LEASE_FIELD, 1)], sparse=True)
+    await db.proof_hashes.create_index([("order_id", 1), ("screenshot", 1)], unique=True)
+    await db.proof_hashes.create_index("phash")
+
+
+def _normalize(values: list, prefix: str) -> list:
+    return [value.strip().lstrip(prefix).lower() for value in values if value.strip().lstrip(prefix)]
+
+
+class ProofVerifier:
+    """
+    Pool of workers that check delivered proof in the background. Orders are
+    the queue: deliver marks the proof pending, a worker claims it with a
+    lease, runs the checks and writes the outcome back onto the proof.
+    """
+
+    def __init__(self, workers: int = PROOF_VERIFICATION_WORKERS):
+        self.workers = workers
+        self._wakeup = asyncio.Event()
+        self._fetch_semaphore = None
+
+    def submit(self):
+        """
+        Nudge idle workers after a delivery; the pending proof itself is
+        already durable on the order
+        """
+        self._wakeup.set()
+
+    async def _fetch(self, method, *args):
+        fetcher = get_fetcher()
+        if self._fetch_semaphore is None:
+            self._fetch_semaphore = asyncio.Semaphore(fetcher.max_concurrency)
+        async with self._fetch_semaphore:
+            return await getattr(fetcher, method)(*args)
+
+    async def _check_post(self, order: dict, url: str, checks: dict, notes: list):
+        checks["platform"] = url_matches_platform(url, order["platform"])
+        if not checks["platform"]:
+            # Never fetch a seller-supplied URL off the platform's own hosts
+            notes.append(f"Proof URL is not on {order['platform']}")
+            return
+
+        post = await self._fetch("fetch_post", url, order["platform"])
+        checks["post_found"] = post is not None
+        if post is None:
+            notes.append("Proof URL could not be found")
+            return
+
+        hashtags = _normalize(order.get("hashtags", []), "#")
+        if hashtags:
+            missing = [tag for tag in hashtags if tag not in post["hashtags"]]
+            checks["hashtags"] = not missing
+            if missing:
+                notes.append(f"Missing hashtags: {', '.join('#' + tag for tag in missing)}")
+
+        mentions = _normalize(order.get("mentions", []), "@")
+        if mentions:
+            missing = [mention for mention in mentions if mention not in post["mentions"]]
+            checks["mentions"] = not missing
+            if missing:
+                notes.append(f"Missing mentions: {', '.join('@' + mention for mention in missing)}")
+
+    async def _load_screenshot(self, db, screenshot: str):
+        blob_id = parse_blob_ref(screenshot)
+        if blob_id:
+            loaded = await load_blob(db, blob_id)
+            if loaded and loaded[0]["content_type"].startswith("image/"):
+                return loaded[1]
+            return None
+        return await self._fetch("fetch_image", screenshot)
+
+    async def _hash_screenshots(self, db, screenshots: list, notes: list) -> dict:
+        hashes = {}
+        for screenshot in screenshots:
+            if not parse_blob_ref(screenshot) and not image_url_allowed(screenshot):
+                notes.append(f"Screenshot is not an upload or on an allowed host: {screenshot}")
+                continue
+            content = await self._load_screenshot(db, screenshot)
+            if content is None:
+                notes.append(f"Screenshot could not be loaded: {screenshot}")
+                continue
+            try:
+                hashes[screenshot] = phash_hex(await asyncio.to_thread(compute_phash, content))
+            except Exception:
+                notes.append(f"Screenshot is not a readable image: {screenshot}")
+        return hashes
+
+    async def _find_reuse(self, db, order: dict, hashes: dict, now: datetime) -> list:
+        order_id = str(order["_id"])
+
+        # Near-duplicates, not just identical hashes: crops and re-encodes move a few bits
+        similar = await phash_index.find_similar(db, [int(phash, 16) for phash in set(hashes.values())])
+        near = {}
+        for screenshot, phash in hashes.items():
+            for match, distance in similar[int(phash, 16)]:
+                near.setdefault(phash_hex(match), []).append((screenshot, distance))
+
+        reused = []
+        if near:
+            matches = await db.proof_hashes.find(
+                {"phash": {"$in": list(near)}, "order_id": {"$ne": order_id}},
+                {"order_id": 1, "seller_id": 1, "phash": 1}
+            ).to_list(length=100)
+            reused = [
+                {
+                    "screenshot": screenshot,
+                    "order_id": match["order_id"],
+                    "seller_id": match["seller_id"],
+                    "distance": distance
+                }
+                for match in matches for screenshot, distance in near[match["phash"]]
+            ]
+
+        # Remember this order's hashes so later submissions are checked against them
+        await db.proof_hashes.bulk_write([
+            UpdateOne(
+                {"order_id": order_id, "screenshot": screenshot},
+                {"$setOnInsert": {"seller_id": order["seller_id"], "phash": phash, "created_at": now}},
+                upsert=True
+            )
+            for screenshot, phash in hashes.items()
+        ], ordered=False)
+        return reused
+
+    async def verify(self, db, order: dict, now: datetime = None) -> dict:
+        """
+        Run every check on an order's proof and return the fields to record
+        """
+        now = now or datetime.utcnow()
+        proof = order.get("proof_of_completion") or {}
+        checks = {}
+        notes = []
+        reused = []
+
+        if proof.get("url"):
+            await self._check_post(order, proof["url"], checks, notes)
+
+        screenshots = proof.get("screenshots", [])
+        if screenshots and not phash_available():
+            notes.append("Screenshot hashing is unavailable")
+        elif screenshots:
+            hashes = await self._hash_screenshots(db, screenshots, notes)
+            if hashes:
+                reused = await self._find_reuse(db, order, hashes, now)
+                checks["screenshots_unique"] = not reused
+                if reused:
+                    notes.append(f"{len(reused)} screenshots were already submitted for other orders")
+
+        if reused:
+            status = FLAGGED
+        elif checks and all(checks.values()):
+            status = VERIFIED
+        else:
+            status = FAILED
+            if not checks:
+                notes.append("Nothing could be checked automatically")
+
+        fields = {
+            "verification_status": status,
+            "verification_checks": checks,
+            "verification_notes": notes,
+            "reused_screenshots": reused,
+            "verified": status == VERIFIED,
+            "verified_at": now if status == VERIFIED else None
+        }
+        if status == VERIFIED:
+            fields["verification_method"] = "automated"
+        return fields
+
+    async def claim_next(self, db, now: datetime = None):
+        now = now or datetime.utcnow()
+        return await db.orders.find_one_and_update(
+            {
+                STATUS_FIELD: {"$in": [PENDING, IN_PROGRESS]},
+                "$or": [{LEASE_FIELD: None}, {LEASE_FIELD: {"$lt": now}}]
+            },
+            {
+                "$set": {STATUS_FIELD: IN_PROGRESS, LEASE_FIELD: now + timedelta(seconds=PROOF_VERIFICATION_LEASE_SECONDS)},
+                "$inc": {"proof_of_completion.verification_attempts": 1}
+            },
+            projection=ORDER_PROJECTION,
+            sort=[("delivered_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _record(self, db, order: dict, fields: dict):
+        # A redelivery after a revision resets the proof; never overwrite it with this result
+        await db.orders.update_one(
+            {
+                "_id": order["_id"],
+                STATUS_FIELD: IN_PROGRESS,
+                "proof_of_completion.submitted_at": order["proof_of_completion"].get("submitted_at")
+            },
+            {"$set": {
+                **{f"proof_of_completion.{field}": value for field, value in fields.items()},
+                LEASE_FIELD: None,
+                "updated_at": datetime.utcnow()
+            }}
+        )
+
+    async def process_next(self, db) -> bool:
+        """
+        Claim and verify one pending proof; False when the queue is empty
+        """
+        order = await self.claim_next(db)
+        if not order:
+            return False
+
+        started = time.perf_counter()
+        try:
+            fields = await self.verify(db, order)
+        except Exception as e:
+            attempts = order["proof_of_completion"].get("verification_attempts", 1)
+            logger.warning(f"Proof verification failed for order {order['_id']} (attempt {attempts}): {e}")
+            if attempts < PROOF_VERIFICATION_MAX_ATTEMPTS:
+                # Back to pending, but not claimable until the backoff passes
+                await db.orders.update_one(
+                    {"_id": order["_id"], STATUS_FIELD: IN_PROGRESS},
+                    {"$set": {
+                        STATUS_FIELD: PENDING,
+                        LEASE_FIELD: datetime.utcnow() + timedelta(seconds=PROOF_VERIFICATION_RETRY_SECONDS * attempts)
+                    }}
+                )
+                registry.incr("proof_verification_retries")
+                return True
+            fields = {"verification_status": ERROR, "verification_notes": [f"Verification failed: {e}"]}
+
+        await self._record(db, order, fields)
+        registry.observe("proof_verification_seconds", time.perf_counter() - started)
+        registry.incr("proof_verifications", result=fields["verification_status"])
+        if fields.get("reused_screenshots"):
+            registry.incr("proof_screenshots_reused", len(fields["reused_screenshots"]))
+        return True
+
+    async def drain(self, db) -> int:
+        processed = 0
+        while await self.process_next(db):
+            processed += 1
+        return processed
+
+    async def _worker(self, db):
+        while True:
+            # Cleared before looking so a delivery that lands mid-claim still wakes us
+            self._wakeup.clear()
+            try:
+                if await self.process_next(db):
+                    continue
+            except Exception as e:
+                logger.error(f"Proof verification worker failed: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=PROOF_VERIFICATION_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run(self, db):
+        await asyncio.gather(*(self._worker(db) for _ in range(self.workers)))
+
+
+proof_verifier = ProofVerifier()
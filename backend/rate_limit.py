@@ -0,0 +1,188 @@
+import ipaddress
+import math
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from pymongo import ReturnDocument
+from metrics import registry
+
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+# Proxy addresses or CIDRs whose X-Forwarded-For is believed; from anyone else the header is ignored
+TRUSTED_PROXIES = [
+    ipaddress.ip_network(proxy.strip(), strict=False)
+    for proxy in os.getenv("TRUSTED_PROXIES", "").split(",") if proxy.strip()
+]
+
+
+class RateLimitRule:
+    """
+    Token bucket of `limit` tokens refilled evenly over `period_seconds`
+    """
+
+    def __init__(self, key_by: str, limit: int, period_seconds: int):
+        self.key_by = key_by
+        self.limit = limit
+        self.period_seconds = period_seconds
+        self.refill_rate = limit / period_seconds
+
+
+# Per-route policies; key_by is one of "ip", "email" or "user"
+POLICIES = {
+    "auth.login": [RateLimitRule("ip", 30, 60), RateLimitRule("email", 5, 60)],
+    "auth.register": [RateLimitRule("ip", 10, 3600)],
+    "auth.refresh": [RateLimitRule("ip", 60, 60)],
+    "auth.resend_otp": [RateLimitRule("ip", 10, 3600), RateLimitRule("email", 3, 600)],
+    "auth.verify_email": [RateLimitRule("ip", 30, 600), RateLimitRule("email", 10, 600)],
+    "services.search": [RateLimitRule("ip", 120, 60)],
+}
+
+
+class InMemoryRateLimitBackend:
+    """
+    Per-process token buckets in a bounded LRU; also the local stand-in for
+    the shared backend
+    """
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+
+    async def consume(self, key: str, rule: RateLimitRule):
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.pop(key, (rule.limit, now))
+        tokens = min(rule.limit, tokens + (now - updated_at) * rule.refill_rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return allowed, tokens
+
+
+class MongoRateLimitBackend:
+    """
+    Token buckets shared by all workers, one atomic upsert per check
+    """
+
+    def __init__(self, get_db):
+        self.get_db = get_db
+
+    async def consume(self, key: str, rule: RateLimitRule):
+        now = datetime.utcnow()
+        elapsed_seconds = {"$divide": [{"$subtract": [now, {"$ifNull": ["$updated_at", now]}]}, 1000]}
+        refilled = {"$min": [
+            rule.limit,
+            {"$add": [{"$ifNull": ["$tokens", rule.limit]}, {"$multiply": [elapsed_seconds, rule.refill_rate]}]}
+        ]}
+        bucket = await self.get_db().rate_limits.find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {"tokens": refilled, "updated_at": now}},
+                {"$set": {
+                    "allowed": {"$gte": ["$tokens", 1]},
+                    "tokens": {"$cond": [{"$gte": ["$tokens", 1]}, {"$subtract": ["$tokens", 1]}, "$tokens"]},
+                    "expires_at": now + timedelta(seconds=rule.period_seconds)
+                }}
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return bucket["allowed"], bucket["tokens"]
+
+
+async def ensure_indexes(db):
+    await db.rate_limits.create_index("expires_at", expireAfterSeconds=0)
+
+
+def _is_trusted(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in TRUSTED_PROXIES)
+
+
+def get_client_ip(http_request) -> str:
+    """
+    The connecting address, unless it is a trusted proxy: then the right-most
+    X-Forwarded-For hop that is not itself a trusted proxy. Hops left of that
+    are client-supplied and cannot be believed.
+    """
+    peer = http_request.client.host if http_request.client else "unknown"
+    forwarded = http_request.headers.get("x-forwarded-for")
+    if not forwarded or not _is_trusted(peer):
+        return peer
+    hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if not _is_trusted(hop):
+            return hop
+    return hops[0] if hops else peer
+
+
+class RateLimiter:
+    def __init__(self, backend, policies: dict = POLICIES, enabled: bool = RATE_LIMIT_ENABLED):
+        self.backend = backend
+        self.policies = policies
+        self.enabled = enabled
+
+    async def hit(self, route: str, http_request=None, response=None, email: str = None, user_id: str = None):
+        """
+        Consume one token from every bucket of the route's policy.
+
+        Raises 429 when any bucket is empty and sets X-RateLimit-* headers for
+        the most constrained bucket.
+        """
+        if not self.enabled:
+            return
+
+        identities = {
+            "ip": get_client_ip(http_request) if http_request is not None else None,
+            "email": email.lower() if email else None,
+            "user": user_id,
+        }
+
+        tightest = None
+        for rule in self.policies.get(route, []):
+            identity = identities.get(rule.key_by)
+            if identity is None:
+                continue
+            allowed, tokens = await self.backend.consume(f"{route}:{rule.key_by}:{identity}", rule)
+            if tightest is None or tokens < tightest[1] or not allowed:
+                tightest = (rule, tokens, allowed)
+            if not allowed:
+                break
+
+        if tightest is None:
+            return
+
+        rule, tokens, allowed = tightest
+        reset_seconds = math.ceil((rule.limit - tokens) / rule.refill_rate)
+        headers = {
+            "X-RateLimit-Limit": str(rule.limit),
+            "X-RateLimit-Remaining": str(int(tokens)),
+            "X-RateLimit-Reset": str(reset_seconds),
+        }
+        if not allowed:
+            registry.incr("rate_limit_rejected", route=route, key_by=rule.key_by)
+            headers["Retry-After"] = str(math.ceil((1 - tokens) / rule.refill_rate))
+            raise HTTPException(status_code=429, detail="Too many requests", headers=headers)
+        if response is not None:
+            response.headers.update(headers)
+
+
+def get_db():
+    from server import db
+    return db
+
+
+def _create_backend():
+    if RATE_LIMIT_BACKEND == "mongo":
+        return MongoRateLimitBackend(get_db)
+    return InMemoryRateLimitBackend()
+
+
+limiter = RateLimiter(_create_backend())
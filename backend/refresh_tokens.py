@@ -0,0 +1,149 @@
+import asyncio
+import hashlib
+import logging
+import math
+import os
+import uuid
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from utils import create_access_token, create_refresh_token, verify_token, REFRESH_TOKEN_EXPIRE_DAYS
+
+logger = logging.getLogger(__name__)
+
+REVOCATION_CAPACITY = int(os.getenv("REVOCATION_BLOOM_CAPACITY", "100000"))
+REVOCATION_ERROR_RATE = float(os.getenv("REVOCATION_BLOOM_ERROR_RATE", "0.001"))
+REVOCATION_SYNC_SECONDS = int(os.getenv("REVOCATION_SYNC_SECONDS", "15"))
+
+
+class BloomFilter:
+    """
+    Fixed-size bloom filter using double hashing over one SHA-256 digest
+    """
+
+    def __init__(self, capacity: int = REVOCATION_CAPACITY, error_rate: float = REVOCATION_ERROR_RATE):
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.sha256(item.encode()).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:16], "big") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevocationList:
+    """
+    Revoked refresh-token families.
+
+    Lookups hit the in-memory bloom filter first; only the rare positive is
+    confirmed against Mongo. Revocations made by other workers are picked up
+    by the periodic sync.
+    """
+
+    def __init__(self):
+        self.bloom = BloomFilter()
+        self._watermark = None
+
+    def add(self, family_id: str):
+        self.bloom.add(family_id)
+
+    async def load(self, db):
+        query = {"status": "revoked"}
+        if self._watermark is not None:
+            query["revoked_at"] = {"$gte": self._watermark}
+        # Start the next window slightly early so concurrent writes are not missed
+        next_watermark = datetime.utcnow() - timedelta(seconds=1)
+
+        cursor = db.refresh_tokens.find(query, {"family_id": 1})
+        async for record in cursor:
+            self.bloom.add(record["family_id"])
+        self._watermark = next_watermark
+
+    async def is_revoked(self, db, family_id: str) -> bool:
+        if family_id not in self.bloom:
+            return False
+        record = await db.refresh_tokens.find_one({"family_id": family_id, "status": "revoked"}, {"_id": 1})
+        return record is not None
+
+    async def run(self, db):
+        while True:
+            await asyncio.sleep(REVOCATION_SYNC_SECONDS)
+            try:
+                await self.load(db)
+            except Exception as e:
+                logger.error(f"Failed to sync revoked refresh tokens: {e}")
+
+
+revocation_list = RevocationList()
+
+
+async def ensure_indexes(db):
+    await db.refresh_tokens.create_index("expires_at", expireAfterSeconds=0)
+    await db.refresh_tokens.create_index("family_id")
+    await db.refresh_tokens.create_index([("status", 1), ("revoked_at", 1)])
+
+
+async def issue_token_pair(db, user_id: str, email: str, family_id: str = None) -> dict:
+    """
+    Create an access token and a refresh token in the given (or a new) family
+    """
+    family_id = family_id or uuid.uuid4().hex
+    token_id = uuid.uuid4().hex
+    now = datetime.utcnow()
+
+    await db.refresh_tokens.insert_one({
+        "_id": token_id,
+        "family_id": family_id,
+        "user_id": user_id,
+        "status": "active",
+        "created_at": now,
+        "expires_at": now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    })
+
+    return {
+        "access_token": create_access_token({"sub": user_id, "email": email, "fam": family_id}),
+        "refresh_token": create_refresh_token({"sub": user_id, "email": email, "jti": token_id, "fam": family_id})
+    }
+
+
+async def revoke_family(db, family_id: str):
+    await db.refresh_tokens.update_many(
+        {"family_id": family_id, "status": {"$ne": "revoked"}},
+        {"$set": {"status": "revoked", "revoked_at": datetime.utcnow()}}
+    )
+    revocation_list.add(family_id)
+
+
+async def rotate_refresh_token(db, refresh_token: str) -> dict:
+    """
+    Exchange a refresh token for a new token pair in the same family.
+
+    Presenting an already-rotated token means it leaked, so the whole family
+    is revoked.
+    """
+    payload = verify_token(refresh_token)
+    if not payload or payload.get("type") != "refresh" or not payload.get("jti"):
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+
+    family_id = payload["fam"]
+    if await revocation_list.is_revoked(db, family_id):
+        raise HTTPException(status_code=401, detail="Refresh token has been revoked")
+
+    rotated = await db.refresh_tokens.find_one_and_update(
+        {"_id": payload["jti"], "status": "active"},
+        {"$set": {"status": "rotated", "rotated_at": datetime.utcnow()}}
+    )
+    if not rotated:
+        await revoke_family(db, family_id)
+        logger.warning(f"Refresh token reuse detected, revoked family {family_id}")
+        raise HTTPException(status_code=401, detail="Refresh token has been revoked")
+
+    return await issue_token_pair(db, payload["sub"], payload.get("email"), family_id=family_id)
@@ -0,0 +1,185 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
+from metrics import registry
+from seller_cards import refresh_seller_cards
+from social_providers import AsyncRateLimiter, get_provider
+from utils import calculate_authenticity_score, calculate_authenticity_scores
+from worker_leases import WorkerLease
+
+logger = logging.getLogger(__name__)
+
+REVERIFICATION_INTERVAL_DAYS = 90
+REVERIFICATION_RETRY_HOURS = int(os.getenv("REVERIFICATION_RETRY_HOURS", "6"))
+REVERIFICATION_BATCH_SIZE = int(os.getenv("REVERIFICATION_BATCH_SIZE", "200"))
+REVERIFICATION_SWEEP_SECONDS = int(os.getenv("REVERIFICATION_SWEEP_SECONDS", "300"))
+
+# Fields the providers need to re-fetch an account
+ACCOUNT_PROJECTION = {
+    "user_id": 1,
+    "platform": 1,
+    "platform_user_id": 1,
+    "access_token": 1,
+    "next_reverification": 1,
+    "reverification_failures": 1
+}
+
+
+async def ensure_indexes(db):
+    await db.social_accounts.create_index([("next_reverification", 1), ("_id", 1)])
+
+
+def build_reverification_update(metrics: dict, now: datetime = None, authenticity_score: float = None) -> dict:
+    """
+    $set document for freshly fetched account metrics
+    """
+    now = now or datetime.utcnow()
+    if authenticity_score is None:
+        authenticity_score = calculate_authenticity_score(metrics)
+    return {
+        "follower_count": metrics['follower_count'],
+        "connection_count": metrics['connection_count'],
+        "engagement_rate": metrics['engagement_rate'],
+        "posts_last_90_days": metrics['posts_last_90_days'],
+        "bot_follower_percentage": metrics['bot_follower_percentage'],
+        "authenticity_score": authenticity_score,
+        "last_reverified": now,
+        "next_reverification": now + timedelta(days=REVERIFICATION_INTERVAL_DAYS),
+        "reverification_failures": 0,
+        "updated_at": now
+    }
+
+
+class ReverificationWorker:
+    """
+    Sweeps social accounts whose next_reverification has passed, fetches
+    fresh metrics with bounded per-provider concurrency and rate limits, and
+    writes each page back with one bulk_write
+    """
+
+    def __init__(self, batch_size: int = REVERIFICATION_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.lease = WorkerLease("reverification")
+        self._semaphores = {}
+        self._rate_limiters = {}
+
+    def _limits_for(self, provider):
+        if provider.platform not in self._semaphores:
+            self._semaphores[provider.platform] = asyncio.Semaphore(provider.max_concurrency)
+            self._rate_limiters[provider.platform] = AsyncRateLimiter(provider.rate_limit_per_second)
+        return self._semaphores[provider.platform], self._rate_limiters[provider.platform]
+
+    async def _fetch(self, account: dict):
+        provider = get_provider(account["platform"])
+        semaphore, rate_limiter = self._limits_for(provider)
+        async with semaphore:
+            await rate_limiter.acquire()
+            return await provider.fetch_metrics(account)
+
+    async def _process_page(self, db, accounts: list):
+        results = await asyncio.gather(
+            *(self._fetch(account) for account in accounts),
+            return_exceptions=True
+        )
+
+        # Score every successful fetch of the page in one vectorized pass
+        fetched = [result for result in results if not isinstance(result, Exception)]
+        scores = iter(calculate_authenticity_scores(fetched).tolist())
+
+        now = datetime.utcnow()
+        operations = []
+        failed = 0
+        for account, result in zip(accounts, results):
+            if isinstance(result, Exception):
+                failed += 1
+                failures = account.get("reverification_failures", 0) + 1
+                logger.warning(f"Re-verification failed for account {account['_id']}: {result}")
+                operations.append(UpdateOne(
+                    {"_id": account["_id"]},
+                    {"$set": {
+                        "reverification_failures": failures,
+                        # Back off exponentially, capped at the regular interval
+                        "next_reverification": now + min(
+                            timedelta(hours=REVERIFICATION_RETRY_HOURS * 2 ** (failures - 1)),
+                            timedelta(days=REVERIFICATION_INTERVAL_DAYS)
+                        ),
+                        "updated_at": now
+                    }}
+                ))
+            else:
+                operations.append(UpdateOne(
+                    {"_id": account["_id"]},
+                    {"$set": build_reverification_update(result, now, authenticity_score=next(scores))}
+                ))
+
+        if operations:
+            await db.social_accounts.bulk_write(operations, ordered=False)
+
+        from social_accounts import invalidate_summary
+        for account in accounts:
+            invalidate_summary(account["user_id"], account["platform"])
+        await refresh_seller_cards(db, [account["user_id"] for account in accounts])
+
+        registry.incr("reverification_succeeded", len(accounts) - failed)
+        registry.incr("reverification_failed", failed)
+        return len(accounts), failed
+
+    async def sweep(self, db) -> dict:
+        """
+        Process every account due at the start of the sweep, one page at a time
+        """
+        cutoff = datetime.utcnow()
+        started = time.monotonic()
+        processed = failed = 0
+        last_key = None
+
+        while True:
+            query = {"next_reverification": {"$lte": cutoff}}
+            if last_key is not None:
+                # Keyset pagination, so retried accounts are not picked up twice
+                query["$or"] = [
+                    {"next_reverification": {"$gt": last_key[0], "$lte": cutoff}},
+                    {"next_reverification": last_key[0], "_id": {"$gt": last_key[1]}}
+                ]
+            cursor = db.social_accounts.find(query, ACCOUNT_PROJECTION) \
+                .sort([("next_reverification", 1), ("_id", 1)]) \
+                .limit(self.batch_size)
+            accounts = await cursor.to_list(length=self.batch_size)
+            if not accounts:
+                break
+
+            page_processed, page_failed = await self._process_page(db, accounts)
+            processed += page_processed
+            failed += page_failed
+            last_key = (accounts[-1]["next_reverification"], accounts[-1]["_id"])
+
+        elapsed = time.monotonic() - started
+        if processed:
+            registry.observe("reverification_accounts_per_second", processed / elapsed if elapsed else processed)
+        await self.update_backlog(db)
+
+        return {"processed": processed, "failed": failed, "elapsed_seconds": round(elapsed, 3)}
+
+    async def update_backlog(self, db) -> int:
+        backlog = await db.social_accounts.count_documents(
+            {"next_reverification": {"$lte": datetime.utcnow()}}
+        )
+        registry.set_gauge("reverification_backlog", backlog)
+        return backlog
+
+    async def run(self, db):
+        while True:
+            try:
+                # One process sweeps at a time, so provider limits hold across processes
+                stats = await self.lease.run_exclusive(db, lambda: self.sweep(db))
+                if stats and stats["processed"]:
+                    logger.info(f"Re-verification sweep: {stats}")
+            except Exception as e:
+                logger.error(f"Re-verification sweep failed: {e}")
+            await asyncio.sleep(REVERIFICATION_SWEEP_SECONDS)
+
+
+reverification_worker = ReverificationWorker()
@@ -0,0 +1,62 @@
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime, timedelta
+import sys
+sys.path.append('/app/backend')
+from routes.auth import get_current_admin
+import analytics_rollups
+from analytics_rollups import analytics_rollup
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+def get_db():
+    from server import db
+    return db
+
+class BackfillRequest(BaseModel):
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+
+@router.get("/analytics")
+async def get_analytics(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    granularity: str = analytics_rollups.DAILY,
+    platform: Optional[str] = None,
+    service_type: Optional[str] = None,
+    seller_tier: Optional[str] = None,
+    group_by: Optional[str] = None,
+    current_user: dict = Depends(get_current_admin),
+    db = Depends(get_db)
+):
+    # Last 30 days, or the last 24 hours for hourly buckets
+    end = end or datetime.utcnow()
+    if not start:
+        start = end - (timedelta(hours=24) if granularity == analytics_rollups.HOURLY else timedelta(days=30))
+
+    return await analytics_rollups.query_rollups(
+        db, start, end,
+        granularity=granularity,
+        filters={"platform": platform, "service_type": service_type, "seller_tier": seller_tier},
+        group_by=group_by
+    )
+
+@router.post("/analytics/backfill")
+async def backfill_analytics(
+    request: BackfillRequest,
+    current_user: dict = Depends(get_current_admin),
+    db = Depends(get_db)
+):
+    start = request.start
+    if not start:
+        start = await analytics_rollups.first_order_at(db)
+        if not start:
+            raise HTTPException(status_code=400, detail="No orders to backfill")
+    end = request.end or datetime.utcnow()
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+
+    # Chunks are picked up by the rollup worker between refreshes
+    backfill = await analytics_rollup.schedule_backfill(db, start, end)
+    return {"message": "Backfill scheduled", "backfill": backfill}
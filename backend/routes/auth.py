@@ -1,18 +1,33 @@
-from fastapi import APIRouter, HTTPException, Depends, Header
+from fastapi import APIRouter, HTTPException, Depends, Header, Request, Response
 from pydantic import BaseModel, EmailStr
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Optional
 import sys
 sys.path.append('/app/backend')
-from models import User, UserRole, KYCStatus, SellerProfile, BuyerProfile, OTP
-from utils import (
-    hash_password, verify_password, generate_otp, 
-    create_access_token, create_refresh_token, verify_token
-)
+from models import User, UserRole, KYCStatus, SellerProfile, BuyerProfile
+from utils import hash_password, verify_password, verify_token
+from otp_store import issue_otp, verify_otp, OTP_MAX_ATTEMPTS, OTP_EXPIRE_MINUTES
+from notifications import notify
+from rate_limit import limiter
+from activity import last_active_buffer
+from refresh_tokens import issue_token_pair, rotate_refresh_token, revoke_family, revocation_list
 from bson import ObjectId
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
+# Fields needed to authenticate and render the client's session, nothing more
+LOGIN_PROJECTION = {
+    "email": 1,
+    "password_hash": 1,
+    "email_verified": 1,
+    "role": 1,
+    "full_name": 1,
+    "profile_picture": 1,
+    "kyc_status": 1,
+    "seller_profile": 1,
+    "buyer_profile": 1
+}
+
 # Dependency to get database
 def get_db():
     from server import db
@@ -38,6 +53,9 @@ class ResendOTPRequest(BaseModel):
     email: EmailStr
     otp_type: str = "email_verification"
 
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
+
 # Helper function to get current user from token
 async def get_current_user(authorization: Optional[str] = Header(None), db = Depends(get_db)):
     if not authorization or not authorization.startswith("Bearer "):
@@ -45,9 +63,12 @@ async def get_current_user(authorization: Optional[str] = Header(None), db = Dep
     
     token = authorization.replace("Bearer ", "")
     payload = verify_token(token)
-    if not payload:
+    if not payload or payload.get("type") == "refresh":
         raise HTTPException(status_code=401, detail="Invalid token")
     
+    if payload.get("fam") and await revocation_list.is_revoked(db, payload["fam"]):
+        raise HTTPException(status_code=401, detail="Token has been revoked")
+    
     user_id = payload.get("sub")
     user = await db.users.find_one({"_id": ObjectId(user_id)})
     if not user:
@@ -56,8 +77,22 @@ async def get_current_user(authorization: Optional[str] = Header(None), db = Dep
     user["_id"] = str(user["_id"])
     return user
 
+# Dependency for mediator-only endpoints
+async def get_current_mediator(current_user: dict = Depends(get_current_user)):
+    if not current_user.get("is_mediator"):
+        raise HTTPException(status_code=403, detail="Mediator access required")
+    return current_user
+
+# Dependency for admin-only endpoints
+async def get_current_admin(current_user: dict = Depends(get_current_user)):
+    if not current_user.get("is_admin"):
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
+
 @router.post("/register")
-async def register(request: RegisterRequest, db = Depends(get_db)):
+async def register(request: RegisterRequest, http_request: Request, response: Response, db = Depends(get_db)):
+    await limiter.hit("auth.register", http_request, response, email=request.email)
+    
     # Check if user already exists
     existing_user = await db.users.find_one({"email": request.email})
     if existing_user:
@@ -90,19 +125,10 @@ async def register(request: RegisterRequest, db = Depends(get_db)):
     user_id = str(result.inserted_id)
     
     # Generate and send OTP
-    otp_code = generate_otp()
-    otp_data = {
-        "email": request.email,
-        "otp_code": otp_code,
-        "otp_type": "email_verification",
-        "verified": False,
-        "expires_at": datetime.utcnow() + timedelta(minutes=10),
-        "created_at": datetime.utcnow()
-    }
-    await db.otps.insert_one(otp_data)
+    otp_code = await issue_otp(db, request.email, "email_verification")
+    await notify(db, user_id, "otp", {"otp_code": otp_code, "expires_minutes": OTP_EXPIRE_MINUTES})
     
-    # In production, send email with OTP
-    # For now, return it in response for testing
+    # Also returned in the response for testing
     return {
         "message": "Registration successful. Please verify your email.",
         "user_id": user_id,
@@ -111,27 +137,18 @@ async def register(request: RegisterRequest, db = Depends(get_db)):
     }
 
 @router.post("/verify-email")
-async def verify_email(request: VerifyEmailRequest, db = Depends(get_db)):
-    # Find OTP
-    otp = await db.otps.find_one({
-        "email": request.email,
-        "otp_code": request.otp,
-        "otp_type": "email_verification",
-        "verified": False
-    })
+async def verify_email(request: VerifyEmailRequest, http_request: Request, response: Response, db = Depends(get_db)):
+    await limiter.hit("auth.verify_email", http_request, response, email=request.email)
+    
+    # Verify OTP
+    otp = await verify_otp(db, request.email, "email_verification", request.otp)
     
     if not otp:
         raise HTTPException(status_code=400, detail="Invalid or expired OTP")
     
-    # Check expiration
-    if otp["expires_at"] < datetime.utcnow():
-        raise HTTPException(status_code=400, detail="OTP has expired")
-    
-    # Mark OTP as verified
-    await db.otps.update_one(
-        {"_id": otp["_id"]},
-        {"$set": {"verified": True}}
-    )
+    if not otp["verified"]:
+        remaining = OTP_MAX_ATTEMPTS - otp["attempts"]
+        raise HTTPException(status_code=400, detail=f"Invalid OTP. {remaining} attempts remaining")
     
     # Update user
     user = await db.users.find_one_and_update(
@@ -145,8 +162,7 @@ async def verify_email(request: VerifyEmailRequest, db = Depends(get_db)):
     
     # Generate tokens
     user_id = str(user["_id"])
-    access_token = create_access_token({"sub": user_id, "email": user["email"]})
-    refresh_token = create_refresh_token({"sub": user_id})
+    tokens = await issue_token_pair(db, user_id, user["email"])
     
     # Format user response
     user["_id"] = user_id
@@ -154,15 +170,16 @@ async def verify_email(request: VerifyEmailRequest, db = Depends(get_db)):
     
     return {
         "message": "Email verified successfully",
-        "access_token": access_token,
-        "refresh_token": refresh_token,
+        **tokens,
         "user": user
     }
 
 @router.post("/login")
-async def login(request: LoginRequest, db = Depends(get_db)):
+async def login(request: LoginRequest, http_request: Request, response: Response, db = Depends(get_db)):
+    await limiter.hit("auth.login", http_request, response, email=request.email)
+    
     # Find user
-    user = await db.users.find_one({"email": request.email})
+    user = await db.users.find_one({"email": request.email}, LOGIN_PROJECTION)
     if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
@@ -176,49 +193,53 @@ async def login(request: LoginRequest, db = Depends(get_db)):
     
     # Generate tokens
     user_id = str(user["_id"])
-    access_token = create_access_token({"sub": user_id, "email": user["email"]})
-    refresh_token = create_refresh_token({"sub": user_id})
+    tokens = await issue_token_pair(db, user_id, user["email"])
     
-    # Update last active
-    await db.users.update_one(
-        {"_id": user["_id"]},
-        {"$set": {"last_active": datetime.utcnow()}}
-    )
+    # Update last active (coalesced and flushed in the background)
+    last_active_buffer.touch(user["_id"])
     
     # Format user response
     user["_id"] = user_id
     user.pop("password_hash", None)
     
     return {
-        "access_token": access_token,
-        "refresh_token": refresh_token,
+        **tokens,
         "user": user
     }
 
 @router.post("/resend-otp")
-async def resend_otp(request: ResendOTPRequest, db = Depends(get_db)):
+async def resend_otp(request: ResendOTPRequest, http_request: Request, response: Response, db = Depends(get_db)):
+    await limiter.hit("auth.resend_otp", http_request, response, email=request.email)
+    
     # Check if user exists
     user = await db.users.find_one({"email": request.email})
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    # Generate new OTP
-    otp_code = generate_otp()
-    otp_data = {
-        "email": request.email,
-        "otp_code": otp_code,
-        "otp_type": request.otp_type,
-        "verified": False,
-        "expires_at": datetime.utcnow() + timedelta(minutes=10),
-        "created_at": datetime.utcnow()
-    }
-    await db.otps.insert_one(otp_data)
+    # Generate new OTP, replacing the previous one
+    otp_code = await issue_otp(db, request.email, request.otp_type)
+    await notify(db, str(user["_id"]), "otp", {"otp_code": otp_code, "expires_minutes": OTP_EXPIRE_MINUTES})
     
     return {
         "message": "OTP sent successfully",
         "otp_code": otp_code  # Remove this in production
     }
 
+@router.post("/refresh")
+async def refresh(request: RefreshTokenRequest, http_request: Request, response: Response, db = Depends(get_db)):
+    await limiter.hit("auth.refresh", http_request, response)
+    return await rotate_refresh_token(db, request.refresh_token)
+
+@router.post("/logout")
+async def logout(request: RefreshTokenRequest, db = Depends(get_db)):
+    payload = verify_token(request.refresh_token)
+    if not payload or payload.get("type") != "refresh" or not payload.get("fam"):
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    
+    await revoke_family(db, payload["fam"])
+    
+    return {"message": "Logged out successfully"}
+
 @router.get("/me")
 async def get_current_user_info(current_user: dict = Depends(get_current_user)):
     return {"user": current_user}
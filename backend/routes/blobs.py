@@ -0,0 +1,56 @@
+from fastapi import APIRouter, Depends, File, Request, UploadFile
+from fastapi.responses import Response, StreamingResponse
+import sys
+sys.path.append('/app/backend')
+from routes.auth import get_current_user
+import blob_store
+
+router = APIRouter(prefix="/blobs", tags=["Blobs"])
+
+def get_db():
+    from server import db
+    return db
+
+@router.post("")
+async def upload_blob(
+    file: UploadFile = File(...),
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    blob = await blob_store.store_upload(db, file, current_user["_id"])
+    return {"message": "File uploaded", "blob": blob}
+
+@router.get("/{blob_id}")
+async def download_blob(
+    blob_id: str,
+    request: Request,
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    blob = await blob_store.get_blob(db, blob_id, current_user)
+    
+    # Content never changes under a digest, so the digest is the ETag
+    headers = {
+        "ETag": f'"{blob_id}"',
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "private, max-age=31536000, immutable"
+    }
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    
+    size = blob["size"]
+    byte_range = blob_store.parse_range(request.headers.get("range"), size)
+    if byte_range is None:
+        start, end, status_code = 0, size - 1, 200
+    else:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    
+    return StreamingResponse(
+        blob_store.read_blob(db, blob, start, end - start + 1),
+        status_code=status_code,
+        media_type=blob["content_type"],
+        headers=headers
+    )
@@ -4,10 +4,17 @@ from datetime import datetime
 from typing import Optional, List
 import sys
 sys.path.append('/app/backend')
-from models import Dispute, DisputeType, DisputeStatus, ResolutionType, OrderStatus
-from routes.auth import get_current_user
+from models import Dispute, DisputeType, DisputeStatus, ResolutionType
+from routes.auth import get_current_user, get_current_mediator
 from utils import generate_dispute_number
+from order_state import transition_order, dispute_window
+from seller_stats import record_event
+from dispute_resolution import resolve_dispute, response_due_at, DISPUTE_MEDIATION_AFTER_HOURS
+import dispute_queue
+from blob_store import resolve_attachments, grant_readers
+from notifications import notify
 from bson import ObjectId
+from pymongo import ReturnDocument
 
 router = APIRouter(prefix="/disputes", tags=["Disputes"])
 
@@ -38,26 +45,25 @@ async def create_dispute(
     current_user: dict = Depends(get_current_user),
     db = Depends(get_db)
 ):
-    # Get order
-    order = await db.orders.find_one({"_id": ObjectId(request.order_id)})
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
-    
-    # Check if user is part of this order
-    if order["buyer_id"] != current_user["_id"] and order["seller_id"] != current_user["_id"]:
-        raise HTTPException(status_code=403, detail="Not authorized")
-    
-    # Check if order can be disputed
-    if order["status"] in [OrderStatus.PENDING_ACCEPTANCE.value, OrderStatus.CANCELLED.value, OrderStatus.REFUNDED.value]:
-        raise HTTPException(status_code=400, detail="Order cannot be disputed")
-    
     # Check if dispute already exists
-    existing_dispute = await db.disputes.find_one({"order_id": request.order_id})
+    existing_dispute = await db.disputes.find_one(
+        {"order_id": request.order_id}, {"initiator_id": 1, "respondent_id": 1}
+    )
     if existing_dispute:
+        if current_user["_id"] not in (existing_dispute["initiator_id"], existing_dispute["respondent_id"]):
+            raise HTTPException(status_code=403, detail="Not authorized")
         raise HTTPException(status_code=400, detail="Dispute already exists for this order")
     
+    await resolve_attachments(db, request.evidence, current_user["_id"])
+    
+    # Move the order into dispute; only a buyer or seller of a disputable order gets past this
+    order = await transition_order(
+        db, request.order_id, "dispute", current_user["_id"], guard=dispute_window(datetime.utcnow())
+    )
+    
     # Determine initiator and respondent
-    if order["buyer_id"] == current_user["_id"]:
+    buyer_initiated = order["buyer_id"] == current_user["_id"]
+    if buyer_initiated:
         initiator_id = order["buyer_id"]
         respondent_id = order["seller_id"]
     else:
@@ -75,22 +81,25 @@ async def create_dispute(
         "initiator_evidence": request.evidence,
         "initiator_proposed_resolution": request.proposed_resolution,
         "status": DisputeStatus.OPEN.value,
+        "amount_at_stake": order["total_cost"],
+        # Sellers' claims and anything already paid out always go to a mediator
+        "default_judgement_eligible": buyer_initiated and not (order.get("completed_at") or order.get("escrow_settled_at")),
         "created_at": datetime.utcnow(),
         "updated_at": datetime.utcnow()
     }
+    dispute_data["response_due_at"] = response_due_at(dispute_data["created_at"])
+    dispute_data.update(dispute_queue.queue_fields(dispute_data, dispute_data["created_at"]))
     
     result = await db.disputes.insert_one(dispute_data)
     dispute_data["_id"] = str(result.inserted_id)
-    
-    # Update order status
-    await db.orders.update_one(
-        {"_id": ObjectId(request.order_id)},
-        {"$set": {
-            "status": OrderStatus.DISPUTED.value,
-            "escrow_status": "disputed",
-            "updated_at": datetime.utcnow()
-        }}
-    )
+    await grant_readers(db, request.evidence, [respondent_id])
+    await notify(db, respondent_id, "dispute_opened", {
+        "dispute_id": dispute_data["_id"],
+        "dispute_number": dispute_data["dispute_number"],
+        "order_number": order["order_number"],
+        "response_hours": DISPUTE_MEDIATION_AFTER_HOURS
+    })
+    await record_event(db, order["seller_id"], "disputed")
     
     return {
         "message": "Dispute created successfully",
@@ -104,150 +113,114 @@ async def respond_to_dispute(
     current_user: dict = Depends(get_current_user),
     db = Depends(get_db)
 ):
-    # Get dispute
-    dispute = await db.disputes.find_one({"_id": ObjectId(dispute_id)})
-    if not dispute:
-        raise HTTPException(status_code=404, detail="Dispute not found")
-    
-    # Check if user is respondent
-    if dispute["respondent_id"] != current_user["_id"]:
-        raise HTTPException(status_code=403, detail="Not authorized")
+    await resolve_attachments(db, request.evidence, current_user["_id"])
     
-    # Check if already responded
-    if dispute.get("respondent_response"):
-        raise HTTPException(status_code=400, detail="Already responded to this dispute")
-    
-    # Update dispute
-    await db.disputes.update_one(
-        {"_id": ObjectId(dispute_id)},
+    # Record the response only if this user is the respondent and has not answered yet
+    updated_dispute = await db.disputes.find_one_and_update(
+        {
+            "_id": ObjectId(dispute_id),
+            "respondent_id": current_user["_id"],
+            "respondent_response": {"$in": [None, ""]}
+        },
         {"$set": {
             "respondent_response": request.response,
             "respondent_evidence": request.evidence,
             "respondent_proposed_resolution": request.proposed_resolution,
             "respondent_responded_at": datetime.utcnow(),
             "status": DisputeStatus.UNDER_MEDIATION.value,
+            "response_due_at": None,
             "updated_at": datetime.utcnow()
-        }}
+        }, "$inc": {"priority": dispute_queue.ANSWERED_WEIGHT}},
+        return_document=ReturnDocument.AFTER
     )
+    if not updated_dispute:
+        dispute = await db.disputes.find_one({"_id": ObjectId(dispute_id)}, {"respondent_id": 1})
+        if not dispute:
+            raise HTTPException(status_code=404, detail="Dispute not found")
+        if dispute["respondent_id"] != current_user["_id"]:
+            raise HTTPException(status_code=403, detail="Not authorized")
+        raise HTTPException(status_code=400, detail="Already responded to this dispute")
     
-    updated_dispute = await db.disputes.find_one({"_id": ObjectId(dispute_id)})
     updated_dispute["_id"] = str(updated_dispute["_id"])
+    await grant_readers(db, request.evidence, [updated_dispute["initiator_id"]])
     
     return {
         "message": "Response submitted. Dispute is now under mediation.",
         "dispute": updated_dispute
     }
 
+# Mediation queue
+
+@router.get("/queue")
+async def get_mediation_queue(
+    limit: int = 50,
+    include_claimed: bool = False,
+    current_user: dict = Depends(get_current_mediator),
+    db = Depends(get_db)
+):
+    disputes = await dispute_queue.list_queue(db, limit=min(limit, 200), include_claimed=include_claimed)
+    return {"disputes": disputes, "total": len(disputes)}
+
+@router.get("/queue/mine")
+async def get_claimed_disputes(
+    current_user: dict = Depends(get_current_mediator),
+    db = Depends(get_db)
+):
+    disputes = await dispute_queue.list_claimed(db, current_user["_id"])
+    return {"disputes": disputes, "total": len(disputes)}
+
+@router.post("/queue/claim-next")
+async def claim_next_dispute(
+    current_user: dict = Depends(get_current_mediator),
+    db = Depends(get_db)
+):
+    dispute = await dispute_queue.claim_next(db, current_user["_id"])
+    return {"message": "Dispute claimed", "dispute": dispute}
+
+@router.post("/{dispute_id}/claim")
+async def claim_dispute(
+    dispute_id: str,
+    current_user: dict = Depends(get_current_mediator),
+    db = Depends(get_db)
+):
+    dispute = await dispute_queue.claim(db, dispute_id, current_user["_id"])
+    return {"message": "Dispute claimed", "dispute": dispute}
+
+@router.post("/{dispute_id}/release")
+async def release_dispute(
+    dispute_id: str,
+    current_user: dict = Depends(get_current_mediator),
+    db = Depends(get_db)
+):
+    dispute = await dispute_queue.release(db, dispute_id, current_user["_id"])
+    return {"message": "Dispute released back to the queue", "dispute": dispute}
+
 @router.post("/{dispute_id}/mediate")
 async def mediate_dispute(
     dispute_id: str,
     request: MediationDecisionRequest,
-    current_user: dict = Depends(get_current_user),
+    current_user: dict = Depends(get_current_mediator),
     db = Depends(get_db)
 ):
-    # In production, check if user is admin/mediator
-    # For now, allowing any authenticated user for testing
-    
-    # Get dispute
-    dispute = await db.disputes.find_one({"_id": ObjectId(dispute_id)})
-    if not dispute:
-        raise HTTPException(status_code=404, detail="Dispute not found")
-    
-    # Get order
-    order = await db.orders.find_one({"_id": ObjectId(dispute["order_id"])})
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
-    
-    # Update dispute
-    await db.disputes.update_one(
-        {"_id": ObjectId(dispute_id)},
-        {"$set": {
-            "resolution_type": request.resolution_type.value,
-            "resolution_details": request.resolution_details,
-            "refund_percentage": request.refund_percentage,
+    # Resolve only under a live lease held by this mediator, exactly once
+    now = datetime.utcnow()
+    updated_dispute = await resolve_dispute(
+        db, dispute_id, request.resolution_type, request.resolution_details,
+        refund_percentage=request.refund_percentage,
+        guard={
             "mediator_id": current_user["_id"],
-            "mediator_assigned_at": datetime.utcnow(),
-            "resolved_at": datetime.utcnow(),
-            "status": DisputeStatus.RESOLVED.value,
-            "updated_at": datetime.utcnow()
-        }}
+            "lease_expires_at": {"$gt": now},
+            **dispute_queue.not_a_party(current_user["_id"])
+        },
+        now=now
     )
-    
-    # Execute resolution
-    if request.resolution_type == ResolutionType.FULL_REFUND:
-        # Refund full amount to buyer
-        buyer = await db.users.find_one({"_id": ObjectId(order["buyer_id"])})
-        buyer_profile = buyer.get("buyer_profile", {})
-        current_balance = buyer_profile.get("credit_balance", 0)
-        new_balance = current_balance + order["total_cost"]
-        
-        await db.users.update_one(
-            {"_id": ObjectId(order["buyer_id"])},
-            {"$set": {"buyer_profile.credit_balance": new_balance}}
-        )
-        
-        await db.orders.update_one(
-            {"_id": ObjectId(dispute["order_id"])},
-            {"$set": {
-                "status": OrderStatus.REFUNDED.value,
-                "escrow_status": "refunded",
-                "updated_at": datetime.utcnow()
-            }}
-        )
-    
-    elif request.resolution_type == ResolutionType.PARTIAL_REFUND:
-        # Refund partial amount
-        refund_amount = order["total_cost"] * (request.refund_percentage / 100)
-        seller_amount = order["base_cost"] - refund_amount
-        
-        # Refund to buyer
-        buyer = await db.users.find_one({"_id": ObjectId(order["buyer_id"])})
-        buyer_profile = buyer.get("buyer_profile", {})
-        buyer_balance = buyer_profile.get("credit_balance", 0)
-        await db.users.update_one(
-            {"_id": ObjectId(order["buyer_id"])},
-            {"$set": {"buyer_profile.credit_balance": buyer_balance + refund_amount}}
-        )
-        
-        # Pay seller
-        seller = await db.users.find_one({"_id": ObjectId(order["seller_id"])})
-        seller_profile = seller.get("seller_profile", {})
-        seller_balance = seller_profile.get("available_balance", 0)
-        await db.users.update_one(
-            {"_id": ObjectId(order["seller_id"])},
-            {"$set": {"seller_profile.available_balance": seller_balance + seller_amount}}
-        )
-        
-        await db.orders.update_one(
-            {"_id": ObjectId(dispute["order_id"])},
-            {"$set": {
-                "status": OrderStatus.COMPLETED.value,
-                "escrow_status": "released",
-                "updated_at": datetime.utcnow()
-            }}
-        )
-    
-    elif request.resolution_type == ResolutionType.FULL_PAYMENT:
-        # Pay seller full amount
-        seller = await db.users.find_one({"_id": ObjectId(order["seller_id"])})
-        seller_profile = seller.get("seller_profile", {})
-        seller_balance = seller_profile.get("available_balance", 0)
-        await db.users.update_one(
-            {"_id": ObjectId(order["seller_id"])},
-            {"$set": {"seller_profile.available_balance": seller_balance + order["base_cost"]}}
-        )
-        
-        await db.orders.update_one(
-            {"_id": ObjectId(dispute["order_id"])},
-            {"$set": {
-                "status": OrderStatus.COMPLETED.value,
-                "escrow_status": "released",
-                "updated_at": datetime.utcnow()
-            }}
-        )
-    
-    updated_dispute = await db.disputes.find_one({"_id": ObjectId(dispute_id)})
-    updated_dispute["_id"] = str(updated_dispute["_id"])
+    if not updated_dispute:
+        existing = await db.disputes.find_one({"_id": ObjectId(dispute_id)}, {"status": 1})
+        if not existing:
+            raise HTTPException(status_code=404, detail="Dispute not found")
+        if existing["status"] == DisputeStatus.RESOLVED.value:
+            raise HTTPException(status_code=400, detail="Dispute already resolved")
+        raise HTTPException(status_code=409, detail="Claim this dispute before resolving it")
     
     return {
         "message": "Dispute resolved",
@@ -285,7 +258,8 @@ async def get_dispute(
         raise HTTPException(status_code=404, detail="Dispute not found")
     
     # Check authorization
-    if dispute["initiator_id"] != current_user["_id"] and dispute["respondent_id"] != current_user["_id"]:
+    if dispute["initiator_id"] != current_user["_id"] and dispute["respondent_id"] != current_user["_id"] \
+            and not current_user.get("is_mediator"):
         raise HTTPException(status_code=403, detail="Not authorized")
     
     dispute["_id"] = str(dispute["_id"])
@@ -1,16 +1,28 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Header, Response
 from pydantic import BaseModel
 from datetime import datetime, timedelta
 from typing import Optional, List
+from pymongo import ReturnDocument
 import sys
 sys.path.append('/app/backend')
 from models import Order, OrderStatus, EscrowStatus, ProofOfCompletion, RevisionRequest, OrderMessage, TransactionType
 from routes.auth import get_current_user
 from utils import generate_order_number, calculate_platform_fee
+from idempotency import run_idempotent
+from order_state import TRANSITIONS, transition_order, bulk_transition_orders, refund_orders
+from seller_stats import record_event, record_events, response_hours
+from seller_dashboard import record_day
+from archival import find_history, find_one_with_archive
+from deadline_monitor import deadline_monitor
+from blob_store import resolve_attachments, grant_readers, grant_readers_many
+from proof_verification import proof_verifier, PENDING
+from notifications import notify, notify_many, order_notice
 from bson import ObjectId
 
 router = APIRouter(prefix="/orders", tags=["Orders"])
 
+BULK_ORDER_MAX_ITEMS = 100
+
 def get_db():
     from server import db
     return db
@@ -25,6 +37,9 @@ class CreateOrderRequest(BaseModel):
     special_instructions: Optional[str] = None
     turnaround_hours: Optional[int] = None
 
+class BulkCreateOrderRequest(BaseModel):
+    items: List[CreateOrderRequest]
+
 class ProofOfCompletionRequest(BaseModel):
     url: Optional[str] = None
     screenshots: List[str] = []
@@ -37,12 +52,34 @@ class RevisionRequestModel(BaseModel):
 class DeclineOrderRequest(BaseModel):
     reason: str
 
+class BulkOrderActionRequest(BaseModel):
+    order_ids: List[str]
+
+class BulkDeclineOrderRequest(BaseModel):
+    order_ids: List[str]
+    reason: str
+
+class BulkDeliverItem(ProofOfCompletionRequest):
+    order_id: str
+
+class BulkDeliverOrderRequest(BaseModel):
+    items: List[BulkDeliverItem]
+
 @router.post("/create")
 async def create_order(
     request: CreateOrderRequest,
+    response: Response,
     current_user: dict = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None),
     db = Depends(get_db)
 ):
+    return await run_idempotent(
+        db, current_user["_id"], idempotency_key, "orders.create", request.model_dump(),
+        lambda: _create_order(request, current_user, db),
+        response=response
+    )
+
+async def _create_order(request: CreateOrderRequest, current_user: dict, db):
     if current_user["role"] not in ["buyer", "both"]:
         raise HTTPException(status_code=403, detail="Only buyers can create orders")
     
@@ -54,6 +91,9 @@ async def create_order(
     if not service.get("active", False):
         raise HTTPException(status_code=400, detail="Service is not active")
     
+    if request.quantity < 1:
+        raise HTTPException(status_code=400, detail="Quantity must be at least 1")
+    
     # Get seller
     seller = await db.users.find_one({"_id": ObjectId(service["seller_id"])})
     if not seller:
@@ -84,6 +124,7 @@ async def create_order(
         "platform": request.platform,
         "base_cost": base_cost,
         "platform_fee": platform_fee,
+        "seller_tier": seller_tier,
         "express_fee": 0.0,
         "total_cost": total_cost,
         "brief": request.brief,
@@ -121,6 +162,7 @@ async def create_order(
         "created_at": datetime.utcnow()
     }
     await db.transactions.insert_one(transaction_data)
+    await notify(db, service["seller_id"], "order_received", order_notice(order_data))
     
     return {
         "message": "Order created successfully",
@@ -129,39 +171,357 @@ async def create_order(
         "new_balance": new_balance
     }
 
+@router.post("/bulk-create")
+async def bulk_create_orders(
+    request: BulkCreateOrderRequest,
+    response: Response,
+    current_user: dict = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None),
+    db = Depends(get_db)
+):
+    return await run_idempotent(
+        db, current_user["_id"], idempotency_key, "orders.bulk_create", request.model_dump(),
+        lambda: _bulk_create_orders(request, current_user, db),
+        response=response
+    )
+
+async def _bulk_create_orders(request: BulkCreateOrderRequest, current_user: dict, db):
+    """
+    Create one order per line item with batched lookups, a single debit for
+    the total and insert_many writes. Invalid items are reported per item and
+    skipped. If writing the valid ones fails, whatever was written is removed
+    and the debit is credited back before the error is raised.
+    """
+    if current_user["role"] not in ["buyer", "both"]:
+        raise HTTPException(status_code=403, detail="Only buyers can create orders")
+    
+    if not request.items:
+        raise HTTPException(status_code=400, detail="No order items provided")
+    
+    if len(request.items) > BULK_ORDER_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_ORDER_MAX_ITEMS} orders per request")
+    
+    # Get services and sellers with one $in read each
+    service_ids = {item.service_id for item in request.items if ObjectId.is_valid(item.service_id)}
+    services = await db.service_listings.find(
+        {"_id": {"$in": [ObjectId(service_id) for service_id in service_ids]}}
+    ).to_list(length=len(service_ids))
+    services_by_id = {str(service["_id"]): service for service in services}
+    
+    seller_ids = {service["seller_id"] for service in services}
+    sellers = await db.users.find(
+        {"_id": {"$in": [ObjectId(seller_id) for seller_id in seller_ids]}},
+        {"seller_profile.tier": 1}
+    ).to_list(length=len(seller_ids))
+    sellers_by_id = {str(seller["_id"]): seller for seller in sellers}
+    
+    # Validate and price every item
+    results = []
+    orders_to_create = []
+    now = datetime.utcnow()
+    for index, item in enumerate(request.items):
+        service = services_by_id.get(item.service_id)
+        error = None
+        if not service:
+            error = "Service not found"
+        elif not service.get("active", False):
+            error = "Service is not active"
+        elif service["seller_id"] not in sellers_by_id:
+            error = "Seller not found"
+        elif item.quantity < 1:
+            error = "Quantity must be at least 1"
+        
+        if error:
+            results.append({"index": index, "service_id": item.service_id, "success": False, "error": error})
+            continue
+        
+        base_cost = service["base_price"] * item.quantity
+        seller_tier = sellers_by_id[service["seller_id"]].get("seller_profile", {}).get("tier", "new")
+        platform_fee = calculate_platform_fee(base_cost, seller_tier)
+        total_cost = base_cost + platform_fee
+        
+        orders_to_create.append((index, service, {
+            "_id": ObjectId(),
+            "order_number": generate_order_number(),
+            "buyer_id": current_user["_id"],
+            "seller_id": service["seller_id"],
+            "service_id": item.service_id,
+            "service_title": service["title"],
+            "service_type": service["service_type"],
+            "quantity": item.quantity,
+            "platform": item.platform,
+            "base_cost": base_cost,
+            "platform_fee": platform_fee,
+            "seller_tier": seller_tier,
+            "express_fee": 0.0,
+            "total_cost": total_cost,
+            "brief": item.brief,
+            "hashtags": item.hashtags,
+            "mentions": item.mentions,
+            "special_instructions": item.special_instructions,
+            "turnaround_hours": item.turnaround_hours or service["turnaround_hours"],
+            "status": OrderStatus.PENDING_ACCEPTANCE.value,
+            "escrow_status": EscrowStatus.LOCKED.value,
+            "escrow_amount": total_cost,
+            "created_at": now,
+            "updated_at": now
+        }))
+    
+    if not orders_to_create:
+        return {
+            "message": "No orders created",
+            "results": results,
+            "created": 0,
+            "failed": len(results),
+            "credits_deducted": 0.0,
+            "new_balance": current_user.get("buyer_profile", {}).get("credit_balance", 0)
+        }
+    
+    # Deduct the total from the buyer in one atomic, balance-guarded update
+    total = sum(order["total_cost"] for _, _, order in orders_to_create)
+    buyer = await db.users.find_one_and_update(
+        {"_id": ObjectId(current_user["_id"]), "buyer_profile.credit_balance": {"$gte": total}},
+        {"$inc": {"buyer_profile.credit_balance": -total}},
+        projection={"buyer_profile.credit_balance": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if not buyer:
+        credit_balance = current_user.get("buyer_profile", {}).get("credit_balance", 0)
+        raise HTTPException(status_code=400, detail=f"Insufficient credits. Need {total}, have {credit_balance}")
+    
+    new_balance = buyer["buyer_profile"]["credit_balance"]
+    
+    # Not a transaction: if any write below fails, undo the debit and the orders written so far
+    order_ids = [order["_id"] for _, _, order in orders_to_create]
+    try:
+        await db.orders.insert_many([order for _, _, order in orders_to_create])
+        
+        # Create transaction records, walking the balance down item by item
+        balance = new_balance + total
+        transactions = []
+        for index, service, order in orders_to_create:
+            transactions.append({
+                "user_id": current_user["_id"],
+                "transaction_type": TransactionType.ORDER_PAYMENT.value,
+                "amount": -order["total_cost"],
+                "balance_before": balance,
+                "balance_after": balance - order["total_cost"],
+                "order_id": str(order["_id"]),
+                "related_user_id": service["seller_id"],
+                "description": f"Order payment for {service['title']}",
+                "created_at": now
+            })
+            balance -= order["total_cost"]
+        await db.transactions.insert_many(transactions)
+    except Exception:
+        await db.orders.delete_many({"_id": {"$in": order_ids}})
+        await db.transactions.delete_many({"order_id": {"$in": [str(order_id) for order_id in order_ids]}})
+        await db.users.update_one(
+            {"_id": ObjectId(current_user["_id"])},
+            {"$inc": {"buyer_profile.credit_balance": total}}
+        )
+        raise
+    
+    for index, service, order in orders_to_create:
+        order["_id"] = str(order["_id"])
+        results.append({"index": index, "service_id": order["service_id"], "success": True, "order": order})
+    await notify_many(db, [
+        (order["seller_id"], "order_received", order_notice(order)) for _, _, order in orders_to_create
+    ])
+    
+    results.sort(key=lambda item_result: item_result["index"])
+    
+    return {
+        "message": f"{len(orders_to_create)} orders created successfully",
+        "results": results,
+        "created": len(orders_to_create),
+        "failed": len(results) - len(orders_to_create),
+        "credits_deducted": total,
+        "new_balance": new_balance
+    }
+
+# Bulk seller actions
+
+BULK_ACTION_PROJECTION = {
+    "seller_id": 1,
+    "buyer_id": 1,
+    "status": 1,
+    "order_number": 1,
+    "total_cost": 1,
+    "turnaround_hours": 1,
+    "service_title": 1,
+    "created_at": 1
+}
+
+async def _load_seller_orders(db, order_ids: List[str], seller_id: str, action: str):
+    """
+    Read all requested orders with one $in query and split them into the ones
+    the seller may move along `action` and per-order failures
+    """
+    if not order_ids:
+        raise HTTPException(status_code=400, detail="No orders provided")
+    
+    if len(order_ids) > BULK_ORDER_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_ORDER_MAX_ITEMS} orders per request")
+    
+    valid_ids = [ObjectId(order_id) for order_id in set(order_ids) if ObjectId.is_valid(order_id)]
+    orders = await db.orders.find({"_id": {"$in": valid_ids}}, BULK_ACTION_PROJECTION).to_list(length=len(valid_ids))
+    orders_by_id = {str(order["_id"]): order for order in orders}
+    
+    eligible = []
+    outcomes = {}
+    for order_id in dict.fromkeys(order_ids):
+        order = orders_by_id.get(order_id)
+        if not order:
+            outcomes[order_id] = {"order_id": order_id, "success": False, "error": "Order not found"}
+        elif order["seller_id"] != seller_id:
+            outcomes[order_id] = {"order_id": order_id, "success": False, "error": "Not authorized"}
+        elif order["status"] not in TRANSITIONS[action].from_statuses:
+            outcomes[order_id] = {"order_id": order_id, "success": False, "error": f"Order is {order['status']}"}
+        else:
+            eligible.append(order)
+    return eligible, outcomes
+
+def _bulk_outcomes(order_ids: List[str], outcomes: dict, eligible: list, moved: set, status: str) -> dict:
+    for order in eligible:
+        order_id = str(order["_id"])
+        if order_id in moved:
+            outcomes[order_id] = {"order_id": order_id, "success": True, "status": status}
+        else:
+            outcomes[order_id] = {"order_id": order_id, "success": False, "error": "Order status changed concurrently"}
+    results = [outcomes[order_id] for order_id in dict.fromkeys(order_ids)]
+    succeeded = sum(1 for outcome in results if outcome["success"])
+    return {"results": results, "succeeded": succeeded, "failed": len(results) - succeeded}
+
+@router.post("/bulk-accept")
+async def bulk_accept_orders(
+    request: BulkOrderActionRequest,
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    eligible, outcomes = await _load_seller_orders(db, request.order_ids, current_user["_id"], "accept")
+    
+    now = datetime.utcnow()
+    fields = {
+        str(order["_id"]): {
+            "accepted_at": now,
+            "deadline": now + timedelta(hours=order["turnaround_hours"])
+        }
+        for order in eligible
+    }
+    moved = await bulk_transition_orders(db, eligible, "accept", fields, now=now)
+    for order_id in moved:
+        deadline_monitor.schedule(order_id, fields[order_id]["deadline"])
+    await record_events(db, [
+        (order["seller_id"], "accepted", response_hours(order, now))
+        for order in eligible if str(order["_id"]) in moved
+    ], now=now)
+    await notify_many(db, [
+        (order["buyer_id"], "order_accepted", order_notice(order, deadline=fields[str(order["_id"])]["deadline"]))
+        for order in eligible if str(order["_id"]) in moved
+    ])
+    
+    return {
+        "message": f"{len(moved)} orders accepted",
+        **_bulk_outcomes(request.order_ids, outcomes, eligible, moved, OrderStatus.ACCEPTED.value)
+    }
+
+@router.post("/bulk-decline")
+async def bulk_decline_orders(
+    request: BulkDeclineOrderRequest,
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    eligible, outcomes = await _load_seller_orders(db, request.order_ids, current_user["_id"], "decline")
+    
+    now = datetime.utcnow()
+    moved = await bulk_transition_orders(db, eligible, "decline", now=now)
+    declined = [order for order in eligible if str(order["_id"]) in moved]
+    await record_events(db, [
+        (order["seller_id"], "declined", response_hours(order, now)) for order in declined
+    ], now=now)
+    
+    # Refund credits with one $inc per buyer
+    await refund_orders(
+        db, declined, "Refund for declined order: {order_number}",
+        notes=f"Seller declined: {request.reason}", now=now
+    )
+    
+    return {
+        "message": f"{len(moved)} orders declined. Credits refunded to buyers.",
+        **_bulk_outcomes(request.order_ids, outcomes, eligible, moved, OrderStatus.CANCELLED.value)
+    }
+
+@router.post("/bulk-deliver")
+async def bulk_deliver_orders(
+    request: BulkDeliverOrderRequest,
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    order_ids = [item.order_id for item in request.items]
+    await resolve_attachments(db, [ref for item in request.items for ref in item.screenshots], current_user["_id"])
+    eligible, outcomes = await _load_seller_orders(db, order_ids, current_user["_id"], "deliver")
+    
+    now = datetime.utcnow()
+    items = {item.order_id: item for item in request.items}
+    fields = {}
+    for order in eligible:
+        item = items[str(order["_id"])]
+        proof = ProofOfCompletion(
+            url=item.url,
+            screenshots=item.screenshots,
+            description=item.description,
+            submitted_at=now,
+            verified=False,
+            verification_method="manual",
+            verification_status=PENDING
+        )
+        fields[str(order["_id"])] = {
+            "proof_of_completion": proof.model_dump(),
+            "delivered_at": now,
+            "review_deadline": now + timedelta(hours=72)
+        }
+    moved = await bulk_transition_orders(db, eligible, "deliver", fields, now=now)
+    await grant_readers_many(db, [
+        (items[str(order["_id"])].screenshots, [order["buyer_id"]])
+        for order in eligible if str(order["_id"]) in moved
+    ])
+    if moved:
+        proof_verifier.submit()
+    await notify_many(db, [
+        (order["buyer_id"], "order_delivered", order_notice(order))
+        for order in eligible if str(order["_id"]) in moved
+    ])
+    
+    return {
+        "message": f"{len(moved)} orders delivered. Awaiting buyer approval.",
+        **_bulk_outcomes(order_ids, outcomes, eligible, moved, OrderStatus.DELIVERED.value)
+    }
+
 @router.post("/{order_id}/accept")
 async def accept_order(
     order_id: str,
     current_user: dict = Depends(get_current_user),
     db = Depends(get_db)
 ):
-    order = await db.orders.find_one({"_id": ObjectId(order_id)})
+    # Turnaround is fixed at creation, so it can be read ahead of the guarded update
+    order = None
+    if ObjectId.is_valid(order_id):
+        order = await db.orders.find_one({"_id": ObjectId(order_id)}, {"turnaround_hours": 1})
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
-    if order["seller_id"] != current_user["_id"]:
-        raise HTTPException(status_code=403, detail="Not authorized")
-    
-    if order["status"] != OrderStatus.PENDING_ACCEPTANCE.value:
-        raise HTTPException(status_code=400, detail="Order cannot be accepted")
-    
     # Calculate deadline
-    deadline = datetime.utcnow() + timedelta(hours=order["turnaround_hours"])
-    
-    # Update order
-    await db.orders.update_one(
-        {"_id": ObjectId(order_id)},
-        {"$set": {
-            "status": OrderStatus.ACCEPTED.value,
-            "escrow_status": EscrowStatus.ACTIVE.value,
-            "accepted_at": datetime.utcnow(),
-            "deadline": deadline,
-            "updated_at": datetime.utcnow()
-        }}
+    now = datetime.utcnow()
+    deadline = now + timedelta(hours=order["turnaround_hours"])
+    updated_order = await transition_order(
+        db, order_id, "accept", current_user["_id"],
+        fields={"accepted_at": now, "deadline": deadline},
+        now=now
     )
-    
-    updated_order = await db.orders.find_one({"_id": ObjectId(order_id)})
-    updated_order["_id"] = str(updated_order["_id"])
+    deadline_monitor.schedule(order_id, deadline)
+    await record_event(db, current_user["_id"], "accepted", response_hours(updated_order, now), now=now)
+    await notify(db, updated_order["buyer_id"], "order_accepted", order_notice(updated_order, deadline=deadline))
     
     return {
         "message": "Order accepted",
@@ -176,54 +536,33 @@ async def decline_order(
     current_user: dict = Depends(get_current_user),
     db = Depends(get_db)
 ):
-    order = await db.orders.find_one({"_id": ObjectId(order_id)})
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
-    
-    if order["seller_id"] != current_user["_id"]:
-        raise HTTPException(status_code=403, detail="Not authorized")
-    
-    if order["status"] != OrderStatus.PENDING_ACCEPTANCE.value:
-        raise HTTPException(status_code=400, detail="Order cannot be declined")
+    now = datetime.utcnow()
+    updated_order = await transition_order(db, order_id, "decline", current_user["_id"], now=now)
+    await record_event(db, current_user["_id"], "declined", response_hours(updated_order, now), now=now)
     
     # Refund credits to buyer
-    buyer = await db.users.find_one({"_id": ObjectId(order["buyer_id"])})
-    buyer_profile = buyer.get("buyer_profile", {})
-    current_balance = buyer_profile.get("credit_balance", 0)
-    new_balance = current_balance + order["total_cost"]
-    
-    await db.users.update_one(
-        {"_id": ObjectId(order["buyer_id"])},
-        {"$set": {"buyer_profile.credit_balance": new_balance}}
-    )
-    
-    # Update order
-    await db.orders.update_one(
-        {"_id": ObjectId(order_id)},
-        {"$set": {
-            "status": OrderStatus.CANCELLED.value,
-            "escrow_status": EscrowStatus.REFUNDED.value,
-            "updated_at": datetime.utcnow()
-        }}
+    buyer = await db.users.find_one_and_update(
+        {"_id": ObjectId(updated_order["buyer_id"])},
+        {"$inc": {"buyer_profile.credit_balance": updated_order["total_cost"]}},
+        projection={"buyer_profile.credit_balance": 1},
+        return_document=ReturnDocument.AFTER
     )
+    new_balance = buyer["buyer_profile"]["credit_balance"]
     
     # Create transaction record
     transaction_data = {
-        "user_id": order["buyer_id"],
+        "user_id": updated_order["buyer_id"],
         "transaction_type": TransactionType.ORDER_REFUND.value,
-        "amount": order["total_cost"],
-        "balance_before": current_balance,
+        "amount": updated_order["total_cost"],
+        "balance_before": new_balance - updated_order["total_cost"],
         "balance_after": new_balance,
         "order_id": order_id,
-        "description": f"Refund for declined order: {order['order_number']}",
+        "description": f"Refund for declined order: {updated_order['order_number']}",
         "notes": f"Seller declined: {request.reason}",
         "created_at": datetime.utcnow()
     }
     await db.transactions.insert_one(transaction_data)
     
-    updated_order = await db.orders.find_one({"_id": ObjectId(order_id)})
-    updated_order["_id"] = str(updated_order["_id"])
-    
     return {
         "message": "Order declined. Credits refunded to buyer.",
         "order": updated_order
@@ -236,15 +575,7 @@ async def deliver_order(
     current_user: dict = Depends(get_current_user),
     db = Depends(get_db)
 ):
-    order = await db.orders.find_one({"_id": ObjectId(order_id)})
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
-    
-    if order["seller_id"] != current_user["_id"]:
-        raise HTTPException(status_code=403, detail="Not authorized")
-    
-    if order["status"] not in [OrderStatus.ACCEPTED.value, OrderStatus.REVISION_REQUESTED.value]:
-        raise HTTPException(status_code=400, detail="Order cannot be delivered")
+    await resolve_attachments(db, request.screenshots, current_user["_id"])
     
     # Create proof of completion
     proof = ProofOfCompletion(
@@ -253,27 +584,24 @@ async def deliver_order(
         description=request.description,
         submitted_at=datetime.utcnow(),
         verified=False,
-        verification_method="manual"
+        verification_method="manual",
+        verification_status=PENDING
     )
     
     # Calculate review deadline (72 hours)
-    review_deadline = datetime.utcnow() + timedelta(hours=72)
-    
-    # Update order
-    await db.orders.update_one(
-        {"_id": ObjectId(order_id)},
-        {"$set": {
-            "status": OrderStatus.DELIVERED.value,
-            "escrow_status": EscrowStatus.UNDER_REVIEW.value,
-            "proof_of_completion": proof.dict(),
-            "delivered_at": datetime.utcnow(),
-            "review_deadline": review_deadline,
-            "updated_at": datetime.utcnow()
-        }}
+    now = datetime.utcnow()
+    updated_order = await transition_order(
+        db, order_id, "deliver", current_user["_id"],
+        fields={
+            "proof_of_completion": proof.model_dump(),
+            "delivered_at": now,
+            "review_deadline": now + timedelta(hours=72)
+        },
+        now=now
     )
-    
-    updated_order = await db.orders.find_one({"_id": ObjectId(order_id)})
-    updated_order["_id"] = str(updated_order["_id"])
+    await grant_readers(db, request.screenshots, [updated_order["buyer_id"]])
+    proof_verifier.submit()
+    await notify(db, updated_order["buyer_id"], "order_delivered", order_notice(updated_order))
     
     return {
         "message": "Proof submitted. Awaiting buyer approval.",
@@ -286,66 +614,44 @@ async def approve_order(
     current_user: dict = Depends(get_current_user),
     db = Depends(get_db)
 ):
-    order = await db.orders.find_one({"_id": ObjectId(order_id)})
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
-    
-    if order["buyer_id"] != current_user["_id"]:
-        raise HTTPException(status_code=403, detail="Not authorized")
-    
-    if order["status"] != OrderStatus.DELIVERED.value:
-        raise HTTPException(status_code=400, detail="Order cannot be approved")
-    
-    # Release payment to seller
-    seller = await db.users.find_one({"_id": ObjectId(order["seller_id"])})
-    seller_profile = seller.get("seller_profile", {})
-    
-    # Calculate seller earnings (base cost minus platform fee)
-    seller_earnings = order["base_cost"]
-    current_pending = seller_profile.get("pending_balance", 0)
-    new_pending = current_pending + seller_earnings
-    
-    # Update seller stats
-    total_orders = seller_profile.get("total_orders", 0) + 1
-    total_earnings = seller_profile.get("total_earnings", 0) + seller_earnings
-    
-    await db.users.update_one(
-        {"_id": ObjectId(order["seller_id"])},
-        {"$set": {
-            "seller_profile.pending_balance": new_pending,
-            "seller_profile.total_orders": total_orders,
-            "seller_profile.total_earnings": total_earnings
-        }}
+    updated_order = await transition_order(
+        db, order_id, "approve", current_user["_id"],
+        fields={"completed_at": datetime.utcnow()}
     )
     
-    # Update order
-    await db.orders.update_one(
-        {"_id": ObjectId(order_id)},
-        {"$set": {
-            "status": OrderStatus.APPROVED.value,
-            "escrow_status": EscrowStatus.RELEASED.value,
-            "completed_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow()
-        }}
+    # Release payment to seller (base cost, the platform fee is kept)
+    seller_earnings = updated_order["base_cost"]
+    seller = await db.users.find_one_and_update(
+        {"_id": ObjectId(updated_order["seller_id"])},
+        {"$inc": {
+            "seller_profile.pending_balance": seller_earnings,
+            "seller_profile.total_orders": 1,
+            "seller_profile.total_earnings": seller_earnings
+        }},
+        projection={"seller_profile.pending_balance": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    new_pending = seller["seller_profile"]["pending_balance"]
+    await record_event(db, updated_order["seller_id"], "completed")
+    await record_day(
+        db, updated_order["seller_id"],
+        earnings=seller_earnings, completed=1, service_type=updated_order["service_type"]
     )
     
     # Create transaction record for seller
     transaction_data = {
-        "user_id": order["seller_id"],
+        "user_id": updated_order["seller_id"],
         "transaction_type": TransactionType.EARNINGS_RECEIVED.value,
         "amount": seller_earnings,
-        "balance_before": current_pending,
+        "balance_before": new_pending - seller_earnings,
         "balance_after": new_pending,
         "order_id": order_id,
-        "related_user_id": order["buyer_id"],
-        "description": f"Earnings from order: {order['order_number']}",
+        "related_user_id": updated_order["buyer_id"],
+        "description": f"Earnings from order: {updated_order['order_number']}",
         "created_at": datetime.utcnow()
     }
     await db.transactions.insert_one(transaction_data)
     
-    updated_order = await db.orders.find_one({"_id": ObjectId(order_id)})
-    updated_order["_id"] = str(updated_order["_id"])
-    
     # After 48 hours, move from pending to available
     # This would be handled by a background job in production
     
@@ -361,21 +667,6 @@ async def request_revision(
     current_user: dict = Depends(get_current_user),
     db = Depends(get_db)
 ):
-    order = await db.orders.find_one({"_id": ObjectId(order_id)})
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
-    
-    if order["buyer_id"] != current_user["_id"]:
-        raise HTTPException(status_code=403, detail="Not authorized")
-    
-    if order["status"] != OrderStatus.DELIVERED.value:
-        raise HTTPException(status_code=400, detail="Order cannot be revised")
-    
-    # Check revision count
-    revision_count = order.get("revision_count", 0)
-    if revision_count >= 1:
-        raise HTTPException(status_code=400, detail="Maximum revisions exceeded")
-    
     # Create revision request
     revision = RevisionRequest(
         requested_at=datetime.utcnow(),
@@ -383,23 +674,14 @@ async def request_revision(
         instructions=request.instructions
     )
     
-    revision_requests = order.get("revision_requests", [])
-    revision_requests.append(revision.dict())
-    
-    # Update order
-    await db.orders.update_one(
-        {"_id": ObjectId(order_id)},
-        {"$set": {
-            "status": OrderStatus.REVISION_REQUESTED.value,
-            "revision_count": revision_count + 1,
-            "revision_requests": revision_requests,
-            "updated_at": datetime.utcnow()
-        }}
+    updated_order = await transition_order(
+        db, order_id, "request_revision", current_user["_id"],
+        update={
+            "$inc": {"revision_count": 1},
+            "$push": {"revision_requests": revision.model_dump()}
+        }
     )
     
-    updated_order = await db.orders.find_one({"_id": ObjectId(order_id)})
-    updated_order["_id"] = str(updated_order["_id"])
-    
     return {
         "message": "Revision requested",
         "order": updated_order
@@ -418,8 +700,7 @@ async def get_buyer_orders(
     if status:
         query["status"] = status
     
-    cursor = db.orders.find(query).sort("created_at", -1).limit(100)
-    orders = await cursor.to_list(length=100)
+    orders = await find_history(db, "orders", query, limit=100)
     
     for order in orders:
         order["_id"] = str(order["_id"])
@@ -439,8 +720,7 @@ async def get_seller_orders(
     if status:
         query["status"] = status
     
-    cursor = db.orders.find(query).sort("created_at", -1).limit(100)
-    orders = await cursor.to_list(length=100)
+    orders = await find_history(db, "orders", query, limit=100)
     
     for order in orders:
         order["_id"] = str(order["_id"])
@@ -453,7 +733,7 @@ async def get_order(
     current_user: dict = Depends(get_current_user),
     db = Depends(get_db)
 ):
-    order = await db.orders.find_one({"_id": ObjectId(order_id)})
+    order = await find_one_with_archive(db, "orders", {"_id": ObjectId(order_id)})
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
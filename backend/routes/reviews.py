@@ -6,6 +6,9 @@ import sys
 sys.path.append('/app/backend')
 from models import Review, OrderStatus
 from routes.auth import get_current_user
+from seller_stats import record_event
+from seller_dashboard import record_day
+from archival import find_one_with_archive
 from bson import ObjectId
 
 router = APIRouter(prefix="/reviews", tags=["Reviews"])
@@ -35,7 +38,7 @@ async def create_review(
     db = Depends(get_db)
 ):
     # Get order
-    order = await db.orders.find_one({"_id": ObjectId(request.order_id)})
+    order = await find_one_with_archive(db, "orders", {"_id": ObjectId(request.order_id)})
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
@@ -73,30 +76,10 @@ async def create_review(
     result = await db.reviews.insert_one(review_data)
     review_data["_id"] = str(result.inserted_id)
     
-    # Update reviewee's average rating
-    pipeline = [
-        {"$match": {"reviewee_id": reviewee_id}},
-        {"$group": {
-            "_id": None,
-            "avg_rating": {"$avg": "$overall_rating"},
-            "count": {"$sum": 1}
-        }}
-    ]
-    
-    result_agg = await db.reviews.aggregate(pipeline).to_list(1)
-    
-    if result_agg:
-        avg_rating = result_agg[0]["avg_rating"]
-        review_count = result_agg[0]["count"]
-        
-        # Update user's rating
-        reviewee = await db.users.find_one({"_id": ObjectId(reviewee_id)})
-        if reviewee:
-            if reviewee["role"] in ["seller", "both"]:
-                await db.users.update_one(
-                    {"_id": ObjectId(reviewee_id)},
-                    {"$set": {"seller_profile.average_rating": round(avg_rating, 2)}}
-                )
+    # Update the seller's running rating, reputation and tier
+    if reviewer_role == "buyer":
+        await record_event(db, reviewee_id, "reviewed", request.overall_rating)
+        await record_day(db, reviewee_id, rating=request.overall_rating)
     
     return {
         "message": "Review submitted successfully",
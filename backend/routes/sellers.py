@@ -0,0 +1,26 @@
+from fastapi import APIRouter, HTTPException, Depends
+from datetime import datetime
+from typing import Optional
+import sys
+sys.path.append('/app/backend')
+from routes.auth import get_current_user
+from seller_dashboard import get_dashboard
+
+router = APIRouter(prefix="/sellers", tags=["Sellers"])
+
+def get_db():
+    from server import db
+    return db
+
+@router.get("/me/dashboard")
+async def get_my_dashboard(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    if current_user["role"] not in ["seller", "both"]:
+        raise HTTPException(status_code=403, detail="Only sellers have a dashboard")
+    
+    # Defaults to the last 30 days; any range reads one bucket per day
+    return await get_dashboard(db, current_user["_id"], start, end)
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
 from pydantic import BaseModel
 from datetime import datetime
 from typing import Optional, List
@@ -6,6 +6,8 @@ import sys
 sys.path.append('/app/backend')
 from models import ServiceListing, ServiceType, ServiceAddon
 from routes.auth import get_current_user
+from rate_limit import limiter
+from seller_cards import get_seller_cards, get_seller_card
 from bson import ObjectId
 import math
 
@@ -77,6 +79,8 @@ async def create_service(
 
 @router.get("/search")
 async def search_services(
+    http_request: Request,
+    response: Response,
     platform: Optional[str] = Query(None),
     min_price: Optional[float] = Query(None),
     max_price: Optional[float] = Query(None),
@@ -88,6 +92,8 @@ async def search_services(
     limit: int = Query(20, ge=1, le=100),
     db = Depends(get_db)
 ):
+    await limiter.hit("services.search", http_request, response)
+    
     # Build query
     query = {"active": True}
     
@@ -130,16 +136,13 @@ async def search_services(
     cursor = db.service_listings.find(query).sort(sort_by).skip(skip).limit(limit)
     services = await cursor.to_list(length=limit)
     
-    # Get seller info for each service
+    # Get seller cards for the whole page in one read
+    cards = await get_seller_cards(db, [service["seller_id"] for service in services])
     for service in services:
         service["_id"] = str(service["_id"])
-        seller = await db.users.find_one({"_id": ObjectId(service["seller_id"])})
-        if seller:
-            service["seller"] = {
-                "full_name": seller.get("full_name"),
-                "profile_picture": seller.get("profile_picture"),
-                "seller_profile": seller.get("seller_profile", {})
-            }
+        card = cards.get(service["seller_id"])
+        if card:
+            service["seller"] = card
     
     total_pages = math.ceil(total / limit)
     
@@ -159,18 +162,12 @@ async def get_service(service_id: str, db = Depends(get_db)):
     
     service["_id"] = str(service["_id"])
     
-    # Get seller info
-    seller = await db.users.find_one({"_id": ObjectId(service["seller_id"])})
-    if seller:
-        seller["_id"] = str(seller["_id"])
-        seller.pop("password_hash", None)
-        service["seller"] = seller
-    
-    # Get reviews for this seller
-    reviews_cursor = db.reviews.find({"reviewee_id": service["seller_id"]})
-    reviews = await reviews_cursor.to_list(length=10)
-    for review in reviews:
-        review["_id"] = str(review["_id"])
+    # Get seller card, which carries the most recent reviews
+    reviews = []
+    card = await get_seller_card(db, service["seller_id"])
+    if card:
+        reviews = card.pop("top_reviews", [])
+        service["seller"] = card
     
     return {
         "service": service,
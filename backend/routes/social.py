@@ -0,0 +1,78 @@
+from fastapi import APIRouter, HTTPException, Depends
+from pydantic import BaseModel
+from typing import Optional
+import sys
+sys.path.append('/app/backend')
+from models import Platform
+from routes.auth import get_current_user
+from social_accounts import (
+    connect_account, consume_oauth_state, get_account_summary, list_account_summaries, reverify_account,
+    PLATFORM_NAMES
+)
+from social_providers import PROVIDERS
+
+router = APIRouter(prefix="/social", tags=["Social Accounts"])
+
+def get_db():
+    from server import db
+    return db
+
+class ConnectAccountRequest(BaseModel):
+    code: Optional[str] = None
+    state: Optional[str] = None
+
+@router.get("/platforms")
+async def get_platforms():
+    return {
+        "platforms": [
+            {
+                "platform": platform,
+                "name": PLATFORM_NAMES[platform],
+                "verification_method": provider.verification_method
+            }
+            for platform, provider in PROVIDERS.items()
+        ]
+    }
+
+@router.post("/{platform}/connect")
+async def connect_social_account(
+    platform: Platform,
+    request: ConnectAccountRequest,
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    if PROVIDERS[platform.value].verification_method == "oauth":
+        await consume_oauth_state(db, current_user["_id"], platform.value, request.state)
+    social_account = await connect_account(db, current_user["_id"], platform.value, request.code)
+    
+    return {
+        "message": f"{PLATFORM_NAMES[platform.value]} account linked successfully",
+        "social_account": social_account
+    }
+
+@router.get("/my-accounts")
+async def get_my_social_accounts(current_user: dict = Depends(get_current_user), db = Depends(get_db)):
+    accounts = await list_account_summaries(db, current_user["_id"])
+    return {"accounts": accounts}
+
+@router.get("/{platform}/metrics/{user_id}")
+async def get_social_metrics(platform: Platform, user_id: str, db = Depends(get_db)):
+    social_account = await get_account_summary(db, user_id, platform.value)
+    
+    if not social_account:
+        raise HTTPException(status_code=404, detail=f"{PLATFORM_NAMES[platform.value]} account not connected")
+    
+    return social_account
+
+@router.post("/{platform}/reverify")
+async def reverify_social_account(
+    platform: Platform,
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    update = await reverify_account(db, current_user["_id"], platform.value)
+    
+    return {
+        "message": "Re-verification completed",
+        "authenticity_score": update["authenticity_score"]
+    }
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Header, Response
 from pydantic import BaseModel
 from datetime import datetime
 from typing import Optional
@@ -7,6 +7,8 @@ import random
 sys.path.append('/app/backend')
 from models import Transaction, TransactionType
 from routes.auth import get_current_user
+from idempotency import run_idempotent
+from archival import find_history
 from bson import ObjectId
 
 router = APIRouter(prefix="/wallet", tags=["Wallet"])
@@ -26,9 +28,18 @@ class WithdrawRequest(BaseModel):
 @router.post("/purchase-credits")
 async def purchase_credits(
     request: PurchaseCreditsRequest,
+    response: Response,
     current_user: dict = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None),
     db = Depends(get_db)
 ):
+    return await run_idempotent(
+        db, current_user["_id"], idempotency_key, "wallet.purchase_credits", request.model_dump(),
+        lambda: _purchase_credits(request, current_user, db),
+        response=response
+    )
+
+async def _purchase_credits(request: PurchaseCreditsRequest, current_user: dict, db):
     if current_user["role"] not in ["buyer", "both"]:
         raise HTTPException(status_code=403, detail="Only buyers can purchase credits")
     
@@ -123,8 +134,7 @@ async def get_transactions(
     current_user: dict = Depends(get_current_user),
     db = Depends(get_db)
 ):
-    cursor = db.transactions.find({"user_id": current_user["_id"]}).sort("created_at", -1).limit(100)
-    transactions = await cursor.to_list(length=100)
+    transactions = await find_history(db, "transactions", {"user_id": current_user["_id"]}, limit=100)
     
     for transaction in transactions:
         transaction["_id"] = str(transaction["_id"])
@@ -134,9 +144,18 @@ async def get_transactions(
 @router.post("/withdraw")
 async def withdraw(
     request: WithdrawRequest,
+    response: Response,
     current_user: dict = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None),
     db = Depends(get_db)
 ):
+    return await run_idempotent(
+        db, current_user["_id"], idempotency_key, "wallet.withdraw", request.model_dump(),
+        lambda: _withdraw(request, current_user, db),
+        response=response
+    )
+
+async def _withdraw(request: WithdrawRequest, current_user: dict, db):
     if current_user["role"] not in ["seller", "both"]:
         raise HTTPException(status_code=403, detail="Only sellers can withdraw")
     
@@ -0,0 +1,119 @@
+import asyncio
+from datetime import datetime
+from bson import ObjectId
+
+TOP_REVIEWS = 10
+
+# Seller card embedded in listing rows, without the reviews
+CARD_LIST_PROJECTION = {"top_reviews": 0}
+
+REVIEW_FIELDS = {
+    "order_id": 1,
+    "reviewer_role": 1,
+    "overall_rating": 1,
+    "review_text": 1,
+    "would_work_again": 1,
+    "response_text": 1,
+    "created_at": 1
+}
+
+
+async def ensure_indexes(db):
+    await db.reviews.create_index([("reviewee_id", 1), ("created_at", -1)])
+
+
+async def refresh_seller_card(db, seller_id: str):
+    """
+    Rebuild the denormalized seller card from users, social_accounts,
+    seller_stats and the latest reviews; every read is a point or index
+    lookup. Ratings come from the seller_stats counters, so the card agrees
+    with the seller profile and counts buyer reviews only.
+
+    Called by every write that changes a field shown on the card. A seller
+    whose counters are not seeded from history yet gets a card from what is
+    on hand, and is queued for seeding, which refreshes the card again.
+    """
+    seller = await db.users.find_one(
+        {"_id": ObjectId(seller_id)},
+        {"full_name": 1, "profile_picture": 1, "seller_profile": 1}
+    )
+    if not seller or not seller.get("seller_profile"):
+        return None
+
+    # seller_stats imports this module to refresh cards after each event
+    from seller_stats import STATS_SEED_VERSION, stats_seeder
+
+    accounts, stats, top_reviews = await asyncio.gather(
+        db.social_accounts.find({"user_id": seller_id}, {"authenticity_score": 1}).to_list(length=None),
+        db.seller_stats.find_one(
+            {"_id": seller_id}, {"rating_count": 1, "rating_total": 1, "rating_stars": 1, "seed_version": 1}
+        ),
+        db.reviews.find(
+            {"reviewee_id": seller_id, "reviewer_role": "buyer", "is_public": {"$ne": False}}, REVIEW_FIELDS
+        ).sort("created_at", -1).to_list(length=TOP_REVIEWS)
+    )
+    stats = stats or {}
+    if stats.get("seed_version", 0) < STATS_SEED_VERSION:
+        # Counting history is too slow for a read path
+        stats_seeder.queue(seller_id)
+
+    for review in top_reviews:
+        review["_id"] = str(review["_id"])
+
+    review_count = stats.get("rating_count", 0)
+    rating_stars = stats.get("rating_stars", {})
+    rating_breakdown = {f"{star}_star": rating_stars.get(str(star), 0) for star in range(5, 0, -1)}
+
+    seller_profile = seller["seller_profile"]
+    card = {
+        "full_name": seller.get("full_name"),
+        "profile_picture": seller.get("profile_picture"),
+        "seller_profile": {
+            "tier": seller_profile.get("tier", "new"),
+            "reputation_score": seller_profile.get("reputation_score", 0.0),
+            "average_rating": round(stats.get("rating_total", 0) / review_count, 2) if review_count
+            else seller_profile.get("average_rating", 0.0),
+            "review_count": review_count,
+            "total_orders": seller_profile.get("total_orders", 0),
+            "completion_rate": seller_profile.get("completion_rate", 0.0),
+            "response_time": seller_profile.get("response_time", 0.0)
+        },
+        "rating_breakdown": rating_breakdown,
+        "authenticity_score": max((account.get("authenticity_score", 0) for account in accounts), default=0.0),
+        "top_reviews": top_reviews,
+        "updated_at": datetime.utcnow()
+    }
+
+    await db.seller_cards.replace_one({"_id": seller_id}, card, upsert=True)
+    card["_id"] = seller_id
+    return card
+
+
+async def refresh_seller_cards(db, seller_ids):
+    await asyncio.gather(*(refresh_seller_card(db, seller_id) for seller_id in set(seller_ids)))
+
+
+async def get_seller_cards(db, seller_ids, include_reviews: bool = False) -> dict:
+    """
+    Fetch cards for many sellers with one $in read on _id, building any that are missing
+    """
+    seller_ids = list(set(seller_ids))
+    projection = None if include_reviews else CARD_LIST_PROJECTION
+    cards = await db.seller_cards.find({"_id": {"$in": seller_ids}}, projection).to_list(length=len(seller_ids))
+    cards_by_id = {card["_id"]: card for card in cards}
+
+    missing = [seller_id for seller_id in seller_ids if seller_id not in cards_by_id]
+    if missing:
+        built = await asyncio.gather(*(refresh_seller_card(db, seller_id) for seller_id in missing))
+        for seller_id, card in zip(missing, built):
+            if card is not None:
+                if not include_reviews:
+                    card.pop("top_reviews", None)
+                cards_by_id[seller_id] = card
+
+    return cards_by_id
+
+
+async def get_seller_card(db, seller_id: str, include_reviews: bool = True):
+    cards = await get_seller_cards(db, [seller_id], include_reviews=include_reviews)
+    return cards.get(seller_id)
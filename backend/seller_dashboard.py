@@ -0,0 +1,222 @@
+import os
+from datetime import datetime, timedelta, timezone
+from fastapi import HTTPException
+from pymongo import UpdateOne
+from archival import iter_with_archive
+
+DASHBOARD_MAX_DAYS = int(os.getenv("DASHBOARD_MAX_DAYS", "366"))
+DASHBOARD_DEFAULT_DAYS = 30
+
+
+# Sellers whose buckets are known to be seeded from history, to skip the check on later reads
+_seeded = set()
+
+
+async def ensure_indexes(db):
+    await db.seller_daily.create_index([("seller_id", 1), ("day", 1)], unique=True)
+
+
+def day_of(moment: datetime) -> datetime:
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _delta(earnings: float = 0, completed: int = 0, refunded: int = 0,
+           service_type: str = None, rating: float = None) -> dict:
+    incs = {}
+    if earnings:
+        incs["earnings"] = earnings
+    if completed:
+        incs["completed_orders"] = completed
+    if refunded:
+        incs["refunded_orders"] = refunded
+    if service_type and (earnings or completed):
+        incs[f"service_types.{service_type}.orders"] = completed
+        incs[f"service_types.{service_type}.earnings"] = earnings
+    if rating is not None:
+        incs["rating_count"] = 1
+        incs["rating_total"] = rating
+    return incs
+
+
+async def record_day(db, seller_id: str, now: datetime = None, **delta):
+    """
+    Add to the seller's bucket for today: earnings credited, orders completed
+    or refunded (with the service type they count under) or a buyer rating
+    """
+    incs = _delta(**delta)
+    if not incs:
+        return
+    now = now or datetime.utcnow()
+    await db.seller_daily.update_one(
+        {"seller_id": seller_id, "day": day_of(now)},
+        {"$inc": incs, "$set": {"updated_at": now}},
+        upsert=True
+    )
+
+
+def naive_utc(moment: datetime) -> datetime:
+    # Buckets are keyed on naive UTC days, as stored by utcnow()
+    if moment is None or moment.tzinfo is None:
+        return moment
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _days(start: datetime, end: datetime) -> list:
+    return [start + timedelta(days=offset) for offset in range((end - start).days)]
+
+
+async def _ensure_seeded(db, seller_id: str):
+    """
+    Buckets only exist from the day record_day started writing them; the
+    first read for a seller without a seed marker rebuilds them from history
+    """
+    if seller_id in _seeded:
+        return
+    if not await db.seller_daily_state.find_one({"_id": seller_id}, {"_id": 1}):
+        await rebuild_seller_daily(db, seller_id)
+    _seeded.add(seller_id)
+
+
+async def get_dashboard(db, seller_id: str, start: datetime = None, end: datetime = None) -> dict:
+    """
+    Earnings over time, orders by service type and rating trend for
+    [start, end), read from one bucket per day with activity
+    """
+    start, end = naive_utc(start), naive_utc(end)
+    end = day_of(end or datetime.utcnow()) + timedelta(days=1)
+    start = day_of(start) if start else end - timedelta(days=DASHBOARD_DEFAULT_DAYS)
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    if (end - start).days > DASHBOARD_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range cannot exceed {DASHBOARD_MAX_DAYS} days")
+    await _ensure_seeded(db, seller_id)
+
+    buckets = {}
+    cursor = db.seller_daily.find(
+        {"seller_id": seller_id, "day": {"$gte": start, "$lt": end}},
+        {"_id": 0, "seller_id": 0, "updated_at": 0}
+    )
+    async for bucket in cursor:
+        buckets[bucket["day"]] = bucket
+
+    totals = {"earnings": 0.0, "completed_orders": 0, "refunded_orders": 0, "rating_count": 0, "rating_total": 0.0}
+    service_types = {}
+    earnings = []
+    ratings = []
+    for day in _days(start, end):
+        bucket = buckets.get(day, {})
+        for field in totals:
+            totals[field] += bucket.get(field, 0)
+        for service_type, counts in bucket.get("service_types", {}).items():
+            entry = service_types.setdefault(service_type, {"orders": 0, "earnings": 0.0})
+            entry["orders"] += counts.get("orders", 0)
+            entry["earnings"] += counts.get("earnings", 0)
+
+        earnings.append({
+            "day": day,
+            "earnings": round(bucket.get("earnings", 0), 2),
+            "completed_orders": bucket.get("completed_orders", 0),
+            "refunded_orders": bucket.get("refunded_orders", 0)
+        })
+        rating_count = bucket.get("rating_count", 0)
+        ratings.append({
+            "day": day,
+            "rating_count": rating_count,
+            "average_rating": round(bucket["rating_total"] / rating_count, 2) if rating_count else None,
+            # Running average over the range so far, to smooth out days with few reviews
+            "cumulative_average": round(totals["rating_total"] / totals["rating_count"], 2)
+            if totals["rating_count"] else None
+        })
+
+    return {
+        "start": start,
+        "end": end,
+        "totals": {
+            "earnings": round(totals["earnings"], 2),
+            "completed_orders": totals["completed_orders"],
+            "refunded_orders": totals["refunded_orders"],
+            "rating_count": totals["rating_count"],
+            "average_rating": round(totals["rating_total"] / totals["rating_count"], 2)
+            if totals["rating_count"] else None
+        },
+        "earnings": earnings,
+        "orders_by_service_type": sorted(
+            (
+                {"service_type": service_type, "orders": entry["orders"], "earnings": round(entry["earnings"], 2)}
+                for service_type, entry in service_types.items()
+            ),
+            key=lambda entry: -entry["orders"]
+        ),
+        "rating_trend": ratings
+    }
+
+
+def resolution_delta(order: dict, full_refund: bool) -> dict:
+    """
+    What a dispute resolution books, as execute_resolution does live: the
+    seller's new share less whatever approval had already credited
+    """
+    credited = order["base_cost"] if order.get("completed_at") else 0.0
+    if order.get("seller_credited") is not None:
+        seller_amount = order["seller_credited"]
+    elif full_refund:
+        seller_amount = 0.0
+    else:
+        seller_amount = max(order["base_cost"] - (order.get("refund_amount") or 0), 0.0)
+    return {
+        "earnings": seller_amount - credited,
+        "completed": (1 if seller_amount and not credited else 0) - (1 if credited and not seller_amount else 0),
+        "refunded": 1 if full_refund else 0,
+        "service_type": order.get("service_type")
+    }
+
+
+async def rebuild_seller_daily(db, seller_id: str, now: datetime = None):
+    """
+    Rebuild a seller's buckets from orders (archived ones included), resolved
+    disputes and reviews, booking each the way the live path does: the base
+    cost on the approval day, then any dispute resolution's correction on the
+    day it was resolved.
+    """
+    now = now or datetime.utcnow()
+    buckets = {}
+
+    def add(moment, **delta):
+        bucket = buckets.setdefault(day_of(moment), {})
+        for field, value in _delta(**delta).items():
+            bucket[field] = bucket.get(field, 0) + value
+
+    orders = {}
+    cursor = iter_with_archive(
+        db, "orders", {"seller_id": seller_id},
+        {"service_type": 1, "base_cost": 1, "refund_amount": 1, "seller_credited": 1, "completed_at": 1}
+    )
+    async for order in cursor:
+        orders[str(order["_id"])] = order
+        if order.get("completed_at"):
+            add(order["completed_at"], earnings=order["base_cost"], completed=1, service_type=order.get("service_type"))
+
+    if orders:
+        # Imported here as dispute_resolution books resolutions through this module
+        from dispute_resolution import REFUND_RESOLUTIONS
+        disputes = db.disputes.find(
+            {"order_id": {"$in": list(orders)}, "resolved_at": {"$ne": None}},
+            {"order_id": 1, "resolution_type": 1, "resolved_at": 1}
+        )
+        async for dispute in disputes:
+            full_refund = dispute.get("resolution_type") in REFUND_RESOLUTIONS
+            add(dispute["resolved_at"], **resolution_delta(orders[dispute["order_id"]], full_refund))
+
+    reviews = db.reviews.find({"reviewee_id": seller_id, "reviewer_role": "buyer"}, {"overall_rating": 1, "created_at": 1})
+    async for review in reviews:
+        add(review["created_at"], rating=review["overall_rating"])
+
+    await db.seller_daily.delete_many({"seller_id": seller_id})
+    if buckets:
+        await db.seller_daily.bulk_write([
+            UpdateOne({"seller_id": seller_id, "day": day}, {"$set": {**fields, "updated_at": now}}, upsert=True)
+            for day, fields in buckets.items()
+        ], ordered=False)
+    await db.seller_daily_state.update_one({"_id": seller_id}, {"$set": {"seeded_at": now}}, upsert=True)
+    _seeded.add(seller_id)
+    return len(buckets)
@@ -0,0 +1,317 @@
+import asyncio
+import logging
+from datetime import datetime
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from models import OrderStatus
+from seller_cards import refresh_seller_card
+from archival import iter_with_archive
+from utils import calculate_reputation_score, calculate_seller_tier
+from worker_leases import WorkerLease
+
+logger = logging.getLogger(__name__)
+
+ACTIVITY_DAYS = 30
+
+# Sellers whose stats document is known to be seeded, to skip the check on later events
+_seeded = set()
+# Bumped whenever the rebuild counts something new, so older documents are reseeded on their next event
+STATS_SEED_VERSION = 2
+
+# Counter each order/dispute event bumps in seller_stats
+EVENT_COUNTERS = {
+    "accepted": "accepted",
+    "declined": "declined",
+    "completed": "completed",
+    "uncompleted": "completed",
+    "expired": "failed",
+    "refunded": "failed",
+    "late": "late",
+    "disputed": "disputes",
+    "reviewed": "rating_count",
+}
+
+
+def _epoch_day(now: datetime) -> int:
+    return (now - datetime(1970, 1, 1)).days
+
+
+def rating_star(rating: float) -> int:
+    """
+    Star bucket a rating is counted under in the breakdown
+    """
+    return min(max(int(rating), 1), 5)
+
+
+def _build_delta(events: list) -> tuple:
+    """
+    Fold (event, value) pairs into $inc counters plus the number of
+    completions to add to today's activity bucket. `value` is the response
+    time in hours for accepted/declined and the rating for reviewed.
+    """
+    incs = {}
+    activity = 0
+    for event, value in events:
+        counter = EVENT_COUNTERS[event]
+        incs[counter] = incs.get(counter, 0) + (-1 if event == "uncompleted" else 1)
+        if event in ("accepted", "declined") and value is not None:
+            incs["responses"] = incs.get("responses", 0) + 1
+            incs["response_hours_total"] = incs.get("response_hours_total", 0) + value
+        elif event == "reviewed":
+            incs["rating_total"] = incs.get("rating_total", 0) + value
+            star = f"rating_stars.{rating_star(value)}"
+            incs[star] = incs.get(star, 0) + 1
+        elif event == "completed":
+            activity += 1
+    incs["version"] = 1
+    return incs, activity
+
+
+def derive_profile_stats(stats: dict, day: int) -> dict:
+    """
+    Seller profile fields computed from the running counters. Constant work:
+    a handful of ratios plus a walk over the 30 activity slots.
+    """
+    completed = stats.get("completed", 0)
+    finished = completed + stats.get("failed", 0)
+    responses = stats.get("responses", 0)
+    accepted = stats.get("accepted", 0)
+    rating_count = stats.get("rating_count", 0)
+
+    profile = {
+        "completion_rate": round(completed / finished * 100, 2) if finished else 0.0,
+        "response_time": round(stats.get("response_hours_total", 0) / responses, 2) if responses else 0.0,
+        "orders_last_30_days": sum(
+            bucket["count"] for bucket in stats.get("activity", {}).values()
+            if day - bucket["day"] < ACTIVITY_DAYS
+        ),
+        "dispute_rate": round(stats.get("disputes", 0) / accepted, 4) if accepted else 0.0,
+        "average_rating": round(stats.get("rating_total", 0) / rating_count, 2) if rating_count else 0.0,
+        "late_orders": stats.get("late", 0),
+    }
+    profile["reputation_score"] = calculate_reputation_score({
+        **profile, "response_time_hours": profile["response_time"] if responses else 24
+    })
+    profile["tier"] = calculate_seller_tier({**profile, "total_orders": completed})
+    return profile
+
+
+async def _apply(db, seller_id: str, incs: dict, activity: int, day: int) -> dict:
+    if not activity:
+        return await db.seller_stats.find_one_and_update(
+            {"_id": seller_id}, {"$inc": incs}, upsert=True, return_document=ReturnDocument.AFTER
+        )
+
+    # Ring of daily buckets: a slot is reused once its day falls out of the window
+    slot = str(day % ACTIVITY_DAYS)
+    while True:
+        stats = await db.seller_stats.find_one_and_update(
+            {"_id": seller_id, f"activity.{slot}.day": day},
+            {"$inc": {**incs, f"activity.{slot}.count": activity}},
+            return_document=ReturnDocument.AFTER
+        )
+        if stats:
+            return stats
+        try:
+            return await db.seller_stats.find_one_and_update(
+                {"_id": seller_id, f"activity.{slot}.day": {"$ne": day}},
+                {"$inc": incs, "$set": {f"activity.{slot}": {"day": day, "count": activity}}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Another writer opened today's bucket first; add to it instead
+            continue
+
+
+async def _is_seeded(db, seller_id: str) -> bool:
+    """
+    Whether the seller's counters were seeded from their history. Counters
+    that started from zero would overwrite an established seller's rating
+    and tier with a partial tally.
+    """
+    if seller_id in _seeded:
+        return True
+    if await db.seller_stats.find_one({"_id": seller_id, "seed_version": {"$gte": STATS_SEED_VERSION}}, {"_id": 1}):
+        _seeded.add(seller_id)
+        return True
+    return False
+
+
+async def record_events(db, events: list, now: datetime = None):
+    """
+    Apply (seller_id, event, value) events: one counter update per seller,
+    then an O(1) recompute of the derived profile fields, reputation and tier
+    """
+    now = now or datetime.utcnow()
+    day = _epoch_day(now)
+
+    per_seller = {}
+    for seller_id, event, value in events:
+        per_seller.setdefault(seller_id, []).append((event, value))
+
+    for seller_id, seller_events in per_seller.items():
+        if not await _is_seeded(db, seller_id):
+            # No counters from history yet: recount, which already includes these events
+            await rebuild_seller_stats(db, seller_id, now=now)
+            continue
+
+        incs, activity = _build_delta(seller_events)
+        stats = await _apply(db, seller_id, incs, activity, day)
+        profile = derive_profile_stats(stats, day)
+
+        # Versioned so a slower writer cannot overwrite newer numbers
+        await db.users.update_one(
+            {"_id": ObjectId(seller_id), "seller_profile.stats_version": {"$not": {"$gte": stats["version"]}}},
+            {"$set": {
+                **{f"seller_profile.{field}": value for field, value in profile.items()},
+                "seller_profile.stats_version": stats["version"]
+            }}
+        )
+        await refresh_seller_card(db, seller_id)
+
+
+async def record_event(db, seller_id: str, event: str, value: float = None, now: datetime = None):
+    await record_events(db, [(seller_id, event, value)], now=now)
+
+
+def response_hours(order: dict, now: datetime):
+    """
+    Hours from order creation to the seller's accept or decline
+    """
+    if not order.get("created_at"):
+        return None
+    return (now - order["created_at"]).total_seconds() / 3600
+
+
+async def rebuild_seller_stats(db, seller_id: str, now: datetime = None) -> dict:
+    """
+    Recount a seller's counters from orders, disputes and reviews. Runs once
+    per seller, on their first event, so history from before the event
+    stream is counted; later updates never rescan.
+    """
+    now = now or datetime.utcnow()
+    day = _epoch_day(now)
+    stats = {"activity": {}}
+
+    def bump(field, amount=1):
+        stats[field] = stats.get(field, 0) + amount
+
+    orders = iter_with_archive(db, "orders", {"seller_id": seller_id}, {
+        "status": 1, "created_at": 1, "accepted_at": 1, "completed_at": 1, "late_at": 1, "updated_at": 1
+    })
+    async for order in orders:
+        if order["status"] == OrderStatus.CANCELLED.value and not order.get("accepted_at"):
+            # Declined before acceptance; the decline was its last update
+            bump("declined")
+            hours = response_hours(order, order.get("updated_at") or now)
+            if hours is not None:
+                bump("responses")
+                bump("response_hours_total", hours)
+        if order.get("accepted_at"):
+            bump("accepted")
+            hours = response_hours(order, order["accepted_at"])
+            if hours is not None:
+                bump("responses")
+                bump("response_hours_total", hours)
+        if order.get("late_at"):
+            bump("late")
+        if order["status"] in (OrderStatus.APPROVED.value, OrderStatus.COMPLETED.value):
+            bump("completed")
+            completed_day = _epoch_day(order.get("completed_at") or now)
+            if day - completed_day < ACTIVITY_DAYS:
+                slot = str(completed_day % ACTIVITY_DAYS)
+                bucket = stats["activity"].setdefault(slot, {"day": completed_day, "count": 0})
+                bucket["count"] += 1
+        elif order["status"] == OrderStatus.REFUNDED.value or \
+                (order["status"] == OrderStatus.CANCELLED.value and order.get("late_at")):
+            bump("failed")
+
+    stats["disputes"] = await db.disputes.count_documents(
+        {"$or": [{"initiator_id": seller_id}, {"respondent_id": seller_id}]}
+    )
+
+    stats["rating_stars"] = {}
+    reviews = db.reviews.find({"reviewee_id": seller_id, "reviewer_role": "buyer"}, {"overall_rating": 1})
+    async for review in reviews:
+        bump("rating_count")
+        bump("rating_total", review["overall_rating"])
+        star = str(rating_star(review["overall_rating"]))
+        stats["rating_stars"][star] = stats["rating_stars"].get(star, 0) + 1
+
+    existing = await db.seller_stats.find_one({"_id": seller_id}, {"version": 1})
+    stats["version"] = (existing or {}).get("version", 0) + 1
+    stats["seeded_at"] = now
+    stats["seed_version"] = STATS_SEED_VERSION
+    await db.seller_stats.replace_one({"_id": seller_id}, stats, upsert=True)
+
+    profile = derive_profile_stats(stats, day)
+    await db.users.update_one(
+        {"_id": ObjectId(seller_id)},
+        {"$set": {
+            **{f"seller_profile.{field}": value for field, value in profile.items()},
+            "seller_profile.stats_version": stats["version"]
+        }}
+    )
+    await refresh_seller_card(db, seller_id)
+    _seeded.add(seller_id)
+    return profile
+
+
+class StatsSeeder:
+    """
+    Seeds seller_stats from history off the request path, which also
+    refreshes each seller's card: every unseeded seller once at startup,
+    then sellers whose cards were read before their counters existed
+    """
+
+    def __init__(self):
+        self.lease = WorkerLease("stats_seeder")
+        self._queued = set()
+        self._wakeup = asyncio.Event()
+
+    def queue(self, seller_id: str):
+        if seller_id not in _seeded:
+            self._queued.add(seller_id)
+            self._wakeup.set()
+
+    async def _seed(self, db, seller_id: str) -> bool:
+        if await _is_seeded(db, seller_id):
+            return False
+        await rebuild_seller_stats(db, seller_id)
+        return True
+
+    async def backfill(self, db) -> int:
+        seeded = 0
+        async for seller in db.users.find({"seller_profile": {"$ne": None}}, {"_id": 1}):
+            if await self._seed(db, str(seller["_id"])):
+                seeded += 1
+        return seeded
+
+    async def seed_queued(self, db) -> int:
+        queued, self._queued = self._queued, set()
+        seeded = 0
+        for seller_id in queued:
+            try:
+                if await self._seed(db, seller_id):
+                    seeded += 1
+            except Exception as e:
+                logger.error(f"Failed to seed stats for seller {seller_id}: {e}")
+        return seeded
+
+    async def run(self, db):
+        try:
+            # One process walks every seller; reads queue sellers on each process
+            seeded = await self.lease.run_exclusive(db, lambda: self.backfill(db))
+            if seeded:
+                logger.info(f"Seeded stats for {seeded} sellers")
+        except Exception as e:
+            logger.error(f"Seller stats backfill failed: {e}")
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            await self.seed_queued(db)
+
+
+stats_seeder = StatsSeeder()
@@ -1,14 +1,50 @@
-from fastapi import FastAPI, APIRouter
+from fastapi import FastAPI, APIRouter, Depends
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import asyncio
 import logging
 from pathlib import Path
 
+# Load .env before importing modules that read their settings at import time
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+from compression import CompressionMiddleware
+from blob_store import UploadSizeLimitMiddleware
+from metrics import registry
+import idempotency
+import rate_limit
+import otp_store
+from activity import last_active_buffer
+import refresh_tokens
+from refresh_tokens import revocation_list
+import reverification
+from reverification import reverification_worker
+from social_providers import close_providers
+import social_accounts
+import seller_cards
+from seller_stats import stats_seeder
+import deadline_monitor
+import dispute_queue
+from dispute_queue import dispute_queue_monitor
+import dispute_resolution
+from dispute_resolution import dispute_sweeper
+from deadline_monitor import deadline_monitor as order_deadline_monitor
+import proof_verification
+from proof_verification import proof_verifier
+from proof_fetchers import close_fetcher
+from phash_index import phash_index
+import notifications
+from notifications import notifier
+from notification_transports import close_transports
+import analytics_rollups
+from analytics_rollups import analytics_rollup
+import seller_dashboard
+import archival
+from archival import archiver
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
@@ -21,7 +57,7 @@ app = FastAPI(title="Warm Connects API", version="1.0.0")
 api_router = APIRouter(prefix="/api")
 
 # Import route modules
-from routes import auth, linkedin, services, wallet, orders, reviews, disputes
+from routes import auth, linkedin, social, services, wallet, orders, reviews, disputes, blobs, admin, sellers
 
 # Root endpoint
 @api_router.get("/")
@@ -37,18 +73,33 @@ async def root():
 async def health_check():
     return {"status": "healthy", "database": "connected"}
 
+# Metrics snapshot
+@api_router.get("/metrics")
+async def get_metrics(current_user: dict = Depends(auth.get_current_admin)):
+    return registry.snapshot()
+
 # Include all routers
 api_router.include_router(auth.router)
 api_router.include_router(linkedin.router)
+api_router.include_router(social.router)
 api_router.include_router(services.router)
 api_router.include_router(wallet.router)
 api_router.include_router(orders.router)
 api_router.include_router(reviews.router)
 api_router.include_router(disputes.router)
+api_router.include_router(blobs.router)
+api_router.include_router(admin.router)
+api_router.include_router(sellers.router)
 
 # Include the router in the main app
 app.include_router(api_router)
 
+# Response compression and payload-size metrics
+app.add_middleware(CompressionMiddleware)
+
+# Blob upload size cap, enforced before the body is parsed
+app.add_middleware(UploadSizeLimitMiddleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -65,12 +116,54 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Long-running background workers started with the app
+background_tasks = []
+
 @app.on_event("startup")
 async def startup_event():
+    await db.users.create_index("email", unique=True)
+    await idempotency.ensure_indexes(db)
+    await rate_limit.ensure_indexes(db)
+    await otp_store.ensure_indexes(db)
+    await refresh_tokens.ensure_indexes(db)
+    await revocation_list.load(db)
+    await reverification.ensure_indexes(db)
+    await social_accounts.ensure_indexes(db)
+    await seller_cards.ensure_indexes(db)
+    await deadline_monitor.ensure_indexes(db)
+    await dispute_queue.ensure_indexes(db)
+    await dispute_resolution.ensure_indexes(db)
+    await proof_verification.ensure_indexes(db)
+    await notifications.ensure_indexes(db)
+    await analytics_rollups.ensure_indexes(db)
+    await seller_dashboard.ensure_indexes(db)
+    await archival.ensure_indexes(db)
+    
+    background_tasks.append(asyncio.create_task(last_active_buffer.run(db)))
+    background_tasks.append(asyncio.create_task(revocation_list.run(db)))
+    background_tasks.append(asyncio.create_task(reverification_worker.run(db)))
+    background_tasks.append(asyncio.create_task(order_deadline_monitor.run(db)))
+    background_tasks.append(asyncio.create_task(dispute_queue_monitor.run(db)))
+    background_tasks.append(asyncio.create_task(dispute_sweeper.run(db)))
+    background_tasks.append(asyncio.create_task(phash_index.run(db)))
+    background_tasks.append(asyncio.create_task(proof_verifier.run(db)))
+    background_tasks.append(asyncio.create_task(notifier.run(db)))
+    background_tasks.append(asyncio.create_task(analytics_rollup.run(db)))
+    background_tasks.append(asyncio.create_task(archiver.run(db)))
+    background_tasks.append(asyncio.create_task(stats_seeder.run(db)))
+    
     logger.info("Warm Connects API started successfully")
     logger.info(f"MongoDB connected to: {mongo_url}")
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    await last_active_buffer.flush(db)
+    await close_providers()
+    await close_fetcher()
+    await close_transports()
+    
     client.close()
     logger.info("MongoDB connection closed")
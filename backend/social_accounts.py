@@ -0,0 +1,176 @@
+import os
+import secrets
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from pymongo.errors import DuplicateKeyError
+from linkedin_client import ProviderError, CircuitOpenError
+from models import Platform
+from reverification import build_reverification_update, REVERIFICATION_INTERVAL_DAYS
+from seller_cards import refresh_seller_card
+from social_providers import get_provider
+from utils import TTLCache, calculate_authenticity_score
+
+SUMMARY_CACHE_SECONDS = int(os.getenv("SOCIAL_SUMMARY_CACHE_SECONDS", "300"))
+# How long an OAuth authorization URL stays usable
+OAUTH_STATE_TTL_MINUTES = int(os.getenv("OAUTH_STATE_TTL_MINUTES", "10"))
+
+# Public, compact view of a social account; never includes OAuth tokens
+SUMMARY_PROJECTION = {
+    "user_id": 1,
+    "platform": 1,
+    "username": 1,
+    "profile_url": 1,
+    "follower_count": 1,
+    "connection_count": 1,
+    "engagement_rate": 1,
+    "account_age_months": 1,
+    "posts_last_90_days": 1,
+    "bot_follower_percentage": 1,
+    "authenticity_score": 1,
+    "verification_method": 1,
+    "verification_status": 1,
+    "verified_at": 1,
+    "last_reverified": 1,
+    "next_reverification": 1
+}
+
+PLATFORM_NAMES = {
+    "linkedin": "LinkedIn",
+    "facebook": "Facebook",
+    "instagram": "Instagram",
+    "twitter": "Twitter",
+    "youtube": "YouTube"
+}
+
+summary_cache = TTLCache(SUMMARY_CACHE_SECONDS)
+
+
+async def ensure_indexes(db):
+    await db.social_accounts.create_index([("user_id", 1), ("platform", 1)], unique=True)
+    await db.oauth_states.create_index("expires_at", expireAfterSeconds=0)
+    await db.oauth_states.create_index([("user_id", 1), ("platform", 1)], unique=True)
+
+
+async def issue_oauth_state(db, user_id: str, platform: str) -> str:
+    """
+    Generate the OAuth state for a user's next authorization, replacing any
+    earlier one for the same platform
+    """
+    state = secrets.token_urlsafe(16)
+    now = datetime.utcnow()
+    await db.oauth_states.update_one(
+        {"user_id": user_id, "platform": platform},
+        {"$set": {"state": state, "expires_at": now + timedelta(minutes=OAUTH_STATE_TTL_MINUTES), "created_at": now}},
+        upsert=True
+    )
+    return state
+
+
+async def consume_oauth_state(db, user_id: str, platform: str, state: str):
+    """
+    Check a callback's state against the one issued to this user, in one
+    atomic round trip; a state is only ever accepted once
+    """
+    issued = None
+    if state:
+        issued = await db.oauth_states.find_one_and_delete({
+            "user_id": user_id,
+            "platform": platform,
+            "state": state,
+            "expires_at": {"$gt": datetime.utcnow()}
+        })
+    if not issued:
+        raise HTTPException(status_code=400, detail="Invalid or expired OAuth state")
+
+
+def to_summary(account: dict) -> dict:
+    summary = {key: account.get(key) for key in SUMMARY_PROJECTION}
+    summary["_id"] = str(account["_id"])
+    return summary
+
+
+def invalidate_summary(user_id: str, platform: str):
+    summary_cache.invalidate((user_id, platform))
+
+
+async def get_account_summary(db, user_id: str, platform: str):
+    key = (user_id, platform)
+    summary = summary_cache.get(key)
+    if summary is None:
+        account = await db.social_accounts.find_one({"user_id": user_id, "platform": platform}, SUMMARY_PROJECTION)
+        if not account:
+            return None
+        summary = to_summary(account)
+        summary_cache.put(key, summary)
+    return summary
+
+
+async def list_account_summaries(db, user_id: str) -> list:
+    cursor = db.social_accounts.find({"user_id": user_id}, SUMMARY_PROJECTION)
+    return [to_summary(account) for account in await cursor.to_list(length=len(Platform))]
+
+
+async def _fetch_metrics(platform: str, account: dict) -> dict:
+    try:
+        return await get_provider(platform).fetch_metrics(account)
+    except CircuitOpenError:
+        raise HTTPException(status_code=503, detail=f"{PLATFORM_NAMES[platform]} is temporarily unavailable, please retry later")
+    except ProviderError:
+        raise HTTPException(status_code=502, detail=f"Could not verify {PLATFORM_NAMES[platform]} account")
+
+
+async def connect_account(db, user_id: str, platform: str, code: str = None) -> dict:
+    existing = await db.social_accounts.find_one({"user_id": user_id, "platform": platform}, {"_id": 1})
+    if existing:
+        raise HTTPException(status_code=400, detail=f"{PLATFORM_NAMES[platform]} account already connected")
+
+    provider = get_provider(platform)
+    data = await _fetch_metrics(platform, {"user_id": user_id, "code": code})
+    now = datetime.utcnow()
+
+    account = {
+        "user_id": user_id,
+        "platform": platform,
+        "platform_user_id": data.get("platform_user_id", data["username"]),
+        "access_token": data.get("access_token"),
+        "token_expires_at": data.get("token_expires_at"),
+        "profile_url": data["profile_url"],
+        "username": data["username"],
+        "follower_count": data["follower_count"],
+        "connection_count": data["connection_count"],
+        "engagement_rate": data["engagement_rate"],
+        "account_age_months": data["account_age_months"],
+        "posts_last_90_days": data["posts_last_90_days"],
+        "bot_follower_percentage": data["bot_follower_percentage"],
+        "authenticity_score": calculate_authenticity_score(data),
+        "verification_method": provider.verification_method,
+        "verified_at": now,
+        "last_reverified": now,
+        "next_reverification": now + timedelta(days=REVERIFICATION_INTERVAL_DAYS),
+        "verification_status": "verified",
+        "created_at": now,
+        "updated_at": now
+    }
+
+    try:
+        result = await db.social_accounts.insert_one(account)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail=f"{PLATFORM_NAMES[platform]} account already connected")
+
+    account["_id"] = result.inserted_id
+    invalidate_summary(user_id, platform)
+    await refresh_seller_card(db, user_id)
+    return to_summary(account)
+
+
+async def reverify_account(db, user_id: str, platform: str) -> dict:
+    account = await db.social_accounts.find_one({"user_id": user_id, "platform": platform})
+    if not account:
+        raise HTTPException(status_code=404, detail=f"{PLATFORM_NAMES[platform]} account not connected")
+
+    metrics = await _fetch_metrics(platform, account)
+    update = build_reverification_update(metrics)
+    await db.social_accounts.update_one({"_id": account["_id"]}, {"$set": update})
+    invalidate_summary(user_id, platform)
+    await refresh_seller_card(db, user_id)
+    return update
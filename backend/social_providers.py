@@ -0,0 +1,83 @@
+import asyncio
+import os
+import time
+from utils import generate_mock_linkedin_data
+
+
+class AsyncRateLimiter:
+    """
+    Spaces calls evenly so at most `rate_per_second` start each second
+    """
+
+    def __init__(self, rate_per_second: float):
+        self.interval = 1.0 / rate_per_second
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+PROFILE_URL_TEMPLATES = {
+    "linkedin": "https://linkedin.com/in/{username}",
+    "facebook": "https://facebook.com/{username}",
+    "instagram": "https://instagram.com/{username}",
+    "twitter": "https://twitter.com/{username}",
+    "youtube": "https://youtube.com/@{username}",
+}
+
+
+class MockSocialProvider:
+    """
+    Local stand-in for a platform API, backed by generate_mock_linkedin_data
+    """
+    verification_method = "mock"
+    max_concurrency = 10
+    rate_limit_per_second = 50
+
+    def __init__(self, platform: str):
+        self.platform = platform
+
+    async def fetch_metrics(self, account: dict) -> dict:
+        data = generate_mock_linkedin_data()
+        data["profile_url"] = PROFILE_URL_TEMPLATES[self.platform].format(username=data["username"])
+        return data
+
+
+# "mock" uses the local stand-in, "api" the LinkedIn API client
+LINKEDIN_PROVIDER = os.getenv("LINKEDIN_PROVIDER", "mock")
+
+
+def _create_linkedin_provider():
+    if LINKEDIN_PROVIDER == "api":
+        from linkedin_client import LinkedInApiProvider
+        return LinkedInApiProvider()
+    return MockSocialProvider("linkedin")
+
+
+PROVIDERS = {
+    platform: MockSocialProvider(platform) for platform in PROFILE_URL_TEMPLATES
+}
+PROVIDERS["linkedin"] = _create_linkedin_provider()
+
+
+def get_provider(platform: str):
+    provider = PROVIDERS.get(platform)
+    if provider is None:
+        raise KeyError(f"No social provider registered for {platform}")
+    return provider
+
+
+def register_provider(provider):
+    PROVIDERS[provider.platform] = provider
+
+
+async def close_providers():
+    for provider in PROVIDERS.values():
+        if hasattr(provider, "close"):
+            await provider.close()
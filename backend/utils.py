@@ -1,8 +1,12 @@
 import random
 import string
+import hashlib
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from passlib.context import CryptContext
 from jose import JWTError, jwt
+import numpy as np
 import os
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -11,6 +15,90 @@ SECRET_KEY = os.getenv("JWT_SECRET_KEY", "warm-connects-secret-key-change-in-pro
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 hours
 REFRESH_TOKEN_EXPIRE_DAYS = 30
+TOKEN_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", "10000"))
+
+def load_signing_keys() -> dict:
+    """
+    Parse JWT_SIGNING_KEYS ("kid1:secret1,kid2:secret2") into {kid: secret}.
+    Falls back to SECRET_KEY under the "default" kid.
+    """
+    keys = {}
+    for entry in os.getenv("JWT_SIGNING_KEYS", "").split(","):
+        kid, _, secret = entry.strip().partition(":")
+        if kid and secret:
+            keys[kid] = secret
+    if not keys:
+        keys["default"] = SECRET_KEY
+    return keys
+
+# All keys accepted for verification; only ACTIVE_KID signs new tokens, so
+# rotating means adding a new key, switching ACTIVE_KID, and dropping the old
+# key once its tokens have expired
+SIGNING_KEYS = load_signing_keys()
+ACTIVE_KID = os.getenv("JWT_ACTIVE_KID", next(iter(SIGNING_KEYS)))
+
+class TokenCache:
+    """
+    Bounded LRU of decoded claims keyed by token hash; entries expire with the token
+    """
+    def __init__(self, max_size: int = TOKEN_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def token_hash(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str):
+        key = self.token_hash(token)
+        payload = self._entries.get(key)
+        if payload is None:
+            return None
+        if payload.get("exp", 0) <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return payload
+
+    def put(self, token: str, payload: dict):
+        if self.max_size <= 0:
+            return
+        self._entries[self.token_hash(token)] = payload
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+token_cache = TokenCache()
+
+class TTLCache:
+    """
+    Bounded LRU whose entries expire `ttl_seconds` after they are written
+    """
+    def __init__(self, ttl_seconds: float, max_size: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        return value
+
+    def put(self, key, value):
+        self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        self._entries.pop(key, None)
 
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
@@ -31,6 +119,9 @@ def generate_dispute_number() -> str:
     random_suffix = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
     return f"DISP-{timestamp}-{random_suffix}"
 
+def encode_token(claims: dict) -> str:
+    return jwt.encode(claims, SIGNING_KEYS[ACTIVE_KID], algorithm=ALGORITHM, headers={"kid": ACTIVE_KID})
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     if expires_delta:
@@ -38,23 +129,37 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    return encode_token(to_encode)
 
 def create_refresh_token(data: dict):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
     to_encode.update({"exp": expire, "type": "refresh"})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    return encode_token(to_encode)
 
-def verify_token(token: str):
+def decode_token(token: str):
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
+        kid = jwt.get_unverified_header(token).get("kid")
+        # Tokens issued before key rotation carry no kid
+        key = SIGNING_KEYS.get(kid) if kid else SIGNING_KEYS.get("default", SECRET_KEY)
+        if key is None:
+            return None
+        return jwt.decode(token, key, algorithms=[ALGORITHM])
     except JWTError:
         return None
 
+def verify_token(token: str, use_cache: bool = True):
+    if use_cache:
+        payload = token_cache.get(token)
+        if payload is not None:
+            return dict(payload)
+    
+    payload = decode_token(token)
+    if payload is not None and use_cache:
+        token_cache.put(token, payload)
+        payload = dict(payload)
+    return payload
+
 def calculate_authenticity_score(social_account: dict) -> float:
     """
     Calculate authenticity score (0-100) for social media account
@@ -81,6 +186,31 @@ def calculate_authenticity_score(social_account: dict) -> float:
     
     return round(total_score, 2)
 
+def calculate_authenticity_scores(social_accounts: list) -> np.ndarray:
+    """
+    Vectorized calculate_authenticity_score for a batch of accounts
+    """
+    if not social_accounts:
+        return np.empty(0)
+    
+    fields = np.array([
+        (
+            account.get('engagement_rate', 0),
+            account.get('bot_follower_percentage', 0),
+            account.get('account_age_months', 0),
+            account.get('posts_last_90_days', 0)
+        )
+        for account in social_accounts
+    ], dtype=float)
+    engagement_rate, bot_percentage, account_age_months, posts_90_days = fields.T
+    
+    engagement_score = np.minimum(engagement_rate * 10, 40)
+    follower_quality = (100 - bot_percentage) * 0.3
+    age_score = np.minimum(account_age_months / 36 * 15, 15)
+    consistency_score = np.minimum(posts_90_days / 12 * 15, 15)
+    
+    return np.round(engagement_score + follower_quality + age_score + consistency_score, 2)
+
 def calculate_reputation_score(seller: dict) -> float:
     """
     Calculate seller reputation score (0-100)
@@ -0,0 +1,64 @@
+import asyncio
+import logging
+import os
+import secrets
+import socket
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+# How long a lease outlives its last renewal; the holder renews it at a third of its length
+WORKER_LEASE_SECONDS = int(os.getenv("WORKER_LEASE_SECONDS", "60"))
+
+
+class WorkerLease:
+    """
+    A named lease in worker_leases. Every process starts the same background
+    workers; the lease lets only one of them do the work at a time, and
+    another takes over once the holder stops renewing it.
+    """
+
+    def __init__(self, name: str, seconds: int = WORKER_LEASE_SECONDS):
+        self.name = name
+        self.seconds = seconds
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(4)}"
+
+    async def acquire(self, db, now: datetime = None) -> bool:
+        """
+        Take or renew the lease; False while another live process holds it
+        """
+        now = now or datetime.utcnow()
+        try:
+            lease = await db.worker_leases.find_one_and_update(
+                {"_id": self.name, "$or": [{"holder": self.holder}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"holder": self.holder, "expires_at": now + timedelta(seconds=self.seconds)}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # The lease exists and belongs to someone else
+            return False
+        return lease is not None
+
+    async def _renew(self, db):
+        while True:
+            await asyncio.sleep(self.seconds / 3)
+            try:
+                await self.acquire(db)
+            except Exception as e:
+                logger.error(f"Failed to renew worker lease {self.name}: {e}")
+
+    async def run_exclusive(self, db, work):
+        """
+        Await work() if this process holds the lease, renewing it until the
+        work is done. Returns None without running it otherwise.
+        """
+        if not await self.acquire(db):
+            return None
+        renewer = asyncio.create_task(self._renew(db))
+        try:
+            return await work()
+        finally:
+            renewer.cancel()
@@ -52,8 +52,9 @@ export default function ServicesScreen() {
 
   const handleConnectLinkedIn = async () => {
     try {
-      // For mock implementation
-      const response = await linkedInAPI.callback({ mock_data: true });
+      // For mock implementation; the callback must echo the state issued with the auth URL
+      const { data } = await linkedInAPI.getAuthUrl();
+      const response = await linkedInAPI.callback({ mock_data: true, state: data.state });
       Alert.alert('Success', 'LinkedIn connected successfully!', [
         { text: 'OK', onPress: () => {
           setLinkedInConnected(true);
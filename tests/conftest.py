@@ -0,0 +1,125 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+# Settings read at import time; the database itself is swapped for an in-memory one per test
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+
+from bson import ObjectId
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+import idempotency
+import seller_dashboard
+import seller_stats
+
+
+@pytest.fixture(scope="session")
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture
+def run(loop):
+    return loop.run_until_complete
+
+
+@pytest.fixture
+def db():
+    server.db = AsyncMongoMockClient()["tests"]
+    # Per-process caches that would otherwise leak between databases
+    idempotency._in_flight.clear()
+    seller_stats._seeded.clear()
+    seller_stats.stats_seeder._queued.clear()
+    seller_dashboard._seeded.clear()
+    return server.db
+
+
+@pytest.fixture
+def client(db):
+    return TestClient(server.app)
+
+
+class Market:
+    """
+    A verified seller with one active service and a funded buyer, driven
+    through the API
+    """
+
+    def __init__(self, client, db, run):
+        self.client = client
+        self.db = db
+        self.run = run
+        self.seller, self.seller_id = self.make_user("seller@example.com", "seller")
+        self.buyer, self.buyer_id = self.make_user("buyer@example.com", "buyer")
+
+        state = client.get("/api/linkedin/auth-url", headers=self.seller).json()["state"]
+        assert client.post("/api/linkedin/callback", json={"state": state}, headers=self.seller).status_code == 200
+        response = client.post("/api/services/create", json={
+            "title": "LinkedIn post",
+            "description": "One sponsored post",
+            "service_type": "campaign_support",
+            "base_price": 50,
+            "turnaround_hours": 24,
+            "platforms": ["linkedin"]
+        }, headers=self.seller)
+        assert response.status_code == 200, response.text
+        self.service_id = response.json()["service_id"]
+        run(db.service_listings.update_one({"_id": ObjectId(self.service_id)}, {"$set": {"active": True}}))
+
+        response = client.post("/api/wallet/purchase-credits", json={"amount": 1000}, headers=self.buyer)
+        assert response.status_code == 200, response.text
+
+    def make_user(self, email: str, role: str, **fields) -> tuple:
+        response = self.client.post("/api/auth/register", json={
+            "email": email, "password": "password123", "full_name": email.split("@")[0], "role": role
+        })
+        assert response.status_code == 200, response.text
+        response = self.client.post("/api/auth/verify-email", json={"email": email, "otp": response.json()["otp_code"]})
+        assert response.status_code == 200, response.text
+        user_id = response.json()["user"]["_id"]
+        if fields:
+            self.run(self.db.users.update_one({"_id": ObjectId(user_id)}, {"$set": fields}))
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}, user_id
+
+    def buyer_balance(self) -> float:
+        return self.client.get("/api/wallet/balance", headers=self.buyer).json()["available_balance"]
+
+    def order(self, until: str = "approved") -> str:
+        """
+        Create an order and walk it to `until`: pending_acceptance, accepted,
+        delivered or approved
+        """
+        response = self.client.post(
+            "/api/orders/create", json={"service_id": self.service_id, "platform": "linkedin"}, headers=self.buyer
+        )
+        assert response.status_code == 200, response.text
+        order_id = response.json()["order"]["_id"]
+        steps = [
+            ("accepted", f"/api/orders/{order_id}/accept", self.seller, None),
+            ("delivered", f"/api/orders/{order_id}/deliver", self.seller, {"url": "https://linkedin.com/posts/1"}),
+            ("approved", f"/api/orders/{order_id}/approve", self.buyer, None),
+        ]
+        for status, path, headers, body in steps:
+            if until == "pending_acceptance":
+                break
+            response = self.client.post(path, json=body, headers=headers)
+            assert response.status_code == 200, response.text
+            if status == until:
+                break
+        return order_id
+
+
+@pytest.fixture
+def market(client, db, run):
+    return Market(client, db, run)
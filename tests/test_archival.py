@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from archival import ARCHIVE_AFTER_DAYS, archiver, find_history, find_one_with_archive, iter_with_archive
+from order_state import DISPUTE_WINDOW_DAYS, dispute_window
+
+NOW = datetime(2026, 6, 1)
+OLD = NOW - timedelta(days=ARCHIVE_AFTER_DAYS["orders"] + 1)
+
+
+def insert_order(db, run, status: str = "approved", updated_at: datetime = OLD, **fields) -> dict:
+    order = {
+        "_id": ObjectId(),
+        "buyer_id": "buyer",
+        "seller_id": "seller",
+        "status": status,
+        "messages": [{"text": "Thanks!"}],
+        "created_at": updated_at,
+        "updated_at": updated_at,
+        **fields
+    }
+    run(db.orders.insert_one(order))
+    return order
+
+
+def test_archive_orders_moves_old_finished_orders(db, run):
+    finished = [insert_order(db, run, status) for status in ("approved", "completed", "refunded", "cancelled")]
+    in_progress = insert_order(db, run, "delivered")
+    recent = insert_order(db, run, "approved", updated_at=NOW - timedelta(days=1))
+
+    assert run(archiver.archive_orders(db, now=NOW)) == 4
+
+    assert set(run(db.orders.distinct("_id"))) == {in_progress["_id"], recent["_id"]}
+    for order in finished:
+        archived = run(db.orders_archive.find_one({"_id": order["_id"]}))
+        assert archived["messages"] == [{"text": "Thanks!"}]
+        assert archived["archived_at"] == NOW
+    assert run(archiver.archive_orders(db, now=NOW)) == 0
+
+
+def test_orders_open_to_disputes_stay_hot(db, run):
+    settled = NOW - timedelta(days=DISPUTE_WINDOW_DAYS - 1)
+    disputable = insert_order(db, run, updated_at=settled, escrow_settled_at=settled)
+    legacy = insert_order(db, run, "completed", updated_at=settled, completed_at=settled)
+
+    assert run(archiver.archive_orders(db, now=NOW)) == 0
+    ids = [disputable["_id"], legacy["_id"]]
+    assert run(db.orders.count_documents({"_id": {"$in": ids}, **dispute_window(NOW)})) == 2
+
+
+def test_order_updated_during_the_move_stays_hot(db, run):
+    order = insert_order(db, run)
+    run(db.orders.update_one({"_id": order["_id"]}, {"$set": {"updated_at": NOW}}))
+
+    assert run(archiver._move(db, "orders", [order], guard_field="updated_at", now=NOW)) == 0
+
+    assert run(db.orders.find_one({"_id": order["_id"]}))["updated_at"] == NOW
+    assert run(db.orders_archive.find_one({"_id": order["_id"]})) is None
+
+
+def test_archive_transactions_moves_year_old_records(db, run):
+    old = {"_id": ObjectId(), "user_id": "buyer", "amount": 10, "created_at": NOW - timedelta(days=400)}
+    recent = {"_id": ObjectId(), "user_id": "buyer", "amount": 20, "created_at": NOW - timedelta(days=30)}
+    run(db.transactions.insert_many([old, recent]))
+
+    assert run(archiver.archive_transactions(db, now=NOW)) == 1
+
+    assert run(db.transactions.distinct("_id")) == [recent["_id"]]
+    assert run(db.transactions_archive.find_one({"_id": old["_id"]}))["amount"] == 10
+
+
+def test_reads_span_both_collections(db, run):
+    archived = insert_order(db, run)
+    hot = insert_order(db, run, "delivered", updated_at=NOW)
+    run(archiver.archive_orders(db, now=NOW))
+
+    assert run(find_one_with_archive(db, "orders", {"_id": archived["_id"]}))["status"] == "approved"
+    assert run(find_one_with_archive(db, "orders", {"_id": hot["_id"]}))["status"] == "delivered"
+
+    history = run(find_history(db, "orders", {"buyer_id": "buyer"}))
+    assert [order["_id"] for order in history] == [hot["_id"], archived["_id"]]
+
+
+def test_document_in_both_collections_is_read_once(db, run):
+    order = insert_order(db, run)
+    # Copied but not yet deleted, as mid-move
+    run(db.orders_archive.insert_one({**order, "archived_at": NOW}))
+
+    async def collect():
+        return [document async for document in iter_with_archive(db, "orders", {"seller_id": "seller"})]
+
+    documents = run(collect())
+    assert len(documents) == 1 and "archived_at" not in documents[0]
+    assert len(run(find_history(db, "orders", {"seller_id": "seller"}))) == 1
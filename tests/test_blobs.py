@@ -0,0 +1,96 @@
+import hashlib
+
+import pytest
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+import blob_store
+from blob_store import LocalBlobBackend, UploadSizeLimitMiddleware
+
+CONTENT = bytes(range(256)) * 40
+
+
+@pytest.fixture(autouse=True)
+def local_store(tmp_path, monkeypatch):
+    monkeypatch.setitem(blob_store._backends, "local", LocalBlobBackend(str(tmp_path)))
+
+
+def upload(market, headers: dict, content: bytes = CONTENT, content_type: str = "image/png"):
+    return market.client.post("/api/blobs", files={"file": ("proof.png", content, content_type)}, headers=headers)
+
+
+def download(market, ref: str, **headers):
+    blob_id = ref[len(blob_store.BLOB_REF_PREFIX):]
+    return market.client.get(f"/api/blobs/{blob_id}", headers={**market.buyer, **headers})
+
+
+def test_identical_uploads_are_stored_once(market):
+    first = upload(market, market.buyer).json()["blob"]
+    second = upload(market, market.seller).json()["blob"]
+
+    assert first["sha256"] == hashlib.sha256(CONTENT).hexdigest()
+    assert (first["deduplicated"], second["deduplicated"]) == (False, True)
+    blob = market.run(market.db.blobs.find_one({"_id": first["sha256"]}))
+    assert set(blob["readers"]) == {market.buyer_id, market.seller_id}
+    assert download(market, first["ref"]).content == CONTENT
+
+
+def test_range_requests(market):
+    ref = upload(market, market.buyer).json()["blob"]["ref"]
+
+    response = download(market, ref, Range="bytes=100-199")
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes 100-199/{len(CONTENT)}"
+    assert response.content == CONTENT[100:200]
+
+    assert download(market, ref, Range="bytes=-10").content == CONTENT[-10:]
+    assert download(market, ref, Range=f"bytes={len(CONTENT)}-").status_code == 416
+
+
+def test_uploads_are_limited_to_readers_and_allowed_types(market):
+    ref = upload(market, market.buyer).json()["blob"]["ref"]
+    outsider, _ = market.make_user("outsider@example.com", "buyer")
+    assert download(market, ref, **outsider).status_code == 403
+    assert upload(market, market.buyer, content_type="application/x-msdownload").status_code == 415
+
+
+def test_oversized_file_is_rejected(market, monkeypatch):
+    monkeypatch.setattr(blob_store, "BLOB_MAX_BYTES", len(CONTENT) - 1)
+    assert upload(market, market.buyer).status_code == 413
+    assert market.run(market.db.blobs.count_documents({})) == 0
+
+
+def limited_app(max_bytes: int) -> TestClient:
+    app = FastAPI()
+    parsed = []
+
+    @app.post("/api/blobs")
+    async def receive(file: UploadFile = File(...)):
+        parsed.append(file.filename)
+        return {}
+
+    client = TestClient(UploadSizeLimitMiddleware(app, max_bytes=max_bytes))
+    client.parsed = parsed
+    return client
+
+
+def test_request_over_the_cap_is_refused_before_parsing():
+    client = limited_app(max_bytes=1024)
+
+    assert client.post("/api/blobs", files={"file": ("a.png", b"x" * 100)}).status_code == 200
+    response = client.post("/api/blobs", files={"file": ("b.png", b"x" * 2048)})
+    assert response.status_code == 413
+    assert client.parsed == ["a.png"]
+
+
+def test_streamed_request_over_the_cap_is_cut_off():
+    client = limited_app(max_bytes=1024)
+
+    def body():
+        # No Content-Length, so the cap is enforced as the body arrives
+        for _ in range(4):
+            yield b"x" * 512
+
+    response = client.post("/api/blobs", content=body(), headers={"Content-Type": "multipart/form-data; boundary=x"})
+    assert response.status_code == 413
+    assert client.parsed == []
@@ -0,0 +1,101 @@
+from bson import ObjectId
+from fastapi.testclient import TestClient
+
+import server
+
+
+def item(market, **fields) -> dict:
+    return {"service_id": market.service_id, "platform": "linkedin", **fields}
+
+
+def bulk_create(market, items: list, client=None):
+    return (client or market.client).post("/api/orders/bulk-create", json={"items": items}, headers=market.buyer)
+
+
+def count(market, collection: str, query: dict = None) -> int:
+    return market.run(market.db[collection].count_documents(query or {}))
+
+
+def test_bulk_create_skips_invalid_items(market):
+    before = market.buyer_balance()
+    response = bulk_create(market, [
+        item(market),
+        item(market, service_id=str(ObjectId())),
+        item(market, quantity=2),
+        item(market, quantity=0),
+    ])
+    assert response.status_code == 200, response.text
+    body = response.json()
+
+    assert (body["created"], body["failed"]) == (2, 2)
+    assert [result["success"] for result in body["results"]] == [True, False, True, False]
+    assert body["results"][1]["error"] == "Service not found"
+    assert body["results"][3]["error"] == "Quantity must be at least 1"
+    assert body["credits_deducted"] == 57.5 * 3
+    assert body["new_balance"] == market.buyer_balance() == before - 57.5 * 3
+
+    payments = market.run(market.db.transactions.find({"transaction_type": "order_payment"}).to_list(None))
+    assert sorted(payment["amount"] for payment in payments) == [-115, -57.5]
+    assert payments[-1]["balance_after"] == body["new_balance"]
+
+
+def test_single_create_rejects_zero_quantity(market):
+    response = market.client.post("/api/orders/create", json=item(market, quantity=0), headers=market.buyer)
+    assert response.status_code == 400
+    assert count(market, "orders") == 0
+
+
+def test_bulk_create_with_insufficient_credits_creates_nothing(market):
+    before = market.buyer_balance()
+    response = bulk_create(market, [item(market)] * 20)
+
+    assert response.status_code == 400
+    assert market.buyer_balance() == before
+    assert count(market, "orders") == 0
+
+
+def test_bulk_create_rolls_back_when_a_write_fails(market, monkeypatch):
+    before = market.buyer_balance()
+
+    async def broken_insert_many(*args, **kwargs):
+        raise RuntimeError("database down")
+
+    monkeypatch.setattr(type(market.db.transactions), "insert_many", broken_insert_many)
+    client = TestClient(server.app, raise_server_exceptions=False)
+    response = bulk_create(market, [item(market)] * 2, client=client)
+
+    assert response.status_code == 500
+    assert market.buyer_balance() == before
+    assert count(market, "orders") == 0
+
+
+def test_bulk_accept_moves_only_pending_orders(market):
+    created = bulk_create(market, [item(market)] * 3).json()
+    pending = [result["order"]["_id"] for result in created["results"]]
+    accepted = market.order(until="accepted")
+    missing = str(ObjectId())
+
+    response = market.client.post(
+        "/api/orders/bulk-accept", json={"order_ids": pending + [accepted, missing, "bad"]}, headers=market.seller
+    )
+    assert response.status_code == 200, response.text
+    body = response.json()
+
+    assert (body["succeeded"], body["failed"]) == (3, 3)
+    errors = {result["order_id"]: result.get("error") for result in body["results"]}
+    assert errors[accepted] == "Order is accepted"
+    assert errors[missing] == errors["bad"] == "Order not found"
+    for order_id in pending:
+        order = market.run(market.db.orders.find_one({"_id": ObjectId(order_id)}))
+        assert (order["status"], order["escrow_status"]) == ("accepted", "active")
+        assert order["deadline"] is not None
+
+
+def test_bulk_accept_is_limited_to_the_seller(market):
+    created = bulk_create(market, [item(market)]).json()
+    order_id = created["results"][0]["order"]["_id"]
+
+    response = market.client.post("/api/orders/bulk-accept", json={"order_ids": [order_id]}, headers=market.buyer)
+    assert response.json()["results"] == [{"order_id": order_id, "success": False, "error": "Not authorized"}]
+    order = market.run(market.db.orders.find_one({"_id": ObjectId(order_id)}))
+    assert order["status"] == "pending_acceptance"
@@ -0,0 +1,67 @@
+import gzip
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from compression import CompressionMiddleware, brotli, choose_encoding
+
+BIG = {"items": ["x" * 100] * 50}
+
+
+def app_client() -> TestClient:
+    app = FastAPI()
+
+    @app.get("/big")
+    async def big():
+        return BIG
+
+    @app.get("/small")
+    async def small():
+        return {"ok": True}
+
+    @app.get("/binary")
+    async def binary():
+        return PlainTextResponse("x" * 5000, media_type="image/png")
+
+    @app.get("/stream")
+    async def stream():
+        return StreamingResponse(iter([b"x" * 5000, b"y" * 5000]), media_type="text/plain")
+
+    app.add_middleware(CompressionMiddleware, minimum_size=1024, offload_size=4096)
+    return TestClient(app)
+
+
+def raw_get(client: TestClient, path: str, **headers):
+    # Ask httpx not to decode, so the wire bytes can be inspected
+    with client.stream("GET", path, headers=headers) as response:
+        return response, b"".join(response.iter_raw())
+
+
+def test_choose_encoding():
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("identity") is None
+    assert choose_encoding("gzip;q=0, *;q=0") is None
+    assert choose_encoding("br;q=1.0, gzip;q=0.5") == ("br" if brotli else "gzip")
+    assert choose_encoding("*") == ("br" if brotli else "gzip")
+
+
+def test_large_json_is_gzipped():
+    response, body = raw_get(app_client(), "/big", **{"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["content-length"] == str(len(body))
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert gzip.decompress(body).decode().startswith('{"items"')
+
+
+def test_small_binary_and_streamed_bodies_pass_through():
+    client = app_client()
+    for path in ("/small", "/binary", "/stream"):
+        response, _ = raw_get(client, path, **{"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in response.headers, path
+
+
+def test_range_requests_are_not_compressed():
+    response, _ = raw_get(app_client(), "/big", **{"Accept-Encoding": "gzip", "Range": "bytes=0-10"})
+    assert "content-encoding" not in response.headers
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from deadline_monitor import EXPIRED, LATE, DeadlineMonitor
+from notifications import render
+
+
+def overdue(market, hours: float) -> tuple:
+    order_id = market.order(until="accepted")
+    deadline = datetime.utcnow().replace(microsecond=0) - timedelta(hours=hours)
+    market.run(market.db.orders.update_one({"_id": ObjectId(order_id)}, {"$set": {"deadline": deadline}}))
+    return order_id, deadline
+
+
+def notices(market, event: str) -> dict:
+    notifications = market.run(market.db.notifications.find({"event": event}).to_list(length=None))
+    return {(notification["user_id"], notification["channel"]): notification for notification in notifications}
+
+
+def test_late_order_is_flagged_and_both_parties_told(market):
+    order_id, deadline = overdue(market, hours=1)
+    monitor = DeadlineMonitor(grace_hours=24)
+
+    assert market.run(monitor.load(market.db)) == 1
+    assert market.run(monitor.fire_due(market.db)) == {LATE: 1, EXPIRED: 0}
+
+    order = market.run(market.db.orders.find_one({"_id": ObjectId(order_id)}))
+    assert order["status"] == "accepted" and order["late_at"] is not None
+    sent = notices(market, "order_late")
+    assert {user_id for user_id, _ in sent} == {market.buyer_id, market.seller_id}
+    subject, body = render(sent[(market.buyer_id, "email")])
+    assert order["order_number"] in subject
+    assert f"{deadline:%Y-%m-%d %H:%M} UTC" in body and "24 hours" in body
+    assert notices(market, "order_expired") == {}
+
+
+def test_expired_order_is_refunded_and_both_parties_told(market):
+    before = market.buyer_balance()
+    order_id, _ = overdue(market, hours=25)
+    monitor = DeadlineMonitor(grace_hours=24)
+
+    market.run(monitor.load(market.db))
+    assert market.run(monitor.fire_due(market.db)) == {LATE: 1, EXPIRED: 1}
+
+    order = market.run(market.db.orders.find_one({"_id": ObjectId(order_id)}))
+    assert order["status"] == "cancelled" and order["cancellation_reason"] == "deadline_missed"
+    assert market.buyer_balance() == before
+    sent = notices(market, "order_expired")
+    assert {user_id for user_id, _ in sent} == {market.buyer_id, market.seller_id}
+    assert "refunded" in render(sent[(market.seller_id, "push")])[1]
+
+
+def test_delivered_order_fires_nothing(market):
+    order_id, _ = overdue(market, hours=25)
+    monitor = DeadlineMonitor(grace_hours=24)
+    market.run(monitor.load(market.db))
+    response = market.client.post(
+        f"/api/orders/{order_id}/deliver", json={"url": "https://linkedin.com/posts/1"}, headers=market.seller
+    )
+    assert response.status_code == 200, response.text
+
+    assert market.run(monitor.fire_due(market.db)) == {LATE: 0, EXPIRED: 0}
+    assert notices(market, "order_late") == {} and notices(market, "order_expired") == {}
@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from dispute_queue import (
+    ESCALATION_WEIGHT, DisputeQueueMonitor, claim, claim_next, compute_priority, list_queue, queue_fields, release
+)
+
+
+def insert_dispute(db, run, dispute_type: str = "quality_issues", amount: float = 50, **fields) -> str:
+    now = datetime.utcnow()
+    dispute = {
+        "_id": ObjectId(),
+        "dispute_type": dispute_type,
+        "amount_at_stake": amount,
+        "status": "open",
+        "initiator_id": "buyer",
+        "respondent_id": "seller",
+        "mediator_id": None,
+        "created_at": now,
+        **fields
+    }
+    dispute.update(queue_fields(dispute, now))
+    run(db.disputes.insert_one(dispute))
+    return str(dispute["_id"])
+
+
+def test_priority_weighs_type_amount_answers_and_escalation():
+    base = compute_priority({"dispute_type": "quality_issues", "amount_at_stake": 0})
+    assert compute_priority({"dispute_type": "fake_proof", "amount_at_stake": 0}) > base
+    assert compute_priority({"dispute_type": "quality_issues", "amount_at_stake": 10_000}) == base + 40
+    assert compute_priority({"dispute_type": "quality_issues", "escalation_level": 2}) == base + 2 * ESCALATION_WEIGHT
+
+
+def test_claims_come_off_the_top_of_the_queue(db, run):
+    low = insert_dispute(db, run, amount=10)
+    high = insert_dispute(db, run, dispute_type="fake_proof", amount=500)
+
+    assert [dispute["_id"] for dispute in run(list_queue(db))] == [high, low]
+    assert run(claim_next(db, "mediator-1"))["_id"] == high
+    assert run(claim_next(db, "mediator-2"))["_id"] == low
+    with pytest.raises(HTTPException) as empty:
+        run(claim_next(db, "mediator-3"))
+    assert empty.value.status_code == 404
+
+
+def test_a_claim_is_exclusive_until_released_or_lapsed(db, run):
+    dispute_id = insert_dispute(db, run)
+    run(claim(db, dispute_id, "mediator-1"))
+
+    with pytest.raises(HTTPException) as taken:
+        run(claim(db, dispute_id, "mediator-2"))
+    assert taken.value.status_code == 409
+    # Extending your own lease is fine
+    run(claim(db, dispute_id, "mediator-1"))
+
+    run(db.disputes.update_one({}, {"$set": {"lease_expires_at": datetime.utcnow() - timedelta(seconds=1)}}))
+    assert run(claim(db, dispute_id, "mediator-2"))["mediator_id"] == "mediator-2"
+    with pytest.raises(HTTPException):
+        run(release(db, dispute_id, "mediator-1"))
+    assert run(release(db, dispute_id, "mediator-2"))["mediator_id"] is None
+
+
+def test_mediators_are_kept_off_their_own_disputes(db, run):
+    dispute_id = insert_dispute(db, run, respondent_id="mediator-1")
+
+    with pytest.raises(HTTPException) as refused:
+        run(claim(db, dispute_id, "mediator-1"))
+    assert refused.value.status_code == 403
+    with pytest.raises(HTTPException):
+        run(claim_next(db, "mediator-1"))
+
+
+def test_unresolved_disputes_escalate_once_per_period(db, run):
+    dispute_id = insert_dispute(db, run)
+    resolved = insert_dispute(db, run, status="resolved")
+    monitor = DisputeQueueMonitor(escalation_hours=24)
+    later = datetime.utcnow().replace(microsecond=0) + timedelta(hours=25)
+
+    assert run(monitor.escalate_due(db, now=later)) == 1
+    assert run(monitor.escalate_due(db, now=later)) == 0
+    dispute = run(db.disputes.find_one({"_id": ObjectId(dispute_id)}))
+    assert dispute["escalation_level"] == 1
+    assert dispute["next_escalation_at"] == later + timedelta(hours=24)
+    assert run(db.disputes.find_one({"_id": ObjectId(resolved)}))["escalation_level"] == 0
@@ -0,0 +1,204 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from dispute_resolution import DISPUTE_DEFAULT_JUDGEMENT_HOURS, dispute_sweeper, execute_resolution
+from models import ResolutionType
+
+
+def open_dispute(market, order_id: str, headers: dict) -> dict:
+    response = market.client.post("/api/disputes/create", json={
+        "order_id": order_id, "dispute_type": "quality_issues", "reason": "Not as described"
+    }, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["dispute"]
+
+
+def profile(market, user_id: str, name: str) -> dict:
+    return market.run(market.db.users.find_one({"_id": ObjectId(user_id)}))[name]
+
+
+def get_order(market, order_id: str) -> dict:
+    return market.run(market.db.orders.find_one({"_id": ObjectId(order_id)}))
+
+
+def get_dispute(market, dispute_id: str) -> dict:
+    return market.run(market.db.disputes.find_one({"_id": ObjectId(dispute_id)}))
+
+
+def test_full_refund_after_approval_reverses_earnings(market):
+    order_id = market.order()
+    seller_before = profile(market, market.seller_id, "seller_profile")
+    balance_before = market.buyer_balance()
+
+    dispute = open_dispute(market, order_id, market.buyer)
+    assert dispute["default_judgement_eligible"] is False
+    market.run(execute_resolution(market.db, order_id, ResolutionType.FULL_REFUND, None))
+
+    seller_after = profile(market, market.seller_id, "seller_profile")
+    assert seller_after["pending_balance"] == seller_before["pending_balance"] - 50
+    assert seller_after["total_earnings"] == seller_before["total_earnings"] - 50
+    assert market.buyer_balance() == balance_before + 57.5
+
+    order = get_order(market, order_id)
+    assert (order["status"], order["refund_amount"], order["seller_credited"]) == ("refunded", 57.5, 0.0)
+    transactions = market.run(market.db.transactions.find({"order_id": order_id}).to_list(None))
+    assert {(t["transaction_type"], t["amount"]) for t in transactions} >= {
+        ("earnings_reversed", -50), ("order_refund", 57.5)
+    }
+
+
+def test_partial_refund_splits_escrow(market):
+    order_id = market.order(until="delivered")
+    open_dispute(market, order_id, market.buyer)
+    balance_before = market.buyer_balance()
+    available_before = profile(market, market.seller_id, "seller_profile").get("available_balance", 0)
+
+    market.run(execute_resolution(market.db, order_id, ResolutionType.PARTIAL_REFUND, 40))
+
+    assert market.buyer_balance() == balance_before + 23
+    assert profile(market, market.seller_id, "seller_profile")["available_balance"] == available_before + 27
+    assert get_order(market, order_id)["status"] == "completed"
+
+
+def test_resolution_settles_once(market):
+    order_id = market.order(until="delivered")
+    open_dispute(market, order_id, market.buyer)
+    market.run(execute_resolution(market.db, order_id, ResolutionType.FULL_REFUND, None))
+    balance = market.buyer_balance()
+
+    with pytest.raises(HTTPException) as exc:
+        market.run(execute_resolution(market.db, order_id, ResolutionType.FULL_REFUND, None))
+    assert exc.value.status_code == 400
+    assert market.buyer_balance() == balance
+
+
+
+@pytest.mark.parametrize("resolution_type, status, refund", [
+    (ResolutionType.FULL_REFUND, "refunded", 57.5),
+    (ResolutionType.ORDER_CANCELLATION, "refunded", 57.5),
+    (ResolutionType.FULL_PAYMENT, "completed", 0),
+])
+def test_settling_resolution_types(market, resolution_type, status, refund):
+    order_id = market.order(until="delivered")
+    open_dispute(market, order_id, market.buyer)
+    balance_before = market.buyer_balance()
+    available_before = profile(market, market.seller_id, "seller_profile").get("available_balance", 0)
+
+    market.run(execute_resolution(market.db, order_id, resolution_type, None))
+
+    assert get_order(market, order_id)["status"] == status
+    assert market.buyer_balance() == balance_before + refund
+    paid = profile(market, market.seller_id, "seller_profile").get("available_balance", 0) - available_before
+    assert paid == (0 if refund else 50)
+
+
+@pytest.mark.parametrize("resolution_type", [ResolutionType.REVISION_REQUIRED, ResolutionType.SPLIT_DECISION])
+def test_unsupported_resolution_types_move_no_money(market, resolution_type):
+    order_id = market.order(until="delivered")
+    open_dispute(market, order_id, market.buyer)
+    balance_before = market.buyer_balance()
+    transactions_before = market.run(market.db.transactions.count_documents({}))
+
+    with pytest.raises(HTTPException) as exc:
+        market.run(execute_resolution(market.db, order_id, resolution_type, None))
+    assert exc.value.status_code == 400
+    assert get_order(market, order_id)["status"] == "disputed"
+    assert market.buyer_balance() == balance_before
+    assert market.run(market.db.transactions.count_documents({})) == transactions_before
+
+@pytest.mark.parametrize("percentage", [None, -5, 150])
+def test_invalid_refund_percentage_is_rejected(market, percentage):
+    order_id = market.order(until="delivered")
+    open_dispute(market, order_id, market.buyer)
+
+    with pytest.raises(HTTPException) as exc:
+        market.run(execute_resolution(market.db, order_id, ResolutionType.PARTIAL_REFUND, percentage))
+    assert exc.value.status_code == 400
+    assert get_order(market, order_id)["status"] == "disputed"
+
+
+def test_mediator_resolves_claimed_dispute(market):
+    mediator, _ = market.make_user("mediator@example.com", "buyer", is_mediator=True)
+    order_id = market.order(until="delivered")
+    dispute = open_dispute(market, order_id, market.buyer)
+    decision = {"resolution_type": "full_payment", "resolution_details": "Delivered as agreed"}
+
+    response = market.client.post(f"/api/disputes/{dispute['_id']}/mediate", json=decision, headers=mediator)
+    assert response.status_code == 409
+
+    assert market.client.post(f"/api/disputes/{dispute['_id']}/claim", headers=mediator).status_code == 200
+    response = market.client.post(f"/api/disputes/{dispute['_id']}/mediate", json=decision, headers=mediator)
+    assert response.status_code == 200, response.text
+    assert response.json()["dispute"]["status"] == "resolved"
+    assert get_order(market, order_id)["status"] == "completed"
+
+    response = market.client.post(f"/api/disputes/{dispute['_id']}/mediate", json=decision, headers=mediator)
+    assert response.status_code == 400
+
+
+def test_mediator_cannot_claim_own_dispute(market):
+    market.run(market.db.users.update_one({"_id": ObjectId(market.seller_id)}, {"$set": {"is_mediator": True}}))
+    order_id = market.order(until="delivered")
+    dispute = open_dispute(market, order_id, market.buyer)
+
+    response = market.client.post(f"/api/disputes/{dispute['_id']}/claim", headers=market.seller)
+    assert response.status_code == 403
+
+
+def test_default_judgement_refunds_unanswered_buyer_claim(market):
+    eligible = market.order(until="delivered")
+    answered = market.order(until="delivered")
+    seller_claim = market.order(until="delivered")
+    settled = market.order()
+
+    eligible_dispute = open_dispute(market, eligible, market.buyer)
+    answered_dispute = open_dispute(market, answered, market.buyer)
+    seller_dispute = open_dispute(market, seller_claim, market.seller)
+    settled_dispute = open_dispute(market, settled, market.buyer)
+    assert eligible_dispute["default_judgement_eligible"] is True
+    assert seller_dispute["default_judgement_eligible"] is False
+    assert settled_dispute["default_judgement_eligible"] is False
+
+    response = market.client.post(
+        f"/api/disputes/{answered_dispute['_id']}/respond", json={"response": "It was delivered"}, headers=market.seller
+    )
+    assert response.status_code == 200
+
+    now = datetime.utcnow() + timedelta(hours=DISPUTE_DEFAULT_JUDGEMENT_HOURS + 1)
+    balance_before = market.buyer_balance()
+    stats = market.run(dispute_sweeper.sweep(market.db, now=now))
+
+    assert stats == {"escalated": 3, "default_judgements": 1}
+    resolved = get_dispute(market, eligible_dispute["_id"])
+    assert (resolved["status"], resolved["resolution_type"], resolved["default_judgement"]) == (
+        "resolved", "full_refund", True
+    )
+    assert get_order(market, eligible)["status"] == "refunded"
+    assert market.buyer_balance() == balance_before + 57.5
+
+    for dispute in (answered_dispute, seller_dispute, settled_dispute):
+        assert get_dispute(market, dispute["_id"])["status"] == "under_mediation"
+
+
+def test_default_judgement_waits_for_the_window_and_claimed_disputes(market):
+    mediator, _ = market.make_user("mediator@example.com", "buyer", is_mediator=True)
+    claimed = market.order(until="delivered")
+    unclaimed = market.order(until="delivered")
+    claimed_dispute = open_dispute(market, claimed, market.buyer)
+    open_dispute(market, unclaimed, market.buyer)
+    assert market.client.post(f"/api/disputes/{claimed_dispute['_id']}/claim", headers=mediator).status_code == 200
+
+    within_window = datetime.utcnow() + timedelta(hours=DISPUTE_DEFAULT_JUDGEMENT_HOURS - 1)
+    assert market.run(dispute_sweeper.issue_default_judgements(market.db, within_window)) == 0
+
+    # The mediator still holds the lease once the window has passed
+    past_window = datetime.utcnow() + timedelta(hours=DISPUTE_DEFAULT_JUDGEMENT_HOURS + 1)
+    market.run(market.db.disputes.update_one(
+        {"_id": ObjectId(claimed_dispute["_id"])}, {"$set": {"lease_expires_at": past_window + timedelta(hours=1)}}
+    ))
+    assert market.run(dispute_sweeper.issue_default_judgements(market.db, past_window)) == 1
+    assert get_order(market, claimed)["status"] == "disputed"
+    assert get_order(market, unclaimed)["status"] == "refunded"
@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from starlette.responses import Response
+
+import idempotency
+from idempotency import run_idempotent
+
+
+def counting_handler(result=None, error=None, delay=0):
+    calls = []
+
+    async def handler():
+        calls.append(1)
+        if delay:
+            await asyncio.sleep(delay)
+        if error:
+            raise error
+        return result
+
+    return handler, calls
+
+
+def test_without_key_always_runs(db, run):
+    handler, calls = counting_handler({"ok": True})
+    run(run_idempotent(db, "u1", None, "scope", {}, handler))
+    run(run_idempotent(db, "u1", None, "scope", {}, handler))
+    assert len(calls) == 2
+
+
+def test_retry_replays_cached_result(db, run):
+    handler, calls = counting_handler({"balance": 105})
+    first = run(run_idempotent(db, "u1", "k1", "scope", {"amount": 100}, handler))
+    # Stored before returning, so a retry after a crash still replays
+    assert run(db.idempotency_keys.find_one({"_id": "u1:scope:k1"}))["status"] == "completed"
+
+    response = Response()
+    second = run(run_idempotent(db, "u1", "k1", "scope", {"amount": 100}, handler, response=response))
+
+    assert first == second == {"balance": 105}
+    assert len(calls) == 1
+    assert response.headers["Idempotent-Replayed"] == "true"
+
+
+def test_keys_are_scoped_per_user(db, run):
+    handler, calls = counting_handler({"ok": True})
+    run(run_idempotent(db, "u1", "k1", "scope", {}, handler))
+    run(run_idempotent(db, "u2", "k1", "scope", {}, handler))
+    assert len(calls) == 2
+
+
+def test_different_payload_is_rejected(db, run):
+    handler, _ = counting_handler({"ok": True})
+    run(run_idempotent(db, "u1", "k1", "scope", {"amount": 100}, handler))
+
+    with pytest.raises(HTTPException) as exc:
+        run(run_idempotent(db, "u1", "k1", "scope", {"amount": 200}, handler))
+    assert exc.value.status_code == 422
+
+
+def test_failed_request_is_not_cached(db, run):
+    failing, _ = counting_handler(error=HTTPException(status_code=400, detail="nope"))
+    with pytest.raises(HTTPException):
+        run(run_idempotent(db, "u1", "k1", "scope", {}, failing))
+    assert run(db.idempotency_keys.find_one({"_id": "u1:scope:k1"})) is None
+
+    handler, calls = counting_handler({"ok": True})
+    assert run(run_idempotent(db, "u1", "k1", "scope", {}, handler)) == {"ok": True}
+    assert len(calls) == 1
+
+
+def test_concurrent_duplicates_run_once(db, run):
+    handler, calls = counting_handler({"ok": True}, delay=0.05)
+
+    async def both():
+        return await asyncio.gather(
+            run_idempotent(db, "u1", "k1", "scope", {}, handler),
+            run_idempotent(db, "u1", "k1", "scope", {}, handler)
+        )
+
+    assert run(both()) == [{"ok": True}, {"ok": True}]
+    assert len(calls) == 1
+
+
+def test_lock_is_renewed_while_the_handler_runs(db, run, monkeypatch):
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_LOCK_SECONDS", 0.3)
+    monkeypatch.setattr(idempotency, "POLL_INTERVAL_SECONDS", 0.05)
+    handler, calls = counting_handler({"ok": True}, delay=1)
+
+    async def from_another_process():
+        await asyncio.sleep(0.5)
+        # Past the original lock; another process only sees the record, not this one's future
+        idempotency._in_flight.pop("u1:scope:k1")
+        return await run_idempotent(db, "u1", "k1", "scope", {}, handler)
+
+    async def both():
+        return await asyncio.gather(run_idempotent(db, "u1", "k1", "scope", {}, handler), from_another_process())
+
+    assert run(both()) == [{"ok": True}, {"ok": True}]
+    assert len(calls) == 1
+
+
+def test_waiters_are_released_when_cleanup_fails(db, run, monkeypatch):
+    handler, _ = counting_handler(error=HTTPException(status_code=400, detail="nope"), delay=0.05)
+
+    async def broken_delete(*args, **kwargs):
+        raise RuntimeError("database down")
+
+    monkeypatch.setattr(type(db.idempotency_keys), "delete_one", broken_delete)
+
+    async def both():
+        return await asyncio.wait_for(asyncio.gather(
+            run_idempotent(db, "u1", "k1", "scope", {}, handler),
+            run_idempotent(db, "u1", "k1", "scope", {}, handler),
+            return_exceptions=True
+        ), timeout=1)
+
+    first, second = run(both())
+    assert isinstance(first, RuntimeError)
+    assert isinstance(second, HTTPException) and second.status_code == 400
+
+
+def test_purchase_retry_charges_once(market):
+    before = market.buyer_balance()
+    headers = {**market.buyer, "Idempotency-Key": "purchase-1"}
+
+    first = market.client.post("/api/wallet/purchase-credits", json={"amount": 100}, headers=headers)
+    second = market.client.post("/api/wallet/purchase-credits", json={"amount": 100}, headers=headers)
+
+    assert first.status_code == second.status_code == 200
+    assert second.json() == first.json()
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert market.buyer_balance() == before + 105
+
+    mismatch = market.client.post("/api/wallet/purchase-credits", json={"amount": 200}, headers=headers)
+    assert mismatch.status_code == 422
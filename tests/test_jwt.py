@@ -0,0 +1,66 @@
+from datetime import timedelta
+
+import pytest
+from jose import jwt
+
+import utils
+from utils import TokenCache, create_access_token, token_cache, verify_token
+
+
+@pytest.fixture(autouse=True)
+def keys(monkeypatch):
+    monkeypatch.setattr(utils, "SIGNING_KEYS", {"2025": "old-secret", "2026": "new-secret"})
+    monkeypatch.setattr(utils, "ACTIVE_KID", "2026")
+    token_cache.clear()
+    yield
+    token_cache.clear()
+
+
+def test_tokens_are_signed_with_the_active_kid():
+    token = create_access_token({"sub": "user"})
+    assert jwt.get_unverified_header(token)["kid"] == "2026"
+    assert verify_token(token)["sub"] == "user"
+
+
+def test_rotation_keeps_old_tokens_valid_until_their_key_is_dropped(monkeypatch):
+    monkeypatch.setattr(utils, "ACTIVE_KID", "2025")
+    old = create_access_token({"sub": "user"})
+    monkeypatch.setattr(utils, "ACTIVE_KID", "2026")
+
+    assert verify_token(old, use_cache=False)["sub"] == "user"
+    monkeypatch.setattr(utils, "SIGNING_KEYS", {"2026": "new-secret"})
+    assert verify_token(old, use_cache=False) is None
+
+
+def test_unknown_kid_and_bad_signature_are_rejected():
+    forged = jwt.encode({"sub": "user"}, "guess", algorithm="HS256", headers={"kid": "2026"})
+    unknown = jwt.encode({"sub": "user"}, "new-secret", algorithm="HS256", headers={"kid": "1999"})
+    assert verify_token(forged) is None
+    assert verify_token(unknown) is None
+
+
+def test_token_without_kid_uses_the_default_key(monkeypatch):
+    monkeypatch.setattr(utils, "SIGNING_KEYS", {"default": "legacy"})
+    legacy = jwt.encode({"sub": "user"}, "legacy", algorithm="HS256")
+    assert verify_token(legacy)["sub"] == "user"
+
+
+def test_cache_skips_decoding_and_hands_out_copies(monkeypatch):
+    token = create_access_token({"sub": "user"})
+    verify_token(token)["sub"] = "tampered"
+
+    monkeypatch.setattr(utils, "decode_token", lambda token: pytest.fail("decoded a cached token"))
+    assert verify_token(token)["sub"] == "user"
+
+
+def test_cache_drops_expired_tokens_and_stays_bounded():
+    cache = TokenCache(max_size=2)
+    cache.put("expired", {"exp": 0})
+    assert cache.get("expired") is None
+
+    expired = create_access_token({"sub": "user"}, expires_delta=timedelta(seconds=-1))
+    assert verify_token(expired) is None
+
+    for token in ("a", "b", "c"):
+        cache.put(token, {"exp": 2 ** 40})
+    assert cache.get("a") is None and cache.get("c") is not None
@@ -0,0 +1,97 @@
+import asyncio
+
+import httpx
+import pytest
+
+from linkedin_client import CircuitBreaker, CircuitOpenError, LinkedInApiProvider, LinkedInClient, ProviderError
+
+
+def linkedin(handler, **kwargs) -> LinkedInClient:
+    return LinkedInClient(
+        base_url="http://linkedin.test", auth_base_url="http://linkedin.test",
+        transport=httpx.MockTransport(handler), backoff_base=0, **kwargs
+    )
+
+
+def half_open(breaker: CircuitBreaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    breaker.opened_at -= breaker.reset_timeout
+
+
+def test_breaker_opens_and_lets_one_trial_through():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    breaker.opened_at -= 30
+    assert breaker.state == "half_open"
+    assert breaker.allow() is True
+    assert breaker.allow() is False
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_retryable_failures_open_the_circuit(run):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(503)
+
+    client = linkedin(handler, max_retries=10)
+    client.breaker.failure_threshold = 3
+
+    with pytest.raises(CircuitOpenError):
+        run(client.get_profile("token"))
+    assert len(calls) == 3
+
+
+def test_cancelled_trial_does_not_keep_the_circuit_shut(run):
+    delay = [1]
+
+    async def handler(request):
+        await asyncio.sleep(delay[0])
+        return httpx.Response(200, json={"id": "member"})
+
+    client = linkedin(handler)
+    half_open(client.breaker)
+
+    async def cancelled_trial():
+        task = asyncio.ensure_future(client.get_profile("token"))
+        # Let it take the trial slot, then cancel it before the response arrives
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    run(cancelled_trial())
+    assert client.breaker.state == "half_open"
+
+    delay[0] = 0
+    assert run(client.get_profile("token")) == {"id": "member"}
+    assert client.breaker.state == "closed"
+
+
+@pytest.mark.parametrize("payload", [{"follower_count": 10}, ["not", "an", "object"], None])
+def test_malformed_metrics_are_a_provider_error(run, payload):
+    def handler(request):
+        return httpx.Response(200, json=payload)
+
+    provider = LinkedInApiProvider(linkedin(handler))
+    with pytest.raises(ProviderError):
+        run(provider.fetch_metrics({"access_token": "token", "platform_user_id": "member"}))
+    # Nor is the malformed payload served again from the cache
+    assert provider.client.metrics_cache.get("member") is None
+    assert provider.client.breaker.allow()
+
+
+def test_malformed_token_is_a_provider_error(run):
+    def handler(request):
+        return httpx.Response(200, json={"error": "invalid_grant"})
+
+    provider = LinkedInApiProvider(linkedin(handler))
+    with pytest.raises(ProviderError):
+        run(provider.fetch_metrics({"code": "code"}))
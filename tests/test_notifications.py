@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+import notification_transports
+import notifications
+from notification_transports import EMAIL, PUSH, SMS, FakeTransport
+from notifications import FAILED, NOTIFICATION_DIGEST_SECONDS, RETRY, SENT, SKIPPED, notifier, notify, notify_many, render
+
+
+@pytest.fixture(autouse=True)
+def transports(monkeypatch):
+    fakes = {channel: FakeTransport(channel, max_batch_size=10, latency_ms=0, failure_rate=0)
+             for channel in (EMAIL, SMS, PUSH)}
+    monkeypatch.setattr(notification_transports, "TRANSPORTS", fakes)
+    monkeypatch.setattr(notifications, "TRANSPORTS", fakes)
+    return fakes
+
+
+@pytest.fixture
+def user_id(db, run) -> str:
+    _id = ObjectId()
+    run(db.users.insert_one({"_id": _id, "email": "seller@example.com", "phone": "+15550100", "phone_verified": False}))
+    return str(_id)
+
+
+def order(number: str) -> dict:
+    return {"order_id": number, "order_number": number, "service_title": "LinkedIn post"}
+
+
+def test_digestible_events_fold_into_one_message(db, run, user_id):
+    run(notify_many(db, [(user_id, "order_received", order("ORD-1")), (user_id, "order_received", order("ORD-2"))]))
+    run(notify(db, user_id, "order_received", order("ORD-3")))
+
+    queued = run(db.notifications.find({"user_id": user_id}).to_list(length=None))
+    assert sorted(notification["channel"] for notification in queued) == [EMAIL, PUSH]
+    digest = queued[0]
+    assert digest["count"] == 3
+    assert digest["send_after"] - digest["created_at"] == timedelta(seconds=NOTIFICATION_DIGEST_SECONDS)
+    assert render(digest) == (
+        "You have 3 new orders", "You have 3 new orders waiting for a response, including ORD-1, ORD-2, ORD-3."
+    )
+
+
+def test_single_item_digest_reads_as_the_event(db, run, user_id):
+    run(notify(db, user_id, "order_received", order("ORD-1")))
+    digest = run(db.notifications.find_one({"channel": EMAIL}))
+    assert render(digest)[0] == "New order ORD-1"
+
+
+def test_due_messages_are_sent_and_unreachable_ones_skipped(db, run, user_id, transports):
+    run(notify(db, user_id, "dispute_opened", {"dispute_number": "DSP-1", "order_number": "ORD-1", "response_hours": 48}))
+
+    assert run(notifier.drain(db)) == 3
+    statuses = {n["channel"]: n["status"] for n in run(db.notifications.find({}).to_list(length=None))}
+    # The phone number is not verified
+    assert statuses == {EMAIL: SENT, PUSH: SENT, SMS: SKIPPED}
+    sent = transports[EMAIL].outbox[0]
+    assert (sent["to"], sent["subject"]) == ("seller@example.com", "Dispute DSP-1 opened")
+
+
+def test_failed_sends_are_retried_then_given_up(db, run, user_id, transports, monkeypatch):
+    monkeypatch.setattr(notifications, "NOTIFICATION_MAX_ATTEMPTS", 2)
+    transports[EMAIL].failure_rate = 1
+    run(notify(db, user_id, "otp", {"otp_code": "123456", "expires_minutes": 10}))
+
+    run(notifier.process_batch(db, EMAIL))
+    notification = run(db.notifications.find_one({}))
+    assert (notification["status"], notification["attempts"]) == (RETRY, 1)
+    assert notification["send_after"] > datetime.utcnow()
+
+    run(db.notifications.update_one({}, {"$set": {"send_after": datetime.utcnow()}}))
+    run(notifier.process_batch(db, EMAIL))
+    notification = run(db.notifications.find_one({}))
+    assert (notification["status"], notification["last_error"]) == (FAILED, "Gateway rejected the message")
@@ -0,0 +1,119 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from order_state import DISPUTE_WINDOW_DAYS, TRANSITIONS, bulk_transition_orders, transition_order
+
+
+def get_order(market, order_id: str) -> dict:
+    return market.run(market.db.orders.find_one({"_id": ObjectId(order_id)}))
+
+
+def test_transitions_do_not_share_a_guard():
+    unguarded = [transition for transition in TRANSITIONS.values() if not transition.guard]
+    assert len({id(transition.guard) for transition in unguarded}) == len(unguarded)
+
+
+def test_happy_path_moves_escrow(market):
+    order_id = market.order(until="pending_acceptance")
+    assert get_order(market, order_id)["status"] == "pending_acceptance"
+
+    order = market.run(transition_order(market.db, order_id, "accept", market.seller_id))
+    assert (order["status"], order["escrow_status"]) == ("accepted", "active")
+    assert order["_id"] == order_id
+
+    order = market.run(transition_order(market.db, order_id, "deliver", market.seller_id))
+    assert (order["status"], order["escrow_status"]) == ("delivered", "under_review")
+    assert "escrow_settled_at" not in order
+
+    order = market.run(transition_order(market.db, order_id, "approve", market.buyer_id))
+    assert (order["status"], order["escrow_status"]) == ("approved", "released")
+    assert order["escrow_settled_at"] == order["updated_at"]
+
+
+def test_first_settlement_is_kept(market):
+    order_id = market.order()
+    settled_at = get_order(market, order_id)["escrow_settled_at"]
+
+    market.run(transition_order(market.db, order_id, "dispute", market.buyer_id))
+    order = market.run(transition_order(market.db, order_id, "resolve_refund"))
+    assert order["status"] == "refunded"
+    assert order["escrow_settled_at"] == settled_at
+
+
+def test_wrong_actor_is_forbidden(market):
+    order_id = market.order(until="pending_acceptance")
+    with pytest.raises(HTTPException) as exc:
+        market.run(transition_order(market.db, order_id, "accept", market.buyer_id))
+    assert exc.value.status_code == 403
+    assert get_order(market, order_id)["status"] == "pending_acceptance"
+
+
+def test_wrong_status_is_rejected(market):
+    order_id = market.order(until="accepted")
+    with pytest.raises(HTTPException) as exc:
+        market.run(transition_order(market.db, order_id, "accept", market.seller_id))
+    assert (exc.value.status_code, exc.value.detail) == (400, "Order cannot be accepted")
+
+
+@pytest.mark.parametrize("order_id", ["not-an-id", str(ObjectId())])
+def test_missing_order_is_not_found(market, order_id):
+    with pytest.raises(HTTPException) as exc:
+        market.run(transition_order(market.db, order_id, "accept", market.seller_id))
+    assert exc.value.status_code == 404
+
+
+def test_only_one_revision(market):
+    order_id = market.order(until="delivered")
+    update = {"$inc": {"revision_count": 1}}
+    order = market.run(transition_order(market.db, order_id, "request_revision", market.buyer_id, update=update))
+    assert (order["status"], order["revision_count"]) == ("revision_requested", 1)
+
+    market.run(transition_order(market.db, order_id, "deliver", market.seller_id))
+    with pytest.raises(HTTPException) as exc:
+        market.run(transition_order(market.db, order_id, "request_revision", market.buyer_id, update=update))
+    assert (exc.value.status_code, exc.value.detail) == (400, "Maximum revisions exceeded")
+
+
+def test_api_reports_transition_errors(market):
+    order_id = market.order(until="pending_acceptance")
+    response = market.client.post(f"/api/orders/{order_id}/approve", headers=market.buyer)
+    assert response.status_code == 400
+
+    response = market.client.post(f"/api/orders/{order_id}/decline", json={"reason": "busy"}, headers=market.seller)
+    assert response.status_code == 200
+    assert response.json()["order"]["status"] == "cancelled"
+
+
+@pytest.mark.parametrize("settled_field", ["escrow_settled_at", "completed_at"])
+def test_settled_orders_can_only_be_disputed_within_the_window(market, settled_field):
+    recent = market.order()
+    closed = market.order()
+    past_window = datetime.utcnow() - timedelta(days=DISPUTE_WINDOW_DAYS + 1)
+    update = {"$set": {settled_field: past_window}}
+    if settled_field == "completed_at":
+        # Settled before escrow_settled_at was recorded
+        update["$unset"] = {"escrow_settled_at": ""}
+    market.run(market.db.orders.update_one({"_id": ObjectId(closed)}, update))
+    body = {"dispute_type": "quality_issues", "reason": "Not as described"}
+
+    response = market.client.post("/api/disputes/create", json={"order_id": closed, **body}, headers=market.buyer)
+    assert (response.status_code, response.json()["detail"]) == (400, "The dispute window for this order has closed")
+    assert get_order(market, closed)["status"] == "approved"
+
+    response = market.client.post("/api/disputes/create", json={"order_id": recent, **body}, headers=market.buyer)
+    assert response.status_code == 200, response.text
+
+
+def test_bulk_transition_skips_orders_in_the_wrong_status(market):
+    pending = market.order(until="pending_acceptance")
+    accepted = market.order(until="accepted")
+    orders = [get_order(market, pending), get_order(market, accepted)]
+
+    moved = market.run(bulk_transition_orders(market.db, orders, "accept", fields={pending: {"deadline": None}}))
+
+    assert moved == {pending}
+    assert get_order(market, pending)["status"] == "accepted"
+    assert "bulk_action_id" not in get_order(market, accepted)
@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta
+
+from otp_store import OTP_MAX_ATTEMPTS, issue_otp, verify_otp
+
+EMAIL = "buyer@example.com"
+
+
+def wrong(code: str) -> str:
+    return "000000" if code != "000000" else "111111"
+
+
+def test_code_verifies_once(db, run):
+    code = run(issue_otp(db, EMAIL, "email_verification"))
+
+    otp = run(verify_otp(db, EMAIL, "email_verification", code))
+    assert otp["verified"] is True and otp["attempts"] == 0
+    assert run(verify_otp(db, EMAIL, "email_verification", code)) is None
+
+
+def test_wrong_codes_use_up_the_attempts(db, run):
+    code = run(issue_otp(db, EMAIL, "email_verification"))
+
+    for attempt in range(1, OTP_MAX_ATTEMPTS + 1):
+        otp = run(verify_otp(db, EMAIL, "email_verification", wrong(code)))
+        assert (otp["verified"], otp["attempts"]) == (False, attempt)
+    # Out of attempts, even with the right code
+    assert run(verify_otp(db, EMAIL, "email_verification", code)) is None
+
+
+def test_expired_code_is_refused(db, run):
+    code = run(issue_otp(db, EMAIL, "email_verification"))
+    run(db.otps.update_one({"email": EMAIL}, {"$set": {"expires_at": datetime.utcnow() - timedelta(seconds=1)}}))
+
+    assert run(verify_otp(db, EMAIL, "email_verification", code)) is None
+
+
+def test_reissuing_replaces_the_code_and_resets_attempts(db, run):
+    first = run(issue_otp(db, EMAIL, "email_verification"))
+    run(verify_otp(db, EMAIL, "email_verification", wrong(first)))
+    second = run(issue_otp(db, EMAIL, "email_verification"))
+
+    assert run(db.otps.count_documents({"email": EMAIL})) == 1
+    otp = run(db.otps.find_one({"email": EMAIL}))
+    assert (otp["otp_code"], otp["attempts"]) == (second, 0)
+    # Each purpose keeps its own code
+    run(issue_otp(db, EMAIL, "password_reset"))
+    assert run(db.otps.count_documents({"email": EMAIL})) == 2
+
+
+def test_api_reports_attempts_left(client):
+    response = client.post("/api/auth/register", json={
+        "email": EMAIL, "password": "password123", "full_name": "buyer", "role": "buyer"
+    })
+    code = response.json()["otp_code"]
+
+    response = client.post("/api/auth/verify-email", json={"email": EMAIL, "otp": wrong(code)})
+    assert response.status_code == 400
+    assert response.json()["detail"] == f"Invalid OTP. {OTP_MAX_ATTEMPTS - 1} attempts remaining"
+    assert client.post("/api/auth/verify-email", json={"email": EMAIL, "otp": code}).status_code == 200
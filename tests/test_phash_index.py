@@ -0,0 +1,58 @@
+import random
+
+import pytest
+
+import phash_index as phash_index_module
+from perceptual_hash import hamming_distance, phash_hex
+from phash_index import PHashIndex
+
+
+def brute_force(hashes: list, value: int, radius: int) -> set:
+    return {candidate for candidate in hashes if hamming_distance(candidate, value) <= radius}
+
+
+def near(value: int, bits: int, rng: random.Random) -> int:
+    for bit in rng.sample(range(64), bits):
+        value ^= 1 << bit
+    return value
+
+
+@pytest.mark.parametrize("substrings", [None, 2, 4])
+def test_query_matches_a_full_scan(substrings):
+    rng = random.Random(7)
+    hashes = [rng.getrandbits(64) for _ in range(2000)]
+    hashes += [near(hashes[i], rng.randint(1, 10), rng) for i in range(200)]
+    index = PHashIndex(substrings=substrings)
+    index.build(hashes)
+
+    for value in [near(hashes[i], rng.randint(0, 8), rng) for i in range(50)] + [hashes[0]]:
+        found = index.query(value, radius=8)
+        assert {match for match, _ in found} == brute_force(hashes, value, 8)
+        assert [distance for _, distance in found] == sorted(distance for _, distance in found)
+
+
+def test_pending_hashes_are_searched_and_merged(run, monkeypatch):
+    monkeypatch.setattr(phash_index_module, "PHASH_INDEX_MIN_PENDING", 3)
+    index = PHashIndex()
+    index.build([0])
+
+    run(index.add(0b1))
+    assert 0b1 in index and len(index._pending) == 1
+    assert {match for match, _ in index.query(0b11, radius=1)} == {0b1}
+
+    run(index.add(0b111))
+    run(index.add(2 ** 64 - 1))
+    assert len(index._pending) == 0 and len(index) == 4
+    assert {match for match, _ in index.query(0, radius=3)} == {0, 0b1, 0b111}
+
+
+def test_sync_loads_then_tails_the_collection(db, run):
+    run(db.proof_hashes.insert_many([{"phash": phash_hex(value)} for value in (1, 2, 3)]))
+    index = PHashIndex()
+
+    assert run(index.sync(db)) == 3
+    far = 2 ** 64 - 1
+    run(db.proof_hashes.insert_one({"phash": phash_hex(far)}))
+    assert run(index.sync(db)) == 1
+    assert len(index) == 4 and far in index
+    assert run(index.find_similar(db, [far - 1], radius=1)) == {far - 1: [(far, 1)]}
@@ -0,0 +1,83 @@
+import io
+
+import pytest
+from bson import ObjectId
+
+import blob_store
+import proof_verification
+from blob_store import LocalBlobBackend
+from phash_index import PHashIndex
+from proof_fetchers import MockProofFetcher, set_fetcher
+from proof_verification import FAILED, FLAGGED, VERIFIED, proof_verifier
+
+POST_URL = "https://www.linkedin.com/posts/seller-1"
+
+
+@pytest.fixture(autouse=True)
+def fetcher(tmp_path, monkeypatch):
+    monkeypatch.setitem(blob_store._backends, "local", LocalBlobBackend(str(tmp_path)))
+    monkeypatch.setattr(proof_verification, "phash_index", PHashIndex())
+    fetcher = MockProofFetcher()
+    set_fetcher(fetcher)
+    yield fetcher
+    set_fetcher(None)
+
+
+def screenshot(market) -> str:
+    Image = pytest.importorskip("PIL.Image")
+    image = Image.new("L", (64, 64))
+    image.putdata([(x * 4 + y * 3) % 256 for y in range(64) for x in range(64)])
+    content = io.BytesIO()
+    image.save(content, format="PNG")
+    response = market.client.post(
+        "/api/blobs", files={"file": ("proof.png", content.getvalue(), "image/png")}, headers=market.seller
+    )
+    assert response.status_code == 200, response.text
+    return response.json()["blob"]["ref"]
+
+
+def deliver(market, **proof) -> dict:
+    order_id = market.order(until="accepted")
+    response = market.client.post(f"/api/orders/{order_id}/deliver", json=proof, headers=market.seller)
+    assert response.status_code == 200, response.text
+    market.run(proof_verifier.drain(market.db))
+    order = market.run(market.db.orders.find_one({"_id": ObjectId(order_id)}))
+    return order["proof_of_completion"]
+
+
+def test_published_post_verifies(market, fetcher):
+    fetcher.add_post(POST_URL, "Loving this launch #ad")
+
+    proof = deliver(market, url=POST_URL)
+    assert proof["verification_status"] == VERIFIED
+    assert proof["verification_checks"] == {"platform": True, "post_found": True}
+    assert proof["verified"] is True
+
+
+def test_missing_or_off_platform_post_fails(market, fetcher):
+    proof = deliver(market, url=POST_URL)
+    assert proof["verification_status"] == FAILED
+    assert proof["verification_notes"] == ["Proof URL could not be found"]
+
+    # Never fetched, even when the fetcher would have it
+    fetcher.add_post("https://example.com/post", "#ad")
+    proof = deliver(market, url="https://example.com/post")
+    assert proof["verification_status"] == FAILED
+    assert proof["verification_checks"] == {"platform": False}
+
+
+def test_proof_with_nothing_to_check_fails(market):
+    proof = deliver(market, description="Posted it")
+    assert proof["verification_status"] == FAILED
+    assert proof["verification_notes"] == ["Nothing could be checked automatically"]
+
+
+def test_reused_screenshot_is_flagged(market, fetcher):
+    fetcher.add_post(POST_URL, "Launch day")
+    ref = screenshot(market)
+
+    first = deliver(market, url=POST_URL, screenshots=[ref])
+    assert first["verification_status"] == VERIFIED
+    second = deliver(market, url=POST_URL, screenshots=[ref])
+    assert second["verification_status"] == FLAGGED
+    assert [reuse["distance"] for reuse in second["reused_screenshots"]] == [0]
@@ -0,0 +1,53 @@
+import ipaddress
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+import rate_limit
+from rate_limit import InMemoryRateLimitBackend, RateLimiter, RateLimitRule, get_client_ip, limiter
+
+
+@pytest.fixture
+def enabled(monkeypatch):
+    monkeypatch.setattr(limiter, "enabled", True)
+    monkeypatch.setattr(limiter, "backend", InMemoryRateLimitBackend())
+
+
+def request_from(peer: str, forwarded: str = None) -> Request:
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return Request({"type": "http", "client": (peer, 1234), "headers": headers})
+
+
+def test_login_is_limited_per_email(client, enabled):
+    for _ in range(5):
+        response = client.post("/api/auth/login", json={"email": "a@example.com", "password": "wrong"})
+        assert response.status_code == 401
+
+    response = client.post("/api/auth/login", json={"email": "A@example.com", "password": "wrong"})
+    assert response.status_code == 429
+    assert int(response.headers["retry-after"]) > 0
+    # Other addresses have their own bucket
+    assert client.post("/api/auth/login", json={"email": "b@example.com", "password": "wrong"}).status_code == 401
+
+
+def test_tightest_bucket_is_reported(run):
+    limiter = RateLimiter(InMemoryRateLimitBackend(), policies={
+        "route": [RateLimitRule("ip", 10, 60), RateLimitRule("user", 2, 60)]
+    }, enabled=True)
+
+    run(limiter.hit("route", request_from("10.0.0.1"), user_id="user"))
+    run(limiter.hit("route", request_from("10.0.0.1"), user_id="user"))
+    with pytest.raises(HTTPException) as rejected:
+        run(limiter.hit("route", request_from("10.0.0.1"), user_id="user"))
+    assert rejected.value.status_code == 429
+    assert rejected.value.headers["X-RateLimit-Limit"] == "2"
+
+
+def test_forwarded_for_is_ignored_from_untrusted_peers(monkeypatch):
+    monkeypatch.setattr(rate_limit, "TRUSTED_PROXIES", [ipaddress.ip_network("10.0.0.0/8")])
+
+    assert get_client_ip(request_from("203.0.113.9", "198.51.100.1")) == "203.0.113.9"
+    # Behind the proxy: the right-most hop it did not add itself
+    assert get_client_ip(request_from("10.0.0.2", "198.51.100.1, 203.0.113.7, 10.0.0.3")) == "203.0.113.7"
+    assert get_client_ip(request_from("10.0.0.2", "not-an-ip")) == "not-an-ip"
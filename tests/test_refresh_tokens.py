@@ -0,0 +1,83 @@
+from refresh_tokens import BloomFilter, RevocationList
+
+EMAIL = "buyer@example.com"
+
+
+def sign_up(client) -> dict:
+    response = client.post("/api/auth/register", json={
+        "email": EMAIL, "password": "password123", "full_name": "buyer", "role": "buyer"
+    })
+    response = client.post("/api/auth/verify-email", json={"email": EMAIL, "otp": response.json()["otp_code"]})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def refresh(client, token: str):
+    return client.post("/api/auth/refresh", json={"refresh_token": token})
+
+
+def me(client, access_token: str):
+    return client.get("/api/auth/me", headers={"Authorization": f"Bearer {access_token}"})
+
+
+def test_refresh_rotates_the_token(client):
+    first = sign_up(client)
+
+    response = refresh(client, first["refresh_token"])
+    assert response.status_code == 200, response.text
+    second = response.json()
+    assert second["refresh_token"] != first["refresh_token"]
+    assert refresh(client, second["refresh_token"]).status_code == 200
+
+
+def test_reusing_a_rotated_token_revokes_the_family(client):
+    first = sign_up(client)
+    second = refresh(client, first["refresh_token"]).json()
+    assert me(client, second["access_token"]).status_code == 200
+
+    # The old token turning up again means it leaked
+    response = refresh(client, first["refresh_token"])
+    assert response.status_code == 401
+
+    assert refresh(client, second["refresh_token"]).status_code == 401
+    assert me(client, second["access_token"]).status_code == 401
+    # A fresh login starts a new family
+    login = client.post("/api/auth/login", json={"email": EMAIL, "password": "password123"}).json()
+    assert me(client, login["access_token"]).status_code == 200
+
+
+def test_access_token_is_not_a_refresh_token(client):
+    tokens = sign_up(client)
+    assert refresh(client, tokens["access_token"]).status_code == 401
+    assert me(client, tokens["refresh_token"]).status_code == 401
+
+
+def test_logout_revokes_the_family(client):
+    tokens = sign_up(client)
+    assert client.post("/api/auth/logout", json={"refresh_token": tokens["refresh_token"]}).status_code == 200
+
+    assert refresh(client, tokens["refresh_token"]).status_code == 401
+    assert me(client, tokens["access_token"]).status_code == 401
+
+
+def test_revocations_by_other_workers_are_picked_up_on_sync(client, db, run):
+    tokens = sign_up(client)
+    family_id = run(db.refresh_tokens.find_one({}))["family_id"]
+    other_worker = RevocationList()
+    run(other_worker.load(db))
+    assert run(other_worker.is_revoked(db, family_id)) is False
+
+    client.post("/api/auth/logout", json={"refresh_token": tokens["refresh_token"]})
+    run(other_worker.load(db))
+    assert run(other_worker.is_revoked(db, family_id)) is True
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    members = [f"family-{i}" for i in range(1000)]
+    for member in members:
+        bloom.add(member)
+
+    assert all(member in bloom for member in members)
+    false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+    assert false_positives < 300
@@ -0,0 +1,60 @@
+from seller_stats import STATS_SEED_VERSION, stats_seeder
+import seller_stats
+
+
+def search(market) -> dict:
+    response = market.client.get("/api/services/search")
+    assert response.status_code == 200, response.text
+    return response.json()["services"][0]["seller"]
+
+
+def forget_stats(market):
+    # As for a seller with history from before seller_stats existed
+    market.run(market.db.seller_stats.delete_many({}))
+    market.run(market.db.seller_cards.delete_many({}))
+    seller_stats._seeded.clear()
+
+
+def review(market, order_id: str, rating: float):
+    response = market.client.post(
+        "/api/reviews/create", json={"order_id": order_id, "overall_rating": rating}, headers=market.buyer
+    )
+    assert response.status_code == 200, response.text
+
+
+def test_card_ratings_come_from_the_counters(market):
+    review(market, market.order(), 5)
+    review(market, market.order(), 4)
+
+    card = search(market)
+    assert card["seller_profile"]["review_count"] == 2
+    assert card["seller_profile"]["average_rating"] == 4.5
+    assert card["rating_breakdown"] == {"5_star": 1, "4_star": 1, "3_star": 0, "2_star": 0, "1_star": 0}
+
+
+def test_read_miss_queues_seeding_instead_of_rebuilding(market):
+    review(market, market.order(), 5)
+    forget_stats(market)
+
+    card = search(market)
+    assert card["full_name"] == "seller"
+    assert card["seller_profile"]["review_count"] == 0
+    assert market.run(market.db.seller_stats.find_one({"_id": market.seller_id})) is None
+    assert stats_seeder._queued == {market.seller_id}
+
+    assert market.run(stats_seeder.seed_queued(market.db)) == 1
+    stats = market.run(market.db.seller_stats.find_one({"_id": market.seller_id}))
+    assert stats["seed_version"] == STATS_SEED_VERSION
+    card = search(market)
+    assert card["seller_profile"]["review_count"] == 1
+    assert card["rating_breakdown"]["5_star"] == 1
+
+
+def test_backfill_seeds_every_unseeded_seller(market):
+    review(market, market.order(), 3)
+    forget_stats(market)
+
+    assert market.run(stats_seeder.backfill(market.db)) == 1
+    assert market.run(stats_seeder.backfill(market.db)) == 0
+    card = market.run(market.db.seller_cards.find_one({"_id": market.seller_id}))
+    assert card["seller_profile"]["review_count"] == 1
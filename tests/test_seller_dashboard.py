@@ -0,0 +1,29 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+
+def dashboard(market, **params):
+    response = market.client.get("/api/sellers/me/dashboard", params=params, headers=market.seller)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+@pytest.mark.parametrize("offset", [timedelta(0), timedelta(hours=2), timedelta(hours=-5)])
+def test_timezone_aware_range_reads_buckets(market, offset):
+    market.order()
+    zone = timezone(offset)
+    start = (datetime.now(timezone.utc) - timedelta(days=2)).astimezone(zone)
+
+    totals = dashboard(market, start=start.isoformat())["totals"]
+    assert (totals["completed_orders"], totals["earnings"]) == (1, 50)
+
+    end = datetime.now(timezone.utc).astimezone(zone)
+    totals = dashboard(market, start=start.isoformat(), end=end.isoformat())["totals"]
+    assert (totals["completed_orders"], totals["earnings"]) == (1, 50)
+
+
+def test_naive_range_reads_buckets(market):
+    market.order()
+    totals = dashboard(market, start=(datetime.utcnow() - timedelta(days=2)).isoformat())["totals"]
+    assert (totals["completed_orders"], totals["earnings"]) == (1, 50)
@@ -0,0 +1,56 @@
+from datetime import datetime
+
+from bson import ObjectId
+
+from seller_stats import ACTIVITY_DAYS, _epoch_day, derive_profile_stats, rebuild_seller_stats
+
+
+def profile(market) -> dict:
+    return market.run(market.db.users.find_one({"_id": ObjectId(market.seller_id)}))["seller_profile"]
+
+
+def counters(market) -> dict:
+    stats = market.run(market.db.seller_stats.find_one({"_id": market.seller_id}))
+    return {field: stats.get(field, 0) for field in ("accepted", "declined", "completed", "failed", "responses")}
+
+
+def test_events_keep_the_profile_current(market):
+    market.order()
+    market.order()
+    declined = market.order(until="pending_acceptance")
+    response = market.client.post(
+        "/api/orders/bulk-decline", json={"order_ids": [declined], "reason": "Booked up"}, headers=market.seller
+    )
+    assert response.status_code == 200, response.text
+
+    assert counters(market) == {"accepted": 2, "declined": 1, "completed": 2, "failed": 0, "responses": 3}
+    seller = profile(market)
+    assert seller["completion_rate"] == 100.0
+    assert seller["orders_last_30_days"] == 2
+    assert seller["stats_version"] == market.run(market.db.seller_stats.find_one({"_id": market.seller_id}))["version"]
+
+
+def test_rebuild_agrees_with_the_running_counters(market):
+    market.order()
+    market.order(until="delivered")
+    incremental = counters(market)
+    before = profile(market)
+
+    market.run(rebuild_seller_stats(market.db, market.seller_id))
+    assert counters(market) == incremental
+    rebuilt = profile(market)
+    for field in ("completion_rate", "orders_last_30_days", "dispute_rate", "average_rating", "tier"):
+        assert rebuilt[field] == before[field], field
+
+
+def test_activity_outside_the_window_is_not_counted():
+    today = _epoch_day(datetime(2026, 6, 1))
+    stats = {
+        "completed": 3,
+        "activity": {
+            "0": {"day": today, "count": 2},
+            "1": {"day": today - ACTIVITY_DAYS, "count": 5},
+        },
+    }
+    assert derive_profile_stats(stats, today)["orders_last_30_days"] == 2
+    assert derive_profile_stats({}, today)["completion_rate"] == 0.0
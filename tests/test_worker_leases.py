@@ -0,0 +1,49 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from worker_leases import WorkerLease
+
+
+def test_one_holder_at_a_time(db, run):
+    first, second = WorkerLease("sweeper"), WorkerLease("sweeper")
+    now = datetime.utcnow()
+
+    assert run(first.acquire(db, now)) is True
+    assert run(second.acquire(db, now)) is False
+    # Renewing is fine for the holder
+    assert run(first.acquire(db, now + timedelta(seconds=10))) is True
+    # Other leases are independent
+    assert run(WorkerLease("archiver").acquire(db, now)) is True
+
+
+def test_lapsed_lease_is_taken_over(db, run):
+    first, second = WorkerLease("sweeper", seconds=60), WorkerLease("sweeper", seconds=60)
+    now = datetime.utcnow()
+    run(first.acquire(db, now))
+
+    assert run(second.acquire(db, now + timedelta(seconds=61))) is True
+    assert run(first.acquire(db, now + timedelta(seconds=62))) is False
+
+
+def test_run_exclusive_skips_work_without_the_lease(db, run):
+    first, second = WorkerLease("sweeper"), WorkerLease("sweeper")
+    calls = []
+
+    async def work():
+        calls.append(1)
+        return {"processed": 1}
+
+    assert run(first.run_exclusive(db, work)) == {"processed": 1}
+    assert run(second.run_exclusive(db, work)) is None
+    assert len(calls) == 1
+
+
+def test_lease_is_renewed_while_work_runs(db, run):
+    first, second = WorkerLease("sweeper", seconds=0.3), WorkerLease("sweeper", seconds=0.3)
+
+    async def slow_work():
+        await asyncio.sleep(0.5)
+        # Past the original expiry, but still held
+        return await second.acquire(db)
+
+    assert run(first.run_exclusive(db, slow_work)) is False